@@ -0,0 +1,144 @@
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class StableCursorPagination(CursorPagination):
+    """
+    Project-wide cursor pagination.
+
+    The ordering comes from the view (OrderingFilter or ``ordering``), the
+    queryset's own ``order_by``, or the model's ``Meta.ordering``, in that
+    order, with ``id`` appended as a tie-break.
+
+    DRF's cursor only records the first ordering field plus an offset, which
+    repeats or skips rows when many share a timestamp. Here the cursor holds
+    the value of every ordering field, and a page starts strictly after that
+    row, so with ``id`` in the ordering every position is exact. NULLs in
+    nullable ordering fields sort where the database puts them: last in
+    ascending order on PostgreSQL, first on SQLite and MySQL.
+
+    Pass ``?paginate=false`` to get the old unpaginated list response.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    opt_out_query_param = 'paginate'
+    default_ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.opt_out_query_param, '').lower() in ['false', '0', 'no']:
+            return None
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        current_position = self.cursor.position if self.cursor else None
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._after(queryset, ordering, current_position))
+
+        # One extra row tells us whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) if has_following else None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = (
+            getattr(view, 'ordering', None)
+            or queryset.query.order_by
+            or queryset.model._meta.ordering
+            or self.default_ordering
+        )
+        ordering = super().get_ordering(request, queryset, view)
+
+        if not any(field.lstrip('-') in ['id', 'pk'] for field in ordering):
+            tie_break = '-id' if ordering[0].startswith('-') else 'id'
+            ordering += (tie_break,)
+        return ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            value = instance
+            for attr in field.lstrip('-').split('__'):
+                value = value[attr] if isinstance(value, dict) else getattr(value, attr)
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def _after(self, queryset, ordering, position):
+        """
+        Rows that come strictly after ``position`` in ``ordering``:
+        (a > x) OR (a = x AND b > y) OR ... for each ordering field, where
+        NULLs count as larger than any value if the database sorts them so.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        nulls_largest = connections[queryset.db].features.nulls_order_largest
+        after = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            nullable = _nullable(queryset.model, name)
+            # Whether NULLs come at the end of this field's order
+            nulls_after = nullable and nulls_largest != descending
+            if value is not None:
+                following = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if nulls_after:
+                    following |= Q(**{f'{name}__isnull': True})
+                after |= equal & following
+                equal &= Q(**{name: value})
+            else:
+                if not nulls_after:
+                    after |= equal & Q(**{f'{name}__isnull': False})
+                equal &= Q(**{f'{name}__isnull': True})
+        return after
+
+
+def _nullable(model, path):
+    """Whether an ordering path such as ``course__lecturer__username`` can be NULL."""
+    for part in path.split('__'):
+        try:
+            field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        except FieldDoesNotExist:
+            # An annotation; assume the worst
+            return True
+        if field.null:
+            return True
+        model = field.related_model
+        if model is None:
+            break
+    return False
@@ -101,6 +101,27 @@ DATABASES = {
 }
 
 
+# Cache shared by every worker process. Cached calendar feeds and their
+# version counters live here, so a per-process cache would leave other
+# workers serving stale data. Set REDIS_URL to use Redis; otherwise the
+# database table created by `python manage.py createcachetable` is used.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,11 +167,20 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.StableCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Teaching weeks of each semester as (month, day) pairs, used to bound the
+# weekly recurrences in calendar feeds
+SEMESTER_DATES = {
+    'first': ((1, 15), (5, 31)),
+    'second': ((7, 15), (11, 30)),
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -0,0 +1,187 @@
+import re
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from backend.pagination import StableCursorPagination
+from courses.models import Course, Enrollment
+from orders.models import Order
+from support.models import SupportRequest
+from wellness.models import CounsellingSession, WellnessCheckin
+
+User = get_user_model()
+
+
+class HotPathIndexTests(TestCase):
+    """
+    Run the main list queries and check with EXPLAIN QUERY PLAN that every
+    filtered read of the hot tables is an index search, not a full scan.
+    """
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plans are checked on SQLite only')
+        self.client = APIClient()
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.counsellor = User.objects.create_user(
+            username='counsellor1', password='pass', role='staff', staff_type='counsellor'
+        )
+        course = Course.objects.create(
+            code='IT101', name='Course', description='Test course', credits=3, lecturer=self.lecturer,
+        )
+        Enrollment.objects.create(student=self.student, course=course)
+        WellnessCheckin.objects.create(user=self.student, mood='sad', flagged=True)
+        CounsellingSession.objects.create(student=self.student)
+        Order.objects.create(user=self.student, department='cafeteria')
+        SupportRequest.objects.create(user=self.student, category='cleaning', location='Hall A', description='Spill')
+
+    def plans_for(self, table, user, url, params=None):
+        """EXPLAIN QUERY PLAN rows naming ``table`` for each filtered query a request makes on it."""
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+
+        plans = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if f'"{table}"' not in sql or 'WHERE' not in sql or not sql.startswith('SELECT'):
+                continue
+            # Subqueries refer to the table by an alias such as U0
+            names = {table} | set(re.findall(rf'"{table}" ([A-Z]\d+)\b', sql))
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                rows = [row[-1] for row in cursor.fetchall()]
+            plans.extend(row for row in rows if row.split(' ')[1:2] and row.split(' ')[1] in names)
+        self.assertTrue(plans, f'No filtered query on {table} for {url}')
+        return plans
+
+    def assert_index_search(self, table, user, url, params=None):
+        for row in self.plans_for(table, user, url, params):
+            self.assertTrue(row.startswith('SEARCH') and 'INDEX' in row, f'{url}: {row}')
+
+    def assert_uses_index(self, indexes, table, user, url, params=None):
+        """The query reads ``table`` through one of ``indexes``, however the planner walks it."""
+        plans = self.plans_for(table, user, url, params)
+        self.assertTrue(any(f'INDEX {index}' in row for row in plans for index in indexes), f'{url}: {plans}')
+
+    def test_enrollment_lookups_use_indexes(self):
+        self.assert_index_search('courses_enrollment', self.student, '/api/courses/my_courses/')
+        self.assert_index_search('courses_enrollment', self.student, '/api/courses/')
+
+    def test_wellness_lookups_use_indexes(self):
+        self.assert_index_search('wellness_wellnesscheckin', self.student, '/api/wellness/checkins/')
+        # Walking the partial index of flagged rows in order is a SCAN, but of flagged rows only
+        self.assert_uses_index(
+            ['checkin_flagged_recent_idx', 'checkin_flagged_newest_idx'],
+            'wellness_wellnesscheckin', self.counsellor, '/api/wellness/checkins/flagged/',
+        )
+        self.assert_index_search('wellness_counsellingsession', self.student, '/api/wellness/counselling-sessions/')
+
+    def test_order_and_support_lookups_use_indexes(self):
+        cafeteria = User.objects.create_user(
+            username='cafeteria1', password='pass', role='staff', staff_type='cafeteria'
+        )
+        housekeeping = User.objects.create_user(
+            username='housekeeping1', password='pass', role='staff', staff_type='housekeeping'
+        )
+        self.assert_index_search('orders_order', cafeteria, '/api/orders/orders/')
+        self.assert_index_search('orders_order', cafeteria, '/api/orders/orders/prep-queue/')
+        self.assert_index_search('support_supportrequest', housekeeping, '/api/support/support-requests/', {'status': 'pending'})
+
+
+class FlaggedQueueIndexTests(TestCase):
+    def test_a_plain_index_serves_the_queue_on_every_backend(self):
+        # MySQL creates no partial indexes, so the queue needs an ordinary one
+        # leading with flagged and then created_at
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'wellness_wellnesscheckin')
+        self.assertIn('checkin_flagged_newest_idx', constraints)
+        self.assertEqual(constraints['checkin_flagged_newest_idx']['columns'], ['flagged', 'created_at'])
+
+
+class StableCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = User.objects.create_user(username='staff1', password='pass', role='staff')
+        lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        student = User.objects.create_user(username='student0', password='pass', role='student')
+        for i in range(7):
+            course = Course.objects.create(
+                code=f'IT{i:03d}', name=f'Course {i}', description='Test course', credits=3, lecturer=lecturer,
+            )
+            Enrollment.objects.create(student=student, course=course)
+        self.client.force_authenticate(user=staff)
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def assert_pages_cover_every_row_once(self):
+        pages = self.walk('/api/enrollments/?page_size=3', 'next')
+        seen = [row for page in pages for row in page]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(seen), sorted(Enrollment.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+        return pages
+
+    def test_cursor_pages_cover_every_row_once(self):
+        self.assert_pages_cover_every_row_once()
+
+    def test_rows_sharing_the_ordering_value_are_paged_exactly(self):
+        Enrollment.objects.update(enrolled_at=datetime(2026, 1, 15, 9, 0, tzinfo=timezone.utc))
+        pages = self.assert_pages_cover_every_row_once()
+        # Ties fall back to -id
+        ids = sorted(Enrollment.objects.values_list('id', flat=True), reverse=True)
+        self.assertEqual([row for page in pages for row in page], ids)
+
+        # Walking back from the last page returns the same pages
+        last = self.client.get('/api/enrollments/?page_size=3')
+        while last.data['next']:
+            last = self.client.get(last.data['next'])
+        back = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_nulls_in_the_ordering_are_paged_exactly(self):
+        grades = ['A', None, 'B', None, 'A', None, 'C']
+        for enrollment, grade in zip(Enrollment.objects.order_by('id'), grades):
+            enrollment.grade = grade
+            enrollment.save(update_fields=['grade'])
+
+        for ordering in [('grade', 'id'), ('-grade', 'id'), ('grade', '-id'), ('-grade', '-id')]:
+            with self.subTest(ordering=ordering):
+                expected = list(Enrollment.objects.order_by(*ordering).values_list('id', flat=True))
+                pages, url = [], '/api/enrollments/?page_size=2'
+                while url:
+                    request = Request(APIRequestFactory().get(url))
+                    paginator = StableCursorPagination()
+                    page = paginator.paginate_queryset(Enrollment.objects.order_by(*ordering), request)
+                    pages.append([enrollment.id for enrollment in page])
+                    url = paginator.get_next_link()
+                self.assertEqual([row for page in pages for row in page], expected)
+
+                # And back again from the last page
+                back = []
+                while url := paginator.get_previous_link():
+                    paginator = StableCursorPagination()
+                    page = paginator.paginate_queryset(Enrollment.objects.order_by(*ordering), Request(APIRequestFactory().get(url)))
+                    back.append([enrollment.id for enrollment in page])
+                self.assertEqual(back, pages[-2::-1])
+
+    def test_malformed_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/enrollments/?cursor=cD1ub3Bl').status_code, 404)
+
+    def test_paginate_false_returns_plain_list(self):
+        response = self.client.get('/api/enrollments/?paginate=false')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
@@ -1,9 +1,27 @@
+from django import forms
 from django.contrib import admin
 from .models import Course, Enrollment, CourseSchedule, CourseMaterial
+from .prerequisites import get_graph
+
+
+class CourseAdminForm(forms.ModelForm):
+    class Meta:
+        model = Course
+        fields = '__all__'
+
+    def clean_prerequisites(self):
+        prerequisites = self.cleaned_data['prerequisites']
+        if self.instance.pk:
+            looping = get_graph().cycle_through(self.instance.pk, [course.pk for course in prerequisites])
+            if looping:
+                codes = ', '.join(sorted(course.code for course in prerequisites if course.pk in looping))
+                raise forms.ValidationError(f"Requiring {codes} would make {self.instance.code} its own prerequisite.")
+        return prerequisites
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
+    form = CourseAdminForm
     list_display = ['code', 'name', 'lecturer', 'level', 'course_type', 'credits', 'enrollment_count', 'is_active', 'semester', 'year']
     list_filter = ['level', 'course_type', 'is_active', 'semester', 'year', 'lecturer']
     search_fields = ['code', 'name', 'description']
@@ -0,0 +1,355 @@
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Course
+
+# Matches in the code count most, then the name, then the description
+FIELD_WEIGHTS = {
+    'code': 8.0,
+    'name': 3.0,
+    'description': 1.0,
+}
+FACETS = ['level', 'course_type', 'semester']
+# Course and lecturer fields the index is built from; saves that touch none
+# of them leave it alone
+INDEXED_COURSE_FIELDS = ['code', 'name', 'description', 'is_active', 'lecturer_id', *FACETS]
+INDEXED_LECTURER_FIELDS = ['first_name', 'last_name', 'username']
+VERSION_KEY = 'course-catalogue-version'
+# How long a worker trusts the version it last read before asking the shared
+# cache again, so most requests make no cache read (a query with the database
+# cache). Changes made by other workers show up within this many seconds.
+VERSION_CHECK_INTERVAL = 2
+# After a change, keep answering from the old index while a thread builds
+# the new one, so no request waits for a rebuild
+REBUILD_IN_BACKGROUND = True
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+PREFIX_FACTOR = 0.7
+TYPO_FACTOR = 0.5
+MAX_PREFIX_TERMS = 50
+# Words shorter than this must match exactly; longer ones allow one typo,
+# and words of TWO_TYPO_LENGTH or more allow two
+ONE_TYPO_LENGTH = 4
+TWO_TYPO_LENGTH = 8
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+# Typeahead ranks codes, then course names, then lecturers
+SUGGESTION_ORDER = {'code': 0, 'name': 1, 'lecturer': 2}
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from in into is it its of on or that the their
+this to with will
+""".split())
+
+WORD_RE = re.compile(r'\w+')
+CODE_PART_RE = re.compile(r'[^\W\d_]+|\d+')
+
+
+def tokenize(text):
+    words = (word.casefold() for word in WORD_RE.findall(text or ''))
+    return [word for word in words if word not in STOP_WORDS]
+
+
+def code_terms(code):
+    """'IT101' is searchable as 'it101', 'it' and '101'."""
+    whole = code.casefold()
+    return [whole] + [part for part in CODE_PART_RE.findall(whole) if part != whole]
+
+
+def word_starts(text):
+    """'Data Structures' is suggested for 'data s...' and 'struc...'."""
+    text = ' '.join(text.casefold().split())
+    return [text[match.start():] for match in WORD_RE.finditer(text)]
+
+
+def catalogue_page(query_params):
+    """1-based ``?page=`` and ``?page_size=`` for ranked search results."""
+    try:
+        page = max(1, int(query_params.get('page', 1)))
+        page_size = min(MAX_PAGE_SIZE, max(1, int(query_params.get('page_size', PAGE_SIZE))))
+    except ValueError:
+        return 1, PAGE_SIZE
+    return page, page_size
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _edit_distance(a, b, limit):
+    """Optimal string alignment distance, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class CatalogueIndex:
+    """
+    In-memory inverted index over every course's code, name and
+    description, loaded in one query. Each term maps to the courses it
+    appears in with a weight already scaled by field and IDF, so a search is
+    a few dictionary lookups. Typo tolerance uses a symmetric-delete table:
+    a misspelt word and the indexed term share a one-letter deletion.
+
+    For typeahead it also keeps one sorted array of course codes, course
+    names and lecturer names, searched by prefix with a bisect.
+    """
+    def __init__(self):
+        rows = list(
+            Course.objects.order_by('code')
+            .values(
+                'id', 'code', 'name', 'description', 'is_active', 'lecturer_id', *FACETS,
+                'lecturer__first_name', 'lecturer__last_name', 'lecturer__username',
+            )
+        )
+        postings = defaultdict(dict)
+        suggestions = []
+        self.lecturers = {}
+        self.lecturer_courses = defaultdict(list)
+        for row in rows:
+            lecturer_name = (
+                f"{row.pop('lecturer__first_name')} {row.pop('lecturer__last_name')}".strip()
+                or row['lecturer__username']
+            )
+            del row['lecturer__username']
+            self.lecturers[row['lecturer_id']] = lecturer_name
+            self.lecturer_courses[row['lecturer_id']].append(row['id'])
+            suggestions.append((row['code'].casefold(), 'code', row['id']))
+            suggestions.extend((key, 'name', row['id']) for key in word_starts(row['name']))
+
+            fields = {
+                'code': code_terms(row['code']),
+                'name': tokenize(row['name']),
+                'description': tokenize(row['description']),
+            }
+            for field, terms in fields.items():
+                for term, count in Counter(terms).items():
+                    weight = FIELD_WEIGHTS[field] * (1 + math.log(count))
+                    course_weights = postings[term]
+                    course_weights[row['id']] = max(course_weights.get(row['id'], 0), weight)
+            del row['description']
+
+        self.courses = {row['id']: row for row in rows}
+        total = len(rows)
+        self.postings = {}
+        for term, course_weights in postings.items():
+            idf = math.log(1 + total / len(course_weights))
+            self.postings[term] = {course_id: weight * idf for course_id, weight in course_weights.items()}
+
+        for lecturer_id, name in self.lecturers.items():
+            suggestions.extend((key, 'lecturer', lecturer_id) for key in word_starts(name))
+        suggestions.sort()
+        self.suggestion_keys = [key for key, _, _ in suggestions]
+        self.suggestion_targets = [(kind, target) for _, kind, target in suggestions]
+
+        self.terms = sorted(self.postings)
+        self.deletes = defaultdict(list)
+        for term in self.terms:
+            if len(term) >= ONE_TYPO_LENGTH:
+                for variant in _deletes(term) | {term}:
+                    self.deletes[variant].append(term)
+
+    def _prefixed(self, word):
+        position = bisect_left(self.terms, word)
+        matches = []
+        while position < len(self.terms) and len(matches) < MAX_PREFIX_TERMS:
+            term = self.terms[position]
+            if not term.startswith(word):
+                break
+            if term != word:
+                matches.append(term)
+            position += 1
+        return matches
+
+    def _misspelt(self, word):
+        if len(word) < ONE_TYPO_LENGTH:
+            return []
+        limit = 2 if len(word) >= TWO_TYPO_LENGTH else 1
+        candidates = set()
+        for variant in _deletes(word) | {word}:
+            candidates.update(self.deletes.get(variant, ()))
+        candidates.discard(word)
+        return [term for term in candidates if _edit_distance(word, term, limit) <= limit]
+
+    def expand(self, word, is_last):
+        """Indexed terms a query word stands for, each with a score factor."""
+        expansions = {}
+        if word in self.postings:
+            expansions[word] = 1.0
+        if is_last:
+            # The user may still be typing the last word
+            for term in self._prefixed(word):
+                expansions.setdefault(term, PREFIX_FACTOR)
+        if not expansions:
+            for term in self._misspelt(word):
+                expansions[term] = TYPO_FACTOR
+        return expansions
+
+    def search(self, query, **filters):
+        """
+        Rank courses matching every word of ``query`` and restricted to
+        those whose fields equal ``filters``. Returns the ranked course ids
+        and facet counts over them.
+        """
+        words = list(dict.fromkeys(tokenize(query) or [word.casefold() for word in WORD_RE.findall(query)]))
+        scores = None
+        for position, word in enumerate(words):
+            word_scores = {}
+            for term, factor in self.expand(word, position == len(words) - 1).items():
+                for course_id, weight in self.postings[term].items():
+                    if weight * factor > word_scores.get(course_id, 0):
+                        word_scores[course_id] = weight * factor
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    course_id: score + word_scores[course_id]
+                    for course_id, score in scores.items() if course_id in word_scores
+                }
+            if not scores:
+                break
+
+        scores = scores or {}
+        if filters:
+            scores = {
+                course_id: score for course_id, score in scores.items() if self._visible(course_id, filters)
+            }
+        ranked = sorted(scores, key=lambda course_id: (-scores[course_id], self.courses[course_id]['code']))
+        facets = {
+            facet: dict(Counter(self.courses[course_id][facet] for course_id in ranked))
+            for facet in FACETS
+        }
+        return ranked, facets
+
+    def _visible(self, course_id, filters):
+        course = self.courses[course_id]
+        return all(course[field] == value for field, value in filters.items())
+
+    def autocomplete(self, prefix, limit=AUTOCOMPLETE_LIMIT, **filters):
+        """
+        Course codes, course names and lecturer names starting with
+        ``prefix`` (or with a word starting it), codes first. Lecturers are
+        only suggested if one of their courses passes ``filters``.
+        """
+        prefix = ' '.join(prefix.casefold().split())
+        if not prefix:
+            return []
+
+        found = {}
+        position = bisect_left(self.suggestion_keys, prefix)
+        # Scan a bounded slice of the range so a one-letter prefix stays cheap
+        while position < len(self.suggestion_keys) and len(found) < limit * 10:
+            key = self.suggestion_keys[position]
+            if not key.startswith(prefix):
+                break
+            kind, target = self.suggestion_targets[position]
+            position += 1
+            if kind == 'lecturer':
+                visible = any(self._visible(course_id, filters) for course_id in self.lecturer_courses[target])
+                group = 'lecturer'
+            else:
+                visible = self._visible(target, filters)
+                group = 'course'
+            if not visible:
+                continue
+            # Rank by the best way each course or lecturer matched
+            label = self.lecturers[target] if kind == 'lecturer' else self.courses[target][kind]
+            rank = (SUGGESTION_ORDER[kind], not label.casefold().startswith(prefix), len(label), label)
+            if (group, target) not in found or rank < found[group, target]:
+                found[group, target] = rank
+
+        suggestions = []
+        for (group, target), _ in sorted(found.items(), key=lambda item: item[1])[:limit]:
+            if group == 'lecturer':
+                suggestions.append({'type': 'lecturer', 'id': target, 'name': self.lecturers[target]})
+            else:
+                course = self.courses[target]
+                suggestions.append({'type': 'course', 'id': target, 'code': course['code'], 'name': course['name']})
+        return suggestions
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+# The shared version as last read, and when
+_version_check = (None, 0.0)
+
+
+def catalogue_version():
+    """
+    A counter bumped whenever an indexed field changes. It lives in the
+    shared cache, so every worker learns of a change made by any of them,
+    and is re-read at most every VERSION_CHECK_INTERVAL seconds.
+    """
+    global _version_check
+    version, checked_at = _version_check
+    now = time.monotonic()
+    if version is None or now - checked_at >= VERSION_CHECK_INTERVAL:
+        version = cache.get_or_set(VERSION_KEY, time.time_ns, None)
+        _version_check = (version, now)
+    return version
+
+
+def invalidate_catalogue():
+    global _version_check
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+    # This worker sees its own changes at once
+    _version_check = (None, 0.0)
+
+
+def _rebuild(version, close_connection=False):
+    global _index
+    try:
+        index = CatalogueIndex()
+        with _index_lock:
+            _index = (version, index)
+    finally:
+        _rebuild_lock.release()
+        if close_connection:
+            connection.close()
+
+
+def get_catalogue():
+    """
+    This process's catalogue index. The first call builds it; once the
+    shared version moves on, one rebuild is started and the previous index
+    keeps answering until it finishes.
+    """
+    global _index
+    version = catalogue_version()
+    cached = _index
+    if cached is None:
+        with _index_lock:
+            if _index is None:
+                _index = (version, CatalogueIndex())
+            cached = _index
+    elif cached[0] != version and _rebuild_lock.acquire(blocking=False):
+        if REBUILD_IN_BACKGROUND:
+            threading.Thread(target=_rebuild, args=(version, True), daemon=True).start()
+        else:
+            _rebuild(version)
+            cached = _index
+    return cached[1]
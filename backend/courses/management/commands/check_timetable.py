@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course, CourseSchedule
+from courses.timetable import describe, semester_conflicts
+
+
+class Command(BaseCommand):
+    help = 'Report room double-bookings and lecturer clashes for a semester'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', choices=[choice for choice, _ in Course.SEMESTER_CHOICES], default='first')
+        parser.add_argument('--year', type=int, required=True)
+
+    def handle(self, *args, **options):
+        schedules = CourseSchedule.objects.filter(
+            course__semester=options['semester'],
+            course__year=options['year'],
+            course__is_active=True,
+        ).select_related('course')
+
+        conflicts = semester_conflicts(schedules)
+        for kind, schedule, other in conflicts:
+            if kind == 'room':
+                location = ' '.join(part for part in [schedule.room, schedule.building] if part)
+                self.stdout.write(f'Room {location}: {describe(schedule)} overlaps {describe(other)}')
+            else:
+                lecturer = schedule.course.lecturer_id
+                self.stdout.write(f'Lecturer #{lecturer}: {describe(schedule)} overlaps {describe(other)}')
+
+        style = self.style.WARNING if conflicts else self.style.SUCCESS
+        self.stdout.write(style(f'Found {len(conflicts)} conflicts.'))
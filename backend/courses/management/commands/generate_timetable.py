@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course, CourseSchedule
+from courses.scheduler import TimetableProblem, generate_timetable, write_timetable
+
+
+class Command(BaseCommand):
+    help = 'Generate a clash-minimising weekly timetable for a semester and optionally write it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', choices=[choice for choice, _ in Course.SEMESTER_CHOICES], default='first')
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument(
+            '--rooms', default='',
+            help='Comma-separated BUILDING:ROOM list (defaults to every room already in use)',
+        )
+        parser.add_argument('--sessions', type=int, default=2, help='Weekly sessions per course')
+        parser.add_argument('--restarts', type=int, default=4, help='Independent solver runs; the best one wins')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (defaults to the CPU count)')
+        parser.add_argument('--time-limit', type=float, default=60, help='Seconds of local search per restart')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--write', action='store_true', help='Replace the semester\'s schedules with the result')
+
+    def get_rooms(self, option):
+        if option:
+            rooms = []
+            for entry in option.split(','):
+                building, _, room = entry.strip().rpartition(':')
+                rooms.append((building, room))
+            return rooms
+        return list(
+            CourseSchedule.objects.exclude(room='')
+            .order_by('building', 'room')
+            .values_list('building', 'room')
+            .distinct()
+        )
+
+    def handle(self, *args, **options):
+        rooms = self.get_rooms(options['rooms'])
+        if not rooms:
+            raise CommandError('No rooms known; pass --rooms BUILDING:ROOM,...')
+
+        try:
+            problem = TimetableProblem.for_semester(
+                options['semester'], options['year'], rooms, sessions_per_course=options['sessions'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not problem.courses:
+            raise CommandError('No active courses for that semester.')
+        self.stdout.write(
+            f'Scheduling {len(problem.sessions)} sessions for {len(problem.courses)} courses '
+            f'into {len(problem.slots)} slots and {len(rooms)} rooms.'
+        )
+
+        def progress(done, total, best):
+            self.stdout.write(f'Restart {done}/{total}: best cost {best["cost"]}, quality {best["quality"]}%')
+
+        stats, placement = generate_timetable(
+            problem,
+            restarts=options['restarts'],
+            workers=options['workers'],
+            time_limit=options['time_limit'],
+            seed=options['seed'],
+            progress=progress,
+        )
+        self.stdout.write(
+            f'Room clashes: {stats["room_clashes"]}, lecturer clashes: {stats["lecturer_clashes"]}, '
+            f'student clashes: {stats["student_clashes"]}, quality: {stats["quality"]}%'
+        )
+
+        if options['write']:
+            written = write_timetable(problem, placement)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} schedules.'))
+        else:
+            self.stdout.write('Dry run; pass --write to save the timetable.')
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.waitlist import promote_waitlists
+
+
+class Command(BaseCommand):
+    help = 'Promote waitlisted enrollments into free seats, oldest first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Enrollments promoted per transaction')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running, sleeping this many seconds between passes (0 runs a single pass)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            promoted = promote_waitlists(options['batch_size'])
+            if promoted:
+                self.stdout.write(self.style.SUCCESS(f'Promoted {promoted} waitlisted enrollments.'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
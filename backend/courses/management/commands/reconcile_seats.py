@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Reset each course seats_taken counter to its number of active enrollments'
+
+    def handle(self, *args, **options):
+        corrected = Course.objects.reconcile_seats()
+        self.stdout.write(self.style.SUCCESS(f'Corrected seat counts for {corrected} courses.'))
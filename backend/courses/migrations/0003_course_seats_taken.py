@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_seats_taken(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    enrolled = (
+        Enrollment.objects.filter(course=OuterRef('pk'), status='enrolled')
+        .order_by()
+        .values('course')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Course.objects.update(seats_taken=Coalesce(Subquery(enrolled), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_remove_enrollment_grade_points_course_year_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Active enrollments, maintained by enroll/drop for race-free seat checks'),
+        ),
+        migrations.RunPython(backfill_seats_taken, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_seats_taken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseschedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_courseschedule_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'status'], name='enrollment_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'status'], name='enrollment_course_status_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 23:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def move_waitlist_out_of_pending(apps, schema_editor):
+    # Until now a full course waitlisted students as 'pending'
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Enrollment.objects.filter(status='pending').update(status='waitlisted', waitlisted_at=F('enrolled_at'))
+
+
+def move_waitlist_back_to_pending(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Enrollment.objects.filter(status='waitlisted').update(status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='waitlisted_at',
+            field=models.DateTimeField(blank=True, help_text='When the student joined the waitlist; the queue is served in this order', null=True),
+        ),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='status',
+            field=models.CharField(choices=[('enrolled', 'Enrolled'), ('dropped', 'Dropped'), ('completed', 'Completed'), ('pending', 'Pending Approval'), ('waitlisted', 'Waitlisted')], default='enrolled', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['course', 'status', 'waitlisted_at'], name='enrollment_waitlist_idx'),
+        ),
+        migrations.RunPython(move_waitlist_out_of_pending, move_waitlist_back_to_pending),
+    ]
@@ -1,9 +1,99 @@
+from bisect import bisect_right
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 
 User = get_user_model()
 
+# Lower percentage bound of each letter grade, lowest first
+GRADE_BOUNDARIES = [50, 60, 70, 80]
+GRADE_LETTERS = ['F', 'D', 'C', 'B', 'A']
+
+
+def grade_for_score(percentage_score):
+    """Letter grade for a percentage score (A 80-100, B 70-79, ... F 0-49)."""
+    return GRADE_LETTERS[bisect_right(GRADE_BOUNDARIES, percentage_score)]
+
+
+class CourseQuerySet(models.QuerySet):
+    def with_enrollment_stats(self):
+        """
+        Annotate each course with its active enrollment count and pull the
+        lecturer in the same query, so list serializers don't hit the
+        database once per row.
+        """
+        return self.select_related('lecturer').annotate(
+            active_enrollment_count=Count(
+                'enrollments', filter=Q(enrollments__status='enrolled')
+            )
+        )
+
+    def with_detail_prefetches(self):
+        """
+        Prefetch everything CourseDetailSerializer nests, so a course detail
+        payload costs a fixed number of queries however many students,
+        materials or prerequisites it has.
+        """
+        return self.with_enrollment_stats().prefetch_related(
+            'schedules',
+            'students',
+            models.Prefetch(
+                'materials',
+                queryset=CourseMaterial.objects.select_related('uploaded_by'),
+            ),
+            models.Prefetch(
+                'enrollments',
+                queryset=Enrollment.objects.select_related('student'),
+            ),
+            models.Prefetch(
+                'prerequisites',
+                queryset=Course.objects.with_enrollment_stats(),
+            ),
+        )
+
+    def reserve_seat(self, course_id):
+        """
+        Atomically take one seat in an active course if any are left and
+        nobody is waitlisted for one. A single conditional UPDATE, so
+        concurrent enrollments can't oversubscribe. Returns True if a seat
+        was taken.
+        """
+        waiting = Enrollment.objects.filter(course=OuterRef('pk'), status='waitlisted')
+        return self.filter(
+            ~Exists(waiting), pk=course_id, is_active=True, seats_taken__lt=F('max_students')
+        ).update(seats_taken=F('seats_taken') + 1) == 1
+
+    def reserve_seats(self, course_id, count):
+        """Take ``count`` seats at once, all or nothing. Used to promote the waitlist."""
+        return self.filter(
+            pk=course_id, seats_taken__lte=F('max_students') - count
+        ).update(seats_taken=F('seats_taken') + count) == 1
+
+    def release_seat(self, course_id, count=1):
+        return self.filter(pk=course_id, seats_taken__gte=count).update(
+            seats_taken=F('seats_taken') - count
+        ) == 1
+
+    def reconcile_seats(self):
+        """
+        Reset seats_taken to the real number of active enrollments, for
+        courses whose counter has drifted (e.g. after admin edits).
+        Returns the number of courses corrected.
+        """
+        actual = Subquery(
+            Enrollment.objects.filter(course=OuterRef('pk'), status='enrolled')
+            .order_by()
+            .values('course')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return self.annotate(actual_seats=Coalesce(actual, 0)).exclude(
+            seats_taken=F('actual_seats')
+        ).update(seats_taken=Coalesce(actual, 0))
+
+
 class Course(models.Model):
     COURSE_LEVELS = [
         ('100', '100 Level'),
@@ -53,6 +143,11 @@ class Course(models.Model):
         validators=[MinValueValidator(1), MaxValueValidator(200)],
         help_text="Maximum number of students allowed"
     )
+    seats_taken = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Active enrollments, maintained by enroll/drop for race-free seat checks"
+    )
     prerequisites = models.ManyToManyField(
         'self',
         blank=True,
@@ -67,6 +162,8 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CourseQuerySet.as_manager()
+
     class Meta:
         ordering = ['level', 'code']
         verbose_name = 'Course'
@@ -77,7 +174,10 @@ class Course(models.Model):
 
     @property
     def enrollment_count(self):
-        return self.students.count()
+        # Reuse the annotation from CourseQuerySet.with_enrollment_stats() when present
+        if hasattr(self, 'active_enrollment_count'):
+            return self.active_enrollment_count
+        return self.enrollments.filter(status='enrolled').count()
 
     @property
     def is_full(self):
@@ -94,6 +194,7 @@ class Enrollment(models.Model):
         ('dropped', 'Dropped'),
         ('completed', 'Completed'),
         ('pending', 'Pending Approval'),
+        ('waitlisted', 'Waitlisted'),
     ]
 
     student = models.ForeignKey(
@@ -132,10 +233,20 @@ class Enrollment(models.Model):
         ]
     )
     notes = models.TextField(blank=True, help_text="Additional notes")
+    waitlisted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the student joined the waitlist; the queue is served in this order"
+    )
 
     class Meta:
         unique_together = ['student', 'course']
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', 'status'], name='enrollment_student_status_idx'),
+            models.Index(fields=['course', 'status'], name='enrollment_course_status_idx'),
+            models.Index(fields=['course', 'status', 'waitlisted_at'], name='enrollment_waitlist_idx'),
+        ]
         verbose_name = 'Enrollment'
         verbose_name_plural = 'Enrollments'
 
@@ -145,16 +256,7 @@ class Enrollment(models.Model):
     def save(self, *args, **kwargs):
         # Auto-calculate grade based on percentage score
         if self.percentage_score is not None and not self.grade:
-            if self.percentage_score >= 80:
-                self.grade = 'A'
-            elif self.percentage_score >= 70:
-                self.grade = 'B'
-            elif self.percentage_score >= 60:
-                self.grade = 'C'
-            elif self.percentage_score >= 50:
-                self.grade = 'D'
-            else:
-                self.grade = 'F'
+            self.grade = grade_for_score(self.percentage_score)
         super().save(*args, **kwargs)
 
 
@@ -180,6 +282,7 @@ class CourseSchedule(models.Model):
     room = models.CharField(max_length=50, blank=True)
     building = models.CharField(max_length=50, blank=True)
     is_lab = models.BooleanField(default=False, help_text="Is this a laboratory session?")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['course', 'day_of_week', 'start_time']
@@ -0,0 +1,11 @@
+from rest_framework.parsers import BaseParser
+
+
+class CSVTextParser(BaseParser):
+    """
+    Accept a raw ``text/csv`` request body and hand it to the view as text.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
@@ -0,0 +1,154 @@
+import threading
+
+from django.db.models import Count, Max
+
+from .models import Course, Enrollment
+
+# Completed enrollments with these grades don't satisfy a prerequisite
+NON_PASSING_GRADES = ['F', 'W', 'I']
+
+
+class PrerequisiteGraph:
+    """
+    The whole course prerequisite graph, loaded in two queries. Transitive
+    closures are computed on first use per course and memoised, so checking
+    a deep chain costs no queries per level.
+    """
+    def __init__(self):
+        self.courses = {
+            course['id']: course
+            for course in Course.objects.order_by().values('id', 'code', 'name')
+        }
+        self.edges = {course_id: [] for course_id in self.courses}
+        through = Course.prerequisites.through.objects.order_by('to_course__code')
+        for course_id, prerequisite_id in through.values_list('from_course_id', 'to_course_id'):
+            self.edges[course_id].append(prerequisite_id)
+        self._closures = {}
+        self.cycles = self._find_cycles()
+
+    def prerequisites_of(self, course_id):
+        return self.edges.get(course_id, [])
+
+    def closure(self, course_id):
+        """Every course that must be completed before ``course_id``, at any depth."""
+        closure = self._closures.get(course_id)
+        if closure is None:
+            closure = set()
+            stack = list(self.prerequisites_of(course_id))
+            while stack:
+                prerequisite = stack.pop()
+                if prerequisite in closure:
+                    continue
+                closure.add(prerequisite)
+                known = self._closures.get(prerequisite)
+                if known is not None:
+                    closure |= known
+                else:
+                    stack.extend(self.prerequisites_of(prerequisite))
+            closure.discard(course_id)
+            self._closures[course_id] = frozenset(closure)
+            closure = self._closures[course_id]
+        return closure
+
+    def missing_prerequisites(self, course_id, completed_course_ids):
+        return self.closure(course_id) - set(completed_course_ids)
+
+    def cycle_through(self, course_id, prerequisite_ids):
+        """The given prerequisites that would put ``course_id`` on a cycle."""
+        return [
+            prerequisite for prerequisite in prerequisite_ids
+            if prerequisite == course_id or course_id in self.closure(prerequisite)
+        ]
+
+    def _find_cycles(self):
+        """Return each prerequisite cycle as a list of course ids (iterative DFS)."""
+        WHITE, GREY, BLACK = 0, 1, 2
+        colour = dict.fromkeys(self.edges, WHITE)
+        cycles = []
+        for root in self.edges:
+            if colour[root] != WHITE:
+                continue
+            path = [root]
+            colour[root] = GREY
+            iterators = [iter(self.edges[root])]
+            while iterators:
+                child = next(iterators[-1], None)
+                if child is None:
+                    colour[path.pop()] = BLACK
+                    iterators.pop()
+                elif colour.get(child) == GREY:
+                    cycles.append(path[path.index(child):] + [child])
+                elif colour.get(child) == WHITE:
+                    colour[child] = GREY
+                    path.append(child)
+                    iterators.append(iter(self.edges[child]))
+        return cycles
+
+    def tree(self, course_id, _path=(), _expanded=None):
+        """
+        Nested prerequisite tree for a course. Each course is expanded once;
+        later occurrences (shared prerequisites in a diamond) are marked
+        ``repeated`` with no children, so the response grows with the number
+        of edges rather than the number of paths. Where a cycle loops back
+        the node is marked ``cycle``.
+        """
+        if _expanded is None:
+            _expanded = set()
+        course = self.courses[course_id]
+        node = {'id': course_id, 'code': course['code'], 'name': course['name']}
+        if course_id in _path:
+            node['cycle'] = True
+            node['prerequisites'] = []
+            return node
+        if course_id in _expanded:
+            node['repeated'] = True
+            node['prerequisites'] = []
+            return node
+        _expanded.add(course_id)
+        node['prerequisites'] = [
+            self.tree(prerequisite, _path + (course_id,), _expanded)
+            for prerequisite in self.prerequisites_of(course_id)
+        ]
+        return node
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def graph_version():
+    """
+    Fingerprint of the courses and prerequisite edges. Creating, saving or
+    deleting a course changes the course count or latest ``updated_at``;
+    adding or removing an edge changes the edge count or the highest edge
+    id. Read from the database, so changes made by other workers, bulk
+    operations or migrations are all seen.
+    """
+    courses = Course.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+    edges = Course.prerequisites.through.objects.aggregate(count=Count('id'), latest=Max('id'))
+    return courses['count'], courses['latest'], edges['count'], edges['latest']
+
+
+def get_graph(course_id=None):
+    """
+    The prerequisite graph, rebuilt when its version changes. Pass
+    ``course_id`` to also rebuild if that course isn't in the graph yet,
+    e.g. one created between reading the version and the graph.
+    """
+    global _graph
+    version = graph_version()
+    cached = _graph
+    if cached is None or cached[0] != version or (course_id is not None and course_id not in cached[1].courses):
+        with _graph_lock:
+            if _graph is None or _graph[0] != version or (course_id is not None and course_id not in _graph[1].courses):
+                _graph = (version, PrerequisiteGraph())
+            cached = _graph
+    return cached[1]
+
+
+def completed_course_ids(student):
+    return set(
+        Enrollment.objects.filter(student=student, status='completed')
+        .exclude(grade__in=NON_PASSING_GRADES)
+        .values_list('course_id', flat=True)
+    )
@@ -0,0 +1,292 @@
+import random
+import time as clock
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+from itertools import combinations
+
+from django.db import transaction
+
+from .models import Course, CourseSchedule, Enrollment
+from .signals import schedules_replaced
+
+TEACHING_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+DAY_START = time(8)
+DAY_END = time(17)
+SLOT_MINUTES = 90
+SESSIONS_PER_COURSE = 2
+
+# A room or lecturer can't be in two places at once; a shared student
+# costs one per clash, so those are only traded off against each other
+ROOM_PENALTY = 1000
+LECTURER_PENALTY = 1000
+
+
+def teaching_slots(days=TEACHING_DAYS, day_start=DAY_START, day_end=DAY_END, slot_minutes=SLOT_MINUTES):
+    """Every ``(day, start_time, end_time)`` slot in the weekly grid."""
+    length = timedelta(minutes=slot_minutes)
+    slots = []
+    for day in days:
+        start = datetime.combine(datetime.min, day_start)
+        while (start + length).time() <= day_end:
+            slots.append((day, start.time(), (start + length).time()))
+            start += length
+    return slots
+
+
+class TimetableProblem:
+    """
+    Everything the solver needs, as plain lists and dicts so it pickles
+    cheaply into worker processes. Courses, rooms and slots are referred
+    to by their index in these lists.
+    """
+    def __init__(self, courses, rooms, slots, overlap, sessions_per_course=SESSIONS_PER_COURSE):
+        if not 1 <= sessions_per_course <= len(slots):
+            raise ValueError(f'Sessions per course must be between 1 and the {len(slots)} slots in the week.')
+        self.courses = courses
+        self.rooms = rooms
+        self.slots = slots
+        self.overlap = overlap
+        self.lecturers = [course['lecturer_id'] for course in courses]
+        self.sessions = [
+            index for index in range(len(courses)) for _ in range(sessions_per_course)
+        ]
+        days = list(dict.fromkeys(day for day, _, _ in slots))
+        self.slot_days = [days.index(day) for day, _, _ in slots]
+        # A course's sessions go on different days whenever the grid allows it
+        self.distinct_days = sessions_per_course <= len(days)
+
+    @classmethod
+    def for_semester(cls, semester, year, rooms, slots=None, sessions_per_course=SESSIONS_PER_COURSE):
+        """
+        Build the problem for a semester's active courses. Shared students
+        are counted from enrolled and waitlisted enrollments in one query.
+        """
+        courses = list(
+            Course.objects.filter(semester=semester, year=year, is_active=True)
+            .order_by('code')
+            .values('id', 'code', 'lecturer_id')
+        )
+        position = {course['id']: index for index, course in enumerate(courses)}
+
+        by_student = defaultdict(list)
+        enrollments = Enrollment.objects.filter(
+            course__semester=semester, course__year=year, course__is_active=True,
+            status__in=['enrolled', 'pending', 'waitlisted'],
+        ).order_by().values_list('student_id', 'course_id')
+        for student_id, course_id in enrollments:
+            by_student[student_id].append(position[course_id])
+
+        shared = Counter()
+        for course_indexes in by_student.values():
+            shared.update(combinations(sorted(course_indexes), 2))
+        overlap = [{} for _ in courses]
+        for (a, b), count in shared.items():
+            overlap[a][b] = overlap[b][a] = count
+
+        return cls(courses, list(rooms), slots or teaching_slots(), overlap, sessions_per_course)
+
+
+class _Timetable:
+    """Placement of every session plus the occupancy counts used to price a move."""
+    def __init__(self, problem):
+        self.problem = problem
+        self.placement = [None] * len(problem.sessions)
+        self.room_use = Counter()
+        self.lecturer_use = Counter()
+        self.at_slot = defaultdict(Counter)
+        self.course_days = defaultdict(Counter)
+        self.free_rooms = [set(range(len(problem.rooms))) for _ in problem.slots]
+
+    def place(self, session, slot, room):
+        course = self.problem.sessions[session]
+        self.placement[session] = (slot, room)
+        self.room_use[slot, room] += 1
+        self.free_rooms[slot].discard(room)
+        self.lecturer_use[slot, self.problem.lecturers[course]] += 1
+        self.at_slot[slot][course] += 1
+        self.course_days[course][self.problem.slot_days[slot]] += 1
+
+    def remove(self, session):
+        course = self.problem.sessions[session]
+        slot, room = self.placement[session]
+        self.placement[session] = None
+        self.room_use[slot, room] -= 1
+        if not self.room_use[slot, room]:
+            self.free_rooms[slot].add(room)
+        self.lecturer_use[slot, self.problem.lecturers[course]] -= 1
+        self.at_slot[slot][course] -= 1
+        if not self.at_slot[slot][course]:
+            del self.at_slot[slot][course]
+        self.course_days[course][self.problem.slot_days[slot]] -= 1
+        return slot, room
+
+    def pick_room(self, slot):
+        free = self.free_rooms[slot]
+        if free:
+            return next(iter(free))
+        return min(range(len(self.problem.rooms)), key=lambda room: self.room_use[slot, room])
+
+    def cost(self, course, slot, room):
+        """What placing one more session of ``course`` at ``slot``/``room`` would add."""
+        problem = self.problem
+        # Two sessions of a course can't share a slot, even in different rooms
+        if self.at_slot[slot][course]:
+            return None
+        if problem.distinct_days and self.course_days[course][problem.slot_days[slot]]:
+            return None
+        cost = ROOM_PENALTY * self.room_use[slot, room]
+        cost += LECTURER_PENALTY * self.lecturer_use[slot, problem.lecturers[course]]
+        shared, present = problem.overlap[course], self.at_slot[slot]
+        if len(shared) < len(present):
+            cost += sum(count * present[other] for other, count in shared.items() if other in present)
+        else:
+            cost += sum(shared[other] * count for other, count in present.items() if other in shared)
+        return cost
+
+    def best_move(self, session, rng):
+        course = self.problem.sessions[session]
+        best, best_cost = [], None
+        for slot in range(len(self.problem.slots)):
+            room = self.pick_room(slot)
+            cost = self.cost(course, slot, room)
+            if cost is None:
+                continue
+            if best_cost is None or cost < best_cost:
+                best, best_cost = [(slot, room)], cost
+            elif cost == best_cost:
+                best.append((slot, room))
+        return rng.choice(best), best_cost
+
+
+def _solve(problem, seed, iterations, time_limit):
+    """One greedy construction followed by min-conflicts local search."""
+    rng = random.Random(seed)
+    timetable = _Timetable(problem)
+
+    # Hardest courses first: most shared students and busiest lecturers,
+    # with a little noise so each restart explores a different order
+    lecturer_load = Counter(problem.lecturers)
+    weight = [
+        sum(problem.overlap[course].values()) + 10 * lecturer_load[problem.lecturers[course]]
+        for course in range(len(problem.courses))
+    ]
+    order = sorted(range(len(problem.sessions)), key=lambda s: -weight[problem.sessions[s]] * rng.uniform(0.8, 1.2))
+    for session in order:
+        (slot, room), _ = timetable.best_move(session, rng)
+        timetable.place(session, slot, room)
+
+    deadline = clock.monotonic() + time_limit
+    sessions = range(len(problem.sessions))
+    for _ in range(iterations):
+        if clock.monotonic() > deadline:
+            break
+        # Tournament selection: move the worst-placed of a few random sessions
+        worst, worst_cost = None, -1
+        for session in rng.sample(sessions, min(8, len(sessions))):
+            course = problem.sessions[session]
+            slot, room = timetable.remove(session)
+            cost = timetable.cost(course, slot, room)
+            timetable.place(session, slot, room)
+            if cost > worst_cost:
+                worst, worst_cost = session, cost
+        if worst_cost == 0:
+            continue
+        timetable.remove(worst)
+        (slot, room), _ = timetable.best_move(worst, rng)
+        timetable.place(worst, slot, room)
+
+    return evaluate(problem, timetable.placement), timetable.placement
+
+
+def evaluate(problem, placement):
+    """
+    Score a placement. ``cost`` is what the solver minimises; ``quality`` is
+    the percentage of sessions with no room, lecturer or student clash.
+    """
+    by_room = defaultdict(list)
+    by_lecturer = defaultdict(list)
+    by_slot = defaultdict(list)
+    for session, (slot, room) in enumerate(placement):
+        course = problem.sessions[session]
+        by_room[slot, room].append(session)
+        by_lecturer[slot, problem.lecturers[course]].append(session)
+        by_slot[slot].append(session)
+
+    clashing = set()
+    stats = {'room_clashes': 0, 'lecturer_clashes': 0, 'student_clashes': 0}
+    for key, groups in [('room_clashes', by_room), ('lecturer_clashes', by_lecturer)]:
+        for group in groups.values():
+            if len(group) > 1:
+                stats[key] += len(group) * (len(group) - 1) // 2
+                clashing.update(group)
+    for group in by_slot.values():
+        for a, b in combinations(group, 2):
+            shared = problem.overlap[problem.sessions[a]].get(problem.sessions[b], 0)
+            if shared:
+                stats['student_clashes'] += shared
+                clashing.update([a, b])
+
+    stats['cost'] = (
+        ROOM_PENALTY * stats['room_clashes']
+        + LECTURER_PENALTY * stats['lecturer_clashes']
+        + stats['student_clashes']
+    )
+    total = len(placement)
+    stats['quality'] = round(100 * (total - len(clashing)) / total, 1) if total else 100.0
+    return stats
+
+
+def generate_timetable(problem, restarts=4, workers=None, iterations=None, time_limit=60, seed=None, progress=None):
+    """
+    Solve ``problem`` from ``restarts`` independent starting points, in a
+    process pool unless ``workers`` is 1, and return ``(stats, placement)``
+    for the cheapest. ``progress(done, restarts, best_stats)`` is called as
+    each restart finishes.
+    """
+    if iterations is None:
+        iterations = 20 * len(problem.sessions)
+    base_seed = random.Random(seed).randrange(2 ** 32)
+    seeds = [base_seed + number for number in range(restarts)]
+
+    best = None
+    if workers == 1:
+        results = (_solve(problem, s, iterations, time_limit) for s in seeds)
+        for done, result in enumerate(results, start=1):
+            if best is None or result[0]['cost'] < best[0]['cost']:
+                best = result
+            if progress:
+                progress(done, restarts, best[0])
+        return best
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_solve, problem, s, iterations, time_limit) for s in seeds]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            if best is None or result[0]['cost'] < best[0]['cost']:
+                best = result
+            if progress:
+                progress(done, restarts, best[0])
+    return best
+
+
+def write_timetable(problem, placement, batch_size=500):
+    """Replace the schedules of every course in the problem with ``placement``."""
+    schedules = []
+    for session, (slot, room) in enumerate(placement):
+        day, start_time, end_time = problem.slots[slot]
+        building, room_name = problem.rooms[room]
+        schedules.append(CourseSchedule(
+            course_id=problem.courses[problem.sessions[session]]['id'],
+            day_of_week=day,
+            start_time=start_time,
+            end_time=end_time,
+            room=room_name,
+            building=building,
+        ))
+    course_ids = [course['id'] for course in problem.courses]
+    with transaction.atomic():
+        CourseSchedule.objects.filter(course_id__in=course_ids).delete()
+        CourseSchedule.objects.bulk_create(schedules, batch_size=batch_size)
+    schedules_replaced.send(sender=CourseSchedule, course_ids=course_ids)
+    return len(schedules)
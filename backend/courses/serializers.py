@@ -1,5 +1,9 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Course, Enrollment, CourseSchedule, CourseMaterial
+from .prerequisites import completed_course_ids, get_graph
+from .timetable import schedule_clashes, student_clashes
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -10,11 +14,41 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'email', 'role']
 
 
+class CourseScheduleWeekSerializer(serializers.ModelSerializer):
+    course_code = serializers.CharField(source='course.code', read_only=True)
+    course_name = serializers.CharField(source='course.name', read_only=True)
+
+    class Meta:
+        model = CourseSchedule
+        fields = [
+            'id', 'course', 'course_code', 'course_name', 'start_time', 'end_time',
+            'room', 'building', 'is_lab'
+        ]
+
+
 class CourseScheduleSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseSchedule
         fields = '__all__'
 
+    def validate(self, data):
+        def current(field):
+            return data.get(field, getattr(self.instance, field, None))
+
+        start_time, end_time = current('start_time'), current('end_time')
+        if start_time >= end_time:
+            raise serializers.ValidationError("end_time must be after start_time.")
+
+        # Check room double-booking and lecturer clashes
+        clashes = schedule_clashes(
+            current('day_of_week'), start_time, end_time, current('course'),
+            room=current('room') or '', building=current('building') or '',
+            exclude_id=self.instance.id if self.instance else None,
+        )
+        if clashes:
+            raise serializers.ValidationError(clashes)
+        return data
+
 
 class CourseMaterialSerializer(serializers.ModelSerializer):
     uploaded_by = UserSerializer(read_only=True)
@@ -32,7 +66,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = '__all__'
-        read_only_fields = ['enrolled_at']
+        read_only_fields = ['enrolled_at', 'waitlisted_at']
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -50,7 +84,22 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class CourseListSerializer(serializers.ModelSerializer):
+class IsEnrolledMixin:
+    """
+    Resolves ``is_enrolled`` from the ``enrolled_course_ids`` set placed in the
+    serializer context by the view, falling back to a per-course query.
+    """
+    def get_is_enrolled(self, obj):
+        enrolled_course_ids = self.context.get('enrolled_course_ids')
+        if enrolled_course_ids is not None:
+            return obj.id in enrolled_course_ids
+        request = self.context.get('request')
+        if request and request.user.is_authenticated and request.user.role == 'student':
+            return Enrollment.objects.filter(student=request.user, course=obj).exists()
+        return False
+
+
+class CourseListSerializer(IsEnrolledMixin, serializers.ModelSerializer):
     lecturer_name = serializers.CharField(source='lecturer.get_full_name', read_only=True)
     enrollment_count = serializers.ReadOnlyField()
     is_full = serializers.ReadOnlyField()
@@ -65,12 +114,6 @@ class CourseListSerializer(serializers.ModelSerializer):
             'is_full', 'available_spots', 'is_active', 'semester', 'year',
             'is_enrolled', 'created_at', 'updated_at'
         ]
-    
-    def get_is_enrolled(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated and request.user.role == 'student':
-            return Enrollment.objects.filter(student=request.user, course=obj).exists()
-        return False
 
 
 class CourseCreateSerializer(serializers.ModelSerializer):
@@ -101,22 +144,48 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
         if Enrollment.objects.filter(student=student, course=course).exists():
             raise serializers.ValidationError("You are already enrolled in this course.")
         
-        # Check if course is full
-        if course.is_full:
-            raise serializers.ValidationError("This course is full.")
-        
         # Check if course is active
         if not course.is_active:
             raise serializers.ValidationError("This course is not active.")
         
+        # Check prerequisites (at every depth) against the student's passed courses
+        graph = get_graph(course.id)
+        missing = graph.missing_prerequisites(course.id, completed_course_ids(student))
+        if missing:
+            codes = sorted(graph.courses[course_id]['code'] for course_id in missing)
+            raise serializers.ValidationError(
+                f"Missing prerequisites: {', '.join(codes)}."
+            )
+        
+        # Check for clashes with the student's timetable
+        clashes = student_clashes(student, course)
+        if clashes:
+            raise serializers.ValidationError(clashes)
+        
+        # Whether the course is full is decided atomically in create()
         return data
 
     def create(self, validated_data):
         validated_data['student'] = self.context['request'].user
-        return super().create(validated_data)
-
-
-class CourseDetailSerializer(serializers.ModelSerializer):
+        course = validated_data['course']
+        try:
+            with transaction.atomic():
+                # The conditional seat UPDATE is what prevents oversubscription;
+                # if the insert fails the seat is rolled back with it. When the
+                # course is full the student joins the waitlist.
+                if validated_data.get('status', 'enrolled') == 'enrolled':
+                    if not Course.objects.reserve_seat(course.pk):
+                        validated_data['status'] = 'waitlisted'
+                if validated_data.get('status') == 'waitlisted':
+                    validated_data['waitlisted_at'] = timezone.now()
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'non_field_errors': ["You are already enrolled in this course."]}
+            )
+
+
+class CourseDetailSerializer(IsEnrolledMixin, serializers.ModelSerializer):
     lecturer = UserSerializer(read_only=True)
     enrollment_count = serializers.ReadOnlyField()
     is_full = serializers.ReadOnlyField()
@@ -130,9 +199,3 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = '__all__'
-    
-    def get_is_enrolled(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated and request.user.role == 'student':
-            return Enrollment.objects.filter(student=request.user, course=obj).exists()
-        return False 
\ No newline at end of file
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Course
+from .catalogue import INDEXED_COURSE_FIELDS, INDEXED_LECTURER_FIELDS, invalidate_catalogue
+
+# Sent with ``student_ids`` after enrollment statuses change through a
+# queryset update(), which bypasses post_save
+enrollment_status_changed = Signal()
+
+# Sent with ``course_ids`` after a course's schedules are replaced in bulk
+schedules_replaced = Signal()
+
+
+def _indexed_values(instance, fields, update_fields, raw):
+    """
+    The stored values of the indexed ``fields`` before a save, or None when
+    the save can't change them (a new row, or ``update_fields`` without any
+    of them, such as a last_login update).
+    """
+    if raw or not instance.pk:
+        return None
+    if update_fields is not None:
+        names = {field.removesuffix('_id') for field in fields}
+        if not {field.removesuffix('_id') for field in update_fields} & names:
+            return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def _indexed_fields_changed(instance, fields, created):
+    stored = getattr(instance, '_catalogue_values', None)
+    return created or (stored is not None and stored != tuple(getattr(instance, field) for field in fields))
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_catalogue_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._catalogue_values = _indexed_values(instance, INDEXED_COURSE_FIELDS, update_fields, raw)
+
+
+@receiver(post_save, sender=Course)
+def reset_catalogue_index(sender, instance, created, raw=False, **kwargs):
+    # Bumped on commit so other workers rebuild from the committed rows
+    if not raw and _indexed_fields_changed(instance, INDEXED_COURSE_FIELDS, created):
+        transaction.on_commit(invalidate_catalogue)
+
+
+@receiver(post_delete, sender=Course)
+def drop_from_catalogue_index(sender, **kwargs):
+    transaction.on_commit(invalidate_catalogue)
+
+
+@receiver(pre_save, sender=get_user_model())
+def remember_lecturer_catalogue_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._catalogue_values = None
+    # Lecturer names are part of the autocomplete index
+    if instance.role == 'lecturer':
+        instance._catalogue_values = _indexed_values(instance, INDEXED_LECTURER_FIELDS, update_fields, raw)
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_catalogue_lecturer_names(sender, instance, raw=False, **kwargs):
+    # A new lecturer has no courses yet, so only renames matter
+    if not raw and _indexed_fields_changed(instance, INDEXED_LECTURER_FIELDS, created=False):
+        transaction.on_commit(invalidate_catalogue)
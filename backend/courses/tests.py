@@ -1,3 +1,904 @@
-from django.test import TestCase
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time, timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.forms.models import model_to_dict
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .admin import CourseAdminForm
+from .models import Course, CourseMaterial, CourseSchedule, Enrollment
+from .catalogue import VERSION_KEY, catalogue_version, get_catalogue, invalidate_catalogue
+from .prerequisites import get_graph
+from .scheduler import TimetableProblem, generate_timetable, teaching_slots, write_timetable
+from .timetable import IntervalIndex, semester_conflicts
+
+User = get_user_model()
+
+
+class CourseListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='staff1', password='pass', role='staff')
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='pass', role='student')
+            for i in range(3)
+        ]
+        self.course_count = 0
+
+    def create_courses(self, count):
+        for _ in range(count):
+            self.course_count += 1
+            course = Course.objects.create(
+                code=f'IT{self.course_count:03d}',
+                name=f'Course {self.course_count}',
+                description='Test course',
+                credits=3,
+                lecturer=self.lecturer,
+            )
+            for student in self.students:
+                Enrollment.objects.create(student=student, course=course)
+
+    def count_list_queries(self, user, url='/api/courses/'):
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self.create_courses(2)
+        small, _ = self.count_list_queries(self.staff)
+        self.create_courses(10)
+        large, response = self.count_list_queries(self.staff)
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 12)
+
+    def test_my_courses_query_count_is_constant(self):
+        self.create_courses(2)
+        small, _ = self.count_list_queries(self.lecturer, '/api/courses/my_courses/')
+        self.create_courses(10)
+        large, _ = self.count_list_queries(self.lecturer, '/api/courses/my_courses/')
+        self.assertEqual(small, large)
+
+    def test_enrollment_count_ignores_dropped(self):
+        self.create_courses(1)
+        course = Course.objects.get()
+        Enrollment.objects.filter(course=course, student=self.students[0]).update(status='dropped')
+        _, response = self.count_list_queries(self.staff)
+        row = response.data['results'][0]
+        self.assertEqual(row['enrollment_count'], 2)
+        self.assertEqual(row['available_spots'], course.max_students - 2)
+        self.assertEqual(course.enrollment_count, 2)
+
+    def test_student_list_resolves_is_enrolled_in_one_query(self):
+        self.create_courses(2)
+        small, _ = self.count_list_queries(self.students[0])
+        self.create_courses(10)
+        Course.objects.create(
+            code='IT999', name='Not enrolled', description='Test course', credits=3, lecturer=self.lecturer,
+        )
+        large, response = self.count_list_queries(self.students[0])
+        self.assertEqual(small, large)
+        enrolled = {row['code']: row['is_enrolled'] for row in response.data['results']}
+        self.assertFalse(enrolled.pop('IT999'))
+        self.assertTrue(all(enrolled.values()))
+
+
+class CourseDetailQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.course = Course.objects.create(
+            code='IT301', name='Detail course', description='Test course', credits=3,
+            lecturer=self.lecturer, max_students=200,
+        )
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.extra = 0
+
+    def grow_course(self, count):
+        for _ in range(count):
+            self.extra += 1
+            student = User.objects.create_user(username=f'extra{self.extra}', password='pass', role='student')
+            Enrollment.objects.create(student=student, course=self.course)
+            CourseMaterial.objects.create(
+                course=self.course, title=f'Notes {self.extra}', material_type='lecture_notes',
+                uploaded_by=self.lecturer,
+            )
+            CourseSchedule.objects.create(
+                course=self.course, day_of_week='monday', start_time=time(8 + self.extra % 10, self.extra // 10),
+                end_time=time(18, 0),
+            )
+            prerequisite = Course.objects.create(
+                code=f'PRE{self.extra:03d}', name=f'Prerequisite {self.extra}', description='Test course',
+                credits=3, lecturer=self.lecturer,
+            )
+            Enrollment.objects.create(student=student, course=prerequisite)
+            self.course.prerequisites.add(prerequisite)
+
+    def count_detail_queries(self):
+        self.client.force_authenticate(user=self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/courses/{self.course.id}/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_retrieve_query_count_is_constant(self):
+        self.grow_course(1)
+        small, _ = self.count_detail_queries()
+        self.grow_course(20)
+        large, response = self.count_detail_queries()
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 8)
+        self.assertEqual(response.data['enrollment_count'], 22)
+        self.assertTrue(response.data['is_enrolled'])
+        self.assertEqual(len(response.data['prerequisites']), 21)
+        self.assertEqual(response.data['prerequisites'][0]['enrollment_count'], 1)
+        self.assertEqual(response.data['enrollments'][0]['course_code'], 'IT301')
+
+
+class BulkGradeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.course = Course.objects.create(
+            code='IT201', name='Graded course', description='Test course', credits=3,
+            lecturer=self.lecturer, max_students=1000,
+        )
+        self.students = self.enroll(3)
+        self.url = f'/api/courses/{self.course.id}/grades/bulk/'
+        self.client.force_authenticate(user=self.lecturer)
+
+    def enroll(self, count):
+        start = Enrollment.objects.count()
+        students = User.objects.bulk_create([
+            User(username=f'student{start + i}', role='student') for i in range(count)
+        ])
+        Enrollment.objects.bulk_create([Enrollment(student=student, course=self.course) for student in students])
+        return students
+
+    def grades(self):
+        return dict(
+            Enrollment.objects.filter(course=self.course)
+            .values_list('student__username', 'grade')
+        )
+
+    def test_csv_body_and_file_upload(self):
+        csv_text = 'username,percentage_score,grade\nstudent0,91.5,\nstudent1,55,B\n'
+        response = self.client.post(self.url, csv_text, content_type='text/csv')
+        self.assertEqual(response.data, {'updated': 2, 'errors': []})
+        self.assertEqual(self.grades(), {'student0': 'A', 'student1': 'B', 'student2': None})
+
+        upload = SimpleUploadedFile('grades.csv', f'student,percentage_score\n{self.students[2].id},49.99\n'.encode())
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(self.grades()['student2'], 'F')
+
+    def test_json_rows_derive_grades_from_scores(self):
+        rows = [
+            {'username': 'student0', 'percentage_score': 80},
+            {'username': 'student1', 'percentage_score': '79.994'},
+            {'student': self.students[2].id, 'percentage_score': '59.99'},
+        ]
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, 200)
+        self.assertEqual(self.grades(), {'student0': 'A', 'student1': 'B', 'student2': 'D'})
+        enrollment = Enrollment.objects.get(student=self.students[1])
+        self.assertEqual(str(enrollment.percentage_score), '79.99')
+
+        response = self.client.post(self.url, {'grades': [{'username': 'student0', 'percentage_score': 10}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.grades()['student0'], 'F')
+
+    def test_any_invalid_row_rejects_the_whole_sheet(self):
+        Enrollment.objects.filter(student=self.students[2]).update(status='dropped')
+        rows = [
+            {'username': 'student0', 'percentage_score': 75},
+            {'username': 'student0', 'percentage_score': 76},
+            {'username': 'student1', 'percentage_score': 'high'},
+            {'username': 'student1', 'percentage_score': 101},
+            {'username': 'student2', 'percentage_score': 60},
+            {'username': 'nobody', 'percentage_score': 60},
+            {'percentage_score': 60},
+            {'username': 'student1', 'percentage_score': 60, 'grade': 'Z'},
+            'student1,60',
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['updated'], 0)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5, 6, 7, 8, 9])
+        self.assertIn('Duplicate', response.data['errors'][0]['error'])
+        self.assertIn('not enrolled', response.data['errors'][3]['error'])
+        self.assertEqual(set(self.grades().values()), {None})
+        self.assertEqual(self.client.post(self.url, 'not json', content_type='application/json').status_code, 400)
+
+    def test_only_the_course_lecturer_or_staff_can_grade(self):
+        rows = [{'username': 'student0', 'percentage_score': 90}]
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, 403)
+        other = User.objects.create_user(username='lecturer2', password='pass', role='lecturer')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, 404)
+        staff = User.objects.create_user(username='staff1', password='pass', role='staff')
+        self.client.force_authenticate(user=staff)
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, 200)
+
+    def test_one_update_per_distinct_mark(self):
+        self.enroll(2997)
+        usernames = Enrollment.objects.filter(course=self.course).order_by('id').values_list('student__username', flat=True)
+        # Whole marks, as a cohort's sheet mostly has
+        rows = [{'username': username, 'percentage_score': i % 40 + 60} for i, username in enumerate(usernames)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data['updated'], 3000)
+        updates = [query for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+        # 40 marks of 75 rows each, every one within a single batch
+        self.assertEqual(len(updates), 40)
+        self.assertTrue(all('CASE' not in query['sql'] for query in updates))
+        self.assertEqual(Enrollment.objects.get(student__username='student20').grade, 'A')
+
+
+class EnrollmentSeatTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='staff1', password='pass', role='staff')
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.course = self.create_course('IT301', seats=2)
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='pass', role='student') for i in range(3)
+        ]
+
+    def create_course(self, code, seats):
+        return Course.objects.create(
+            code=code, name=code, description='Test course', credits=3, lecturer=self.lecturer, max_students=seats,
+        )
+
+    def enroll(self, student, course=None, status='enrolled'):
+        course = course or self.course
+        if status == 'enrolled':
+            self.assertTrue(Course.objects.reserve_seat(course.pk))
+        waitlisted_at = timezone.now() if status == 'waitlisted' else None
+        return Enrollment.objects.create(student=student, course=course, status=status, waitlisted_at=waitlisted_at)
+
+    def seats_taken(self, course=None):
+        return Course.objects.get(pk=(course or self.course).pk).seats_taken
+
+    def patch(self, user, enrollment, data):
+        self.client.force_authenticate(user=user)
+        return self.client.patch(f'/api/enrollments/{enrollment.id}/', data, format='json')
+
+    def test_status_changes_take_and_free_seats(self):
+        enrollment = self.enroll(self.students[0])
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'status': 'dropped'}).status_code, 200)
+        self.assertEqual(self.seats_taken(), 0)
+        # Saving the same status again doesn't free another seat
+        self.enroll(self.students[1])
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'status': 'dropped'}).status_code, 200)
+        self.assertEqual(self.seats_taken(), 1)
+
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'status': 'enrolled'}).status_code, 200)
+        self.assertEqual(self.seats_taken(), 2)
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'status': 'completed'}).status_code, 200)
+        self.assertEqual(self.seats_taken(), 1)
+
+    def test_approving_the_waitlist_checks_capacity(self):
+        self.enroll(self.students[0])
+        self.enroll(self.students[1])
+        waiting = self.enroll(self.students[2], status='waitlisted')
+        response = self.patch(self.lecturer, waiting, {'status': 'enrolled'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+        self.assertEqual(Enrollment.objects.get(pk=waiting.pk).status, 'waitlisted')
+
+        Course.objects.filter(pk=self.course.pk).update(max_students=3)
+        self.assertEqual(self.patch(self.lecturer, waiting, {'status': 'enrolled'}).status_code, 200)
+        self.assertEqual(self.seats_taken(), 3)
+
+    def test_reenrolling_does_not_jump_the_waitlist(self):
+        dropped = self.enroll(self.students[0], status='dropped')
+        self.enroll(self.students[1])
+        self.enroll(self.students[2], status='waitlisted')
+        self.assertEqual(self.patch(self.lecturer, dropped, {'status': 'enrolled'}).status_code, 400)
+        self.assertEqual(self.seats_taken(), 1)
+
+    def test_moving_course_moves_the_seat(self):
+        other = self.create_course('IT302', seats=1)
+        enrollment = self.enroll(self.students[0])
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'course': other.id}).status_code, 200)
+        self.assertEqual((self.seats_taken(), self.seats_taken(other)), (0, 1))
+
+        blocked = self.enroll(self.students[1])
+        self.assertEqual(self.patch(self.lecturer, blocked, {'course': other.id}).status_code, 400)
+        self.assertEqual((self.seats_taken(), self.seats_taken(other)), (1, 1))
+
+    def test_students_can_only_drop(self):
+        enrollment = self.enroll(self.students[1])
+        waiting = self.enroll(self.students[0], status='waitlisted')
+        self.assertEqual(self.patch(self.students[0], waiting, {'status': 'enrolled'}).status_code, 403)
+        self.assertEqual(self.patch(self.students[1], enrollment, {'status': 'dropped'}).status_code, 200)
+        self.assertEqual(self.patch(self.students[0], waiting, {'status': 'dropped'}).status_code, 200)
+        self.assertEqual(self.seats_taken(), 0)
+
+    def test_leaving_a_seat_promotes_the_waitlist(self):
+        enrollment = self.enroll(self.students[0])
+        self.enroll(self.students[1])
+        first = self.enroll(self.students[2], status='waitlisted')
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'status': 'completed'}).status_code, 200)
+        self.assertEqual(Enrollment.objects.get(pk=first.pk).status, 'enrolled')
+        self.assertEqual(self.seats_taken(), 2)
+
+        # Waitlisting again goes to the back of the queue
+        self.assertEqual(self.patch(self.lecturer, enrollment, {'status': 'waitlisted'}).status_code, 200)
+        late = User.objects.create_user(username='student3', password='pass', role='student')
+        self.enroll(late, status='waitlisted')
+        Enrollment.objects.filter(student=late).update(waitlisted_at=timezone.now() - timedelta(days=1))
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.delete(f'/api/enrollments/{first.id}/').status_code, 204)
+        statuses = dict(Enrollment.objects.values_list('student__username', 'status'))
+        self.assertEqual(statuses, {'student0': 'waitlisted', 'student1': 'enrolled', 'student3': 'enrolled'})
+
+    def test_pending_approval_is_not_a_waitlist(self):
+        self.enroll(self.students[0], status='pending')
+        self.assertTrue(Course.objects.reserve_seat(self.course.pk))
+
+    def test_delete_frees_an_enrolled_seat_only(self):
+        enrolled = self.enroll(self.students[0])
+        waiting = self.enroll(self.students[1], status='waitlisted')
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.delete(f'/api/enrollments/{waiting.id}/').status_code, 204)
+        self.assertEqual(self.seats_taken(), 1)
+        self.assertEqual(self.client.delete(f'/api/enrollments/{enrolled.id}/').status_code, 204)
+        self.assertEqual(self.seats_taken(), 0)
+
+
+class PrerequisiteGraphTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        # IT100 <- IT200 <- IT300, and IT250 also needs IT100
+        self.courses = {code: self.create_course(code) for code in ['IT100', 'IT200', 'IT250', 'IT300']}
+        self.require('IT200', 'IT100')
+        self.require('IT250', 'IT100')
+        self.require('IT300', 'IT200', 'IT250')
+
+    def create_course(self, code):
+        return Course.objects.create(code=code, name=code, description='Test course', credits=3, lecturer=self.lecturer)
+
+    def require(self, code, *prerequisites):
+        self.courses[code].prerequisites.add(*(self.courses[prerequisite] for prerequisite in prerequisites))
+
+    def ids(self, *codes):
+        return {self.courses[code].id for code in codes}
+
+    def complete(self, code, grade='B'):
+        Enrollment.objects.create(student=self.student, course=self.courses[code], status='completed', grade=grade)
+
+    def tree(self, code):
+        self.client.force_authenticate(user=self.student)
+        return self.client.get(f'/api/courses/{self.courses[code].id}/prerequisite_tree/')
+
+    def test_closure_covers_every_depth(self):
+        graph = get_graph()
+        self.assertEqual(graph.closure(self.courses['IT300'].id), self.ids('IT100', 'IT200', 'IT250'))
+        self.assertEqual(graph.closure(self.courses['IT100'].id), set())
+        self.assertEqual(
+            graph.missing_prerequisites(self.courses['IT300'].id, self.ids('IT200')), self.ids('IT100', 'IT250'),
+        )
+
+    def test_enrollment_needs_every_prerequisite_passed(self):
+        self.complete('IT100')
+        self.complete('IT200')
+        self.complete('IT250', grade='F')
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(f'/api/courses/{self.courses["IT300"].id}/enroll/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Missing prerequisites: IT250.', str(response.data))
+
+        Enrollment.objects.filter(course=self.courses['IT250']).update(grade='C')
+        self.assertEqual(self.client.post(f'/api/courses/{self.courses["IT300"].id}/enroll/').status_code, 201)
+
+    def test_changes_without_signals_reach_the_graph(self):
+        self.assertEqual(self.tree('IT300').status_code, 200)
+        # bulk_create and raw through-table inserts don't send post_save or m2m_changed
+        [course] = Course.objects.bulk_create([
+            Course(code='IT400', name='IT400', description='Test course', credits=3, lecturer=self.lecturer),
+        ])
+        Course.prerequisites.through.objects.bulk_create([
+            Course.prerequisites.through(from_course=course, to_course=self.courses['IT300']),
+        ])
+        self.courses['IT400'] = course
+        response = self.tree('IT400')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['missing'], ['IT100', 'IT200', 'IT250', 'IT300'])
+
+        Course.prerequisites.through.objects.filter(from_course=course).delete()
+        self.assertEqual(self.tree('IT400').data['missing'], [])
+
+    def test_tree_expands_shared_prerequisites_once(self):
+        response = self.tree('IT300')
+        self.assertFalse(response.data['has_cycle'])
+        it200, it250 = response.data['prerequisites']
+        self.assertEqual(it200['prerequisites'][0]['code'], 'IT100')
+        self.assertNotIn('repeated', it200['prerequisites'][0])
+        self.assertTrue(it250['prerequisites'][0]['repeated'])
+
+        # 30 stacked diamonds have 2**30 paths but only 91 nodes to emit
+        previous = self.courses['IT300']
+        for level in range(30):
+            left, right, joined = (self.create_course(f'D{level}{side}') for side in 'LRJ')
+            left.prerequisites.add(previous)
+            right.prerequisites.add(previous)
+            joined.prerequisites.add(left, right)
+            previous = joined
+
+        def count(node):
+            return 1 + sum(count(child) for child in node['prerequisites'])
+
+        self.assertEqual(count(get_graph().tree(previous.id)), 30 * 4 + 5)
+
+    def test_cycles_are_reported_and_rejected(self):
+        self.require('IT100', 'IT300')
+        response = self.tree('IT300')
+        self.assertTrue(response.data['has_cycle'])
+        looped = response.data['prerequisites'][0]['prerequisites'][0]['prerequisites'][0]
+        self.assertEqual((looped['code'], looped.get('cycle')), ('IT300', True))
+        self.courses['IT100'].prerequisites.clear()
+
+        course = self.courses['IT100']
+        data = {**model_to_dict(course), 'prerequisites': [self.courses['IT300'].id]}
+        form = CourseAdminForm(data, instance=course)
+        self.assertFalse(form.is_valid())
+        self.assertIn('IT300', form.errors['prerequisites'][0])
+        data['prerequisites'] = [course.id]
+        self.assertFalse(CourseAdminForm(data, instance=course).is_valid())
+        data = {**model_to_dict(self.courses['IT300']), 'prerequisites': [course.id]}
+        self.assertTrue(CourseAdminForm(data, instance=self.courses['IT300']).is_valid())
+
+
+class ConcurrentEnrollmentTests(TransactionTestCase):
+    seats = 5
+    applicants = 30
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.file_copy = None
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Threads can't share an in-memory database, so this class runs
+            # against a copy of it in a temporary file
+            cls.memory_db = (connection.settings_dict['NAME'], connection.settings_dict.get('OPTIONS', {}))
+            fd, cls.file_copy = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            connection.ensure_connection()
+            with sqlite3.connect(cls.file_copy) as target:
+                connection.connection.backup(target)
+            cls.memory_connection, connection.connection = connection.connection, None
+            connection.settings_dict['NAME'] = cls.file_copy
+            # Take the write lock up front so waiting writers queue on the busy timeout
+            connection.settings_dict['OPTIONS'] = {**cls.memory_db[1], 'transaction_mode': 'IMMEDIATE'}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.file_copy:
+            connection.close()
+            connection.settings_dict['NAME'], connection.settings_dict['OPTIONS'] = cls.memory_db
+            connection.connection = cls.memory_connection
+            os.remove(cls.file_copy)
+        super().tearDownClass()
+
+    def setUp(self):
+        lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.course = Course.objects.create(
+            code='IT401', name='Popular course', description='Test course', credits=3,
+            lecturer=lecturer, max_students=self.seats,
+        )
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='pass', role='student')
+            for i in range(self.applicants)
+        ]
+
+    def enroll(self, student):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=student)
+        try:
+            return client.post(f'/api/courses/{self.course.id}/enroll/').status_code
+        finally:
+            connections.close_all()
+
+    def test_concurrent_enrollment_never_oversubscribes(self):
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            codes = list(pool.map(self.enroll, self.students))
+
+        self.course.refresh_from_db()
+        enrolled = Enrollment.objects.filter(course=self.course, status='enrolled').count()
+        waitlisted = Enrollment.objects.filter(course=self.course, status='waitlisted').count()
+        self.assertEqual(codes.count(201), self.applicants)
+        self.assertEqual(enrolled, self.seats)
+        self.assertEqual(waitlisted, self.applicants - self.seats)
+        self.assertEqual(self.course.seats_taken, enrolled)
+
+    def test_drop_releases_seat_once(self):
+        client = APIClient()
+        client.force_authenticate(user=self.students[0])
+        self.assertEqual(client.post(f'/api/courses/{self.course.id}/enroll/').status_code, 201)
+        self.assertEqual(client.post(f'/api/courses/{self.course.id}/drop/').status_code, 200)
+        self.assertEqual(client.post(f'/api/courses/{self.course.id}/drop/').status_code, 200)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, 0)
+
+    def post_as(self, student, action):
+        client = APIClient()
+        client.force_authenticate(user=student)
+        return client.post(f'/api/courses/{self.course.id}/{action}/')
+
+    def test_full_course_waitlists_and_promotes_in_order(self):
+        for student in self.students[:self.seats]:
+            self.assertEqual(self.post_as(student, 'enroll').data['status'], 'enrolled')
+        first, second = self.students[self.seats:self.seats + 2]
+        self.assertEqual(self.post_as(first, 'enroll').data['waitlist_position'], 1)
+        self.assertEqual(self.post_as(second, 'enroll').data['waitlist_position'], 2)
+
+        # The freed seat goes straight to the head of the queue
+        self.post_as(self.students[0], 'drop')
+        newcomer = self.post_as(self.students[-1], 'enroll').data
+        self.assertEqual((newcomer['status'], newcomer['waitlist_position']), ('waitlisted', 2))
+        statuses = dict(
+            Enrollment.objects.filter(course=self.course).values_list('student__username', 'status')
+        )
+        self.assertEqual(statuses[first.username], 'enrolled')
+        self.assertEqual(statuses[second.username], 'waitlisted')
+
+        # Seats added without a drop are filled by process_waitlist
+        Course.objects.filter(pk=self.course.pk).update(max_students=self.seats + 1)
+        call_command('process_waitlist', stdout=StringIO())
+        statuses = dict(
+            Enrollment.objects.filter(course=self.course).values_list('student__username', 'status')
+        )
+        self.assertEqual(statuses[second.username], 'enrolled')
+        self.assertEqual(statuses[self.students[-1].username], 'waitlisted')
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, self.seats + 1)
+
+    def test_reconcile_seats_repairs_drift(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        Course.objects.filter(pk=self.course.pk).update(seats_taken=4)
+        call_command('reconcile_seats', stdout=StringIO())
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, 1)
+
+
+class TimetableClashTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='staff1', password='pass', role='staff')
+        self.lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.other_lecturer = User.objects.create_user(username='lecturer2', password='pass', role='lecturer')
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.course = self.create_course('IT101', self.lecturer)
+        CourseSchedule.objects.create(
+            course=self.course, day_of_week='monday', start_time=time(9), end_time=time(11),
+            room='101', building='Main',
+        )
+
+    def create_course(self, code, lecturer):
+        return Course.objects.create(
+            code=code, name=code, description='Test course', credits=3, lecturer=lecturer,
+        )
+
+    def post_schedule(self, course, start, end, room='101', day='monday'):
+        self.client.force_authenticate(user=self.staff)
+        return self.client.post('/api/schedules/', {
+            'course': course.id, 'day_of_week': day, 'start_time': start, 'end_time': end,
+            'room': room, 'building': 'Main',
+        })
+
+    def test_room_double_booking_is_rejected(self):
+        other = self.create_course('IT102', self.other_lecturer)
+        response = self.post_schedule(other, '10:00', '12:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Room 101 Main', str(response.data))
+
+    def test_lecturer_clash_is_rejected(self):
+        other = self.create_course('IT102', self.lecturer)
+        response = self.post_schedule(other, '10:00', '12:00', room='202')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('lecturer', str(response.data))
+
+    def test_back_to_back_and_other_semester_slots_are_allowed(self):
+        other = self.create_course('IT102', self.other_lecturer)
+        self.assertEqual(self.post_schedule(other, '11:00', '12:00').status_code, 201)
+        later = Course.objects.create(
+            code='IT103', name='IT103', description='Test course', credits=3,
+            lecturer=self.lecturer, semester='second',
+        )
+        self.assertEqual(self.post_schedule(later, '09:00', '11:00').status_code, 201)
+
+    def test_enrolling_into_a_clashing_course_is_rejected(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        other = self.create_course('IT102', self.other_lecturer)
+        CourseSchedule.objects.create(
+            course=other, day_of_week='monday', start_time=time(10), end_time=time(12), room='202', building='Main',
+        )
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(f'/api/courses/{other.id}/enroll/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('IT102 clashes with IT101', str(response.data))
+
+    def test_check_timetable_reports_conflicts(self):
+        other = self.create_course('IT102', self.other_lecturer)
+        CourseSchedule.objects.create(
+            course=other, day_of_week='monday', start_time=time(10), end_time=time(12), room='101', building='Main',
+        )
+        out = StringIO()
+        call_command('check_timetable', year=self.course.year, stdout=out)
+        self.assertIn('Room 101 Main: IT101 Monday 09:00-11:00 overlaps IT102', out.getvalue())
+        self.assertIn('Found 1 conflicts.', out.getvalue())
+
+
+class TimetableGeneratorTests(TestCase):
+    def setUp(self):
+        lecturers = [
+            User.objects.create_user(username=f'lecturer{i}', password='pass', role='lecturer')
+            for i in range(2)
+        ]
+        students = [
+            User.objects.create_user(username=f'student{i}', password='pass', role='student')
+            for i in range(4)
+        ]
+        self.courses = [
+            Course.objects.create(
+                code=f'IT{i:03d}', name=f'Course {i}', description='Test course', credits=3,
+                lecturer=lecturers[i % 2], year=2025,
+            )
+            for i in range(6)
+        ]
+        for student in students:
+            for course in self.courses[:4]:
+                Enrollment.objects.create(student=student, course=course)
+
+    def test_generated_timetable_has_no_clashes(self):
+        out = StringIO()
+        call_command(
+            'generate_timetable', year=2025, rooms='Main:101,Main:102', workers=1,
+            restarts=2, seed=1, write=True, stdout=out,
+        )
+        self.assertIn('quality: 100.0%', out.getvalue())
+
+        schedules = CourseSchedule.objects.select_related('course')
+        self.assertEqual(schedules.count(), 12)
+        self.assertEqual(semester_conflicts(schedules), [])
+        for course in self.courses:
+            days = list(course.schedules.values_list('day_of_week', flat=True))
+            self.assertEqual(len(set(days)), 2)
+
+        # Students share the first four courses, so none of those may overlap
+        shared = IntervalIndex(schedules.filter(course__in=self.courses[:4]))
+        for schedule in schedules.filter(course__in=self.courses[:4]):
+            overlapping = shared.overlapping(schedule.day_of_week, schedule.start_time, schedule.end_time)
+            self.assertEqual(overlapping, [schedule])
+
+
+    def test_more_sessions_than_days(self):
+        # Six sessions of each course in a one-day grid of six slots, with
+        # enough rooms that sharing a slot would cost nothing
+        rooms = [('Main', str(number)) for number in range(12)]
+        problem = TimetableProblem.for_semester(
+            'first', 2025, rooms, slots=teaching_slots(days=['monday']), sessions_per_course=6,
+        )
+        _, placement = generate_timetable(problem, restarts=1, workers=1, seed=3, time_limit=5)
+        write_timetable(problem, placement)
+        for course in self.courses:
+            starts = list(course.schedules.values_list('day_of_week', 'start_time'))
+            self.assertEqual(len(starts), 6)
+            self.assertEqual(len(set(starts)), 6)
+
+        for sessions in [0, 31]:
+            with self.assertRaises(CommandError):
+                call_command('generate_timetable', year=2025, rooms='Main:101', sessions=sessions, stdout=StringIO())
+
+
+class MyWeekTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.course = Course.objects.create(
+            code='IT101', name='Course', description='Test course', credits=3, lecturer=lecturer,
+        )
+        self.schedule = CourseSchedule.objects.create(
+            course=self.course, day_of_week='tuesday', start_time=time(9), end_time=time(11),
+        )
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(user=self.student)
+
+    def test_week_is_bucketed_by_day(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/schedules/my_week/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['monday'], [])
+        self.assertEqual(response.data['tuesday'][0]['course_code'], 'IT101')
+
+    def test_unchanged_week_returns_304(self):
+        etag = self.client.get('/api/schedules/my_week/')['ETag']
+        response = self.client.get('/api/schedules/my_week/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.schedule.room = '101'
+        self.schedule.save()
+        response = self.client.get('/api/schedules/my_week/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_dropping_the_course_changes_the_etag(self):
+        etag = self.client.get('/api/schedules/my_week/')['ETag']
+        self.client.post(f'/api/courses/{self.course.id}/drop/')
+        response = self.client.get('/api/schedules/my_week/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tuesday'], [])
+
+
+class CatalogueSearchTests(TestCase):
+    def setUp(self):
+        # Test data isn't committed, so a rebuild thread couldn't see it
+        self.enterContext(patch('courses.catalogue.REBUILD_IN_BACKGROUND', False))
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='staff1', password='pass', role='staff')
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        courses = [
+            ('IT101', 'Introduction to Programming', 'Variables, loops and functions.', '100', 'core'),
+            ('IT201', 'Data Structures', 'Lists, trees and graphs in programming.', '200', 'core'),
+            ('IT305', 'Computer Networks', 'Protocols and routing.', '300', 'elective'),
+            ('BM101', 'Principles of Management', 'Organisations and planning.', '100', 'elective'),
+        ]
+        for code, name, description, level, course_type in courses:
+            Course.objects.create(
+                code=code, name=name, description=description, credits=3,
+                level=level, course_type=course_type, lecturer=lecturer,
+            )
+        Course.objects.filter(code='IT305').update(is_active=False)
+        # update() skips the signals, so bump the shared version by hand
+        invalidate_catalogue()
+
+    def search(self, user, **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/courses/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_name_matches_outrank_description_matches(self):
+        data = self.search(self.staff, search='programming')
+        self.assertEqual([course['code'] for course in data['results']], ['IT101', 'IT201'])
+        self.assertEqual(data['facets']['level'], {'100': 1, '200': 1})
+
+    def test_ranked_pages_link_to_each_other(self):
+        first = self.search(self.staff, search='programming', page_size=1)
+        self.assertEqual((first['count'], first['previous']), (2, None))
+        self.assertEqual([course['code'] for course in first['results']], ['IT101'])
+        self.client.force_authenticate(user=self.staff)
+        second = self.client.get(first['next']).data
+        self.assertEqual([course['code'] for course in second['results']], ['IT201'])
+        self.assertIsNone(second['next'])
+        self.assertIn('page=1', second['previous'])
+
+    def test_typos_and_code_prefixes_match(self):
+        self.assertEqual([c['code'] for c in self.search(self.staff, search='netwroks')['results']], ['IT305'])
+        codes = [c['code'] for c in self.search(self.staff, search='IT2')['results']]
+        self.assertEqual(codes, ['IT201'])
+
+    def test_filters_and_role_restrictions_apply(self):
+        self.assertEqual(self.search(self.student, search='networks')['count'], 0)
+        self.assertEqual(self.search(self.student, search='networks', is_active='false')['count'], 0)
+        data = self.search(self.staff, search='principles programming management')
+        self.assertEqual([c['code'] for c in data['results']], [])
+        data = self.search(self.staff, search='introduction', course_type='elective')
+        self.assertEqual(data['count'], 0)
+
+    def test_saving_a_course_refreshes_the_index(self):
+        self.assertEqual(self.search(self.staff, search='databases')['count'], 0)
+        course = Course.objects.get(code='BM101')
+        course.name = 'Databases for Managers'
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+        self.assertEqual([c['code'] for c in self.search(self.staff, search='databases')['results']], ['BM101'])
+
+    def test_only_indexed_changes_bump_the_version(self):
+        version = catalogue_version()
+        course = Course.objects.get(code='BM101')
+        lecturer = User.objects.get(username='lecturer1')
+        with self.captureOnCommitCallbacks(execute=True):
+            course.max_students = 80
+            course.save()
+            course.name = 'Changed'
+            course.save(update_fields=['max_students'])
+            lecturer.save(update_fields=['last_login'])
+            lecturer.email = 'lecturer1@example.com'
+            lecturer.save()
+            Course.objects.create(
+                code='BM999', name='Unrelated', description='', credits=3,
+                lecturer=User.objects.create_user(username='lecturer2', password='pass', role='lecturer'),
+            )
+        self.assertEqual(catalogue_version(), version + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lecturer.last_name = 'Moyo'
+            lecturer.save(update_fields=['last_name'])
+        self.assertEqual(catalogue_version(), version + 2)
+
+    def test_stale_index_answers_while_rebuilding(self):
+        self.assertEqual(self.search(self.staff, search='databases')['count'], 0)
+        Course.objects.filter(code='BM101').update(name='Databases for Managers')
+        invalidate_catalogue()
+
+        with patch('courses.catalogue.REBUILD_IN_BACKGROUND', True), patch('threading.Thread') as thread:
+            self.assertEqual(self.search(self.staff, search='databases')['count'], 0)
+            # Only one rebuild is started at a time
+            self.assertEqual(self.search(self.staff, search='databases')['count'], 0)
+        thread.assert_called_once()
+        # Run the rebuild here, where the uncommitted test data is visible
+        target, args = thread.call_args.kwargs['target'], thread.call_args.kwargs['args']
+        target(args[0])
+        self.assertEqual(self.search(self.staff, search='databases')['count'], 1)
+
+    def autocomplete(self, user, prefix):
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/courses/autocomplete/', {'prefix': prefix})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_autocomplete_suggests_codes_names_and_lecturers(self):
+        suggestions = self.autocomplete(self.staff, 'it')
+        self.assertEqual([s.get('code') for s in suggestions], ['IT101', 'IT201', 'IT305'])
+
+        suggestions = self.autocomplete(self.staff, 'struc')
+        self.assertEqual([s['code'] for s in suggestions], ['IT201'])
+
+        lecturer = User.objects.get(username='lecturer1')
+        lecturer.first_name, lecturer.last_name = 'Tariro', 'Moyo'
+        with self.captureOnCommitCallbacks(execute=True):
+            lecturer.save()
+        self.assertEqual(self.autocomplete(self.staff, 'moy'), [{'type': 'lecturer', 'id': lecturer.id, 'name': 'Tariro Moyo'}])
+
+    def test_autocomplete_follows_changes_from_other_workers(self):
+        self.assertEqual([s['code'] for s in self.autocomplete(self.staff, 'bm')], ['BM101'])
+        lecturer = User.objects.get(username='lecturer1')
+        version = catalogue_version()
+        # Logging in saves last_login only and must not cost every worker a rebuild
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(user=None)
+            self.assertTrue(self.client.login(username='lecturer1', password='pass'))
+        self.assertEqual(catalogue_version(), version)
+
+        # Another worker changes rows and bumps the shared version; this
+        # process notices at its next version check and rebuilds its index
+        Course.objects.filter(code='BM101').update(code='BM110')
+        User.objects.filter(pk=lecturer.pk).update(first_name='Rudo', last_name='Chari')
+        cache.incr(VERSION_KEY)
+        self.assertEqual([s['code'] for s in self.autocomplete(self.staff, 'bm')], ['BM101'])
+        # Once the check interval has passed
+        with patch('courses.catalogue.VERSION_CHECK_INTERVAL', 0):
+            self.assertEqual([s['code'] for s in self.autocomplete(self.staff, 'bm')], ['BM110'])
+            self.assertEqual(self.autocomplete(self.staff, 'char'), [{'type': 'lecturer', 'id': lecturer.id, 'name': 'Rudo Chari'}])
+
+    def test_autocomplete_respects_visibility_without_queries(self):
+        get_catalogue()
+        with CaptureQueriesContext(connection) as ctx:
+            suggestions = self.autocomplete(self.student, 'IT3')
+        self.assertEqual(suggestions, [])
+        # Not even a read of the shared version, which may be in the database
+        self.assertEqual(ctx.captured_queries, [])
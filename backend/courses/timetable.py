@@ -0,0 +1,157 @@
+import hashlib
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import CourseSchedule
+
+
+def describe(schedule):
+    return (
+        f"{schedule.course.code} {schedule.get_day_of_week_display()} "
+        f"{schedule.start_time:%H:%M}-{schedule.end_time:%H:%M}"
+    )
+
+
+class IntervalIndex:
+    """
+    Schedules bucketed by day and sorted by start time, answering "what
+    overlaps this slot?" with a bisect instead of a scan of every row.
+    Slots are half-open, so a class ending at 10:30 doesn't clash with one
+    starting at 10:30.
+    """
+    def __init__(self, schedules):
+        by_day = defaultdict(list)
+        for schedule in schedules:
+            by_day[schedule.day_of_week].append(schedule)
+        self.days = {}
+        for day, rows in by_day.items():
+            rows.sort(key=lambda row: row.start_time)
+            self.days[day] = ([row.start_time for row in rows], rows)
+
+    def overlapping(self, day_of_week, start_time, end_time):
+        starts, rows = self.days.get(day_of_week, ([], []))
+        # Only rows that start before this slot ends can overlap it
+        candidates = rows[:bisect_left(starts, end_time)]
+        return [row for row in candidates if row.end_time > start_time]
+
+
+def overlapping_pairs(schedules):
+    """
+    Sweep-line over schedules on the same day: yield every overlapping pair
+    in O(n log n + k) for k clashes.
+    """
+    active = []
+    ordered = sorted(schedules, key=lambda row: (row.start_time, row.end_time))
+    for position, schedule in enumerate(ordered):
+        while active and active[0][0] <= schedule.start_time:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, schedule
+        heapq.heappush(active, (schedule.end_time, position, schedule))
+
+
+def schedule_clashes(day_of_week, start_time, end_time, course, room='', building='', exclude_id=None):
+    """
+    Clashes for a proposed slot: the same room already booked, or the
+    course's lecturer teaching something else at that time, among courses
+    running in the same semester. Returns a list of messages.
+    """
+    clash_filter = Q(course__lecturer_id=course.lecturer_id)
+    if room:
+        clash_filter |= Q(room=room, building=building)
+    booked = CourseSchedule.objects.filter(
+        clash_filter,
+        day_of_week=day_of_week,
+        course__semester=course.semester,
+        course__year=course.year,
+        course__is_active=True,
+    ).select_related('course')
+    if exclude_id is not None:
+        booked = booked.exclude(id=exclude_id)
+
+    errors = []
+    for other in IntervalIndex(booked).overlapping(day_of_week, start_time, end_time):
+        if room and (other.room, other.building) == (room, building):
+            location = ' '.join(part for part in [room, building] if part)
+            errors.append(f"Room {location} is already booked for {describe(other)}.")
+        if other.course.lecturer_id == course.lecturer_id:
+            errors.append(f"The lecturer is already teaching {describe(other)}.")
+    return errors
+
+
+def student_clashes(student, course):
+    """Clashes between a course's sessions and the student's current timetable."""
+    taken = IntervalIndex(
+        CourseSchedule.objects.filter(
+            course__enrollments__student=student,
+            course__enrollments__status__in=['enrolled', 'pending', 'waitlisted'],
+            course__semester=course.semester,
+            course__year=course.year,
+        ).exclude(course=course).select_related('course')
+    )
+    errors = []
+    for session in course.schedules.all():
+        for other in taken.overlapping(session.day_of_week, session.start_time, session.end_time):
+            errors.append(f"{session.course.code} clashes with {describe(other)}.")
+    return errors
+
+
+def semester_conflicts(schedules):
+    """
+    Every room double-booking and lecturer clash among ``schedules``, found by
+    grouping rows per (day, room) and (day, lecturer) and sweeping each group.
+    Returns ``(kind, schedule, other)`` tuples.
+    """
+    rooms = defaultdict(list)
+    lecturers = defaultdict(list)
+    for schedule in schedules:
+        if schedule.room:
+            rooms[schedule.day_of_week, schedule.building, schedule.room].append(schedule)
+        lecturers[schedule.day_of_week, schedule.course.lecturer_id].append(schedule)
+
+    conflicts = []
+    for kind, groups in [('room', rooms), ('lecturer', lecturers)]:
+        for group in groups.values():
+            if len(group) > 1:
+                conflicts.extend((kind, a, b) for a, b in overlapping_pairs(group))
+    return conflicts
+
+
+def weekly_schedules(user):
+    """
+    A student's enrolled sessions, or a lecturer's teaching sessions, with
+    their courses, in one query, plus a strong ETag over every row so an
+    unchanged timetable can be answered with a 304.
+    """
+    if user.role == 'lecturer':
+        schedules = CourseSchedule.objects.filter(course__lecturer=user)
+    else:
+        schedules = CourseSchedule.objects.filter(
+            course__enrollments__student=user, course__enrollments__status='enrolled'
+        )
+    schedules = list(schedules.select_related('course').order_by('start_time', 'course__code'))
+
+    # Enrolling, dropping or editing a session changes the set of rows or
+    # their timestamps, and so the tag
+    digest = hashlib.sha1(f'{user.role}:{user.id}'.encode())
+    for schedule in schedules:
+        digest.update(f'|{schedule.id}:{schedule.updated_at.isoformat()}:{schedule.course.updated_at.isoformat()}'.encode())
+    return schedules, f'"{digest.hexdigest()}"'
+
+
+def semester_dates(semester, year):
+    """First and last teaching day of a semester, from ``settings.SEMESTER_DATES``."""
+    (start_month, start_day), (end_month, end_day) = settings.SEMESTER_DATES[semester]
+    return date(year, start_month, start_day), date(year, end_month, end_day)
+
+
+def first_session_date(schedule):
+    """Date of a weekly session's first meeting in its course's semester."""
+    start, _ = semester_dates(schedule.course.semester, schedule.course.year)
+    weekday = [day for day, _ in CourseSchedule.DAYS_OF_WEEK].index(schedule.day_of_week)
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
@@ -2,24 +2,36 @@ from django.shortcuts import render
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from rest_framework.utils.urls import replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.http import parse_etags
 from .models import Course, Enrollment, CourseSchedule, CourseMaterial
 from .serializers import (
     CourseSerializer, CourseListSerializer, CourseCreateSerializer, CourseDetailSerializer,
     EnrollmentSerializer, EnrollmentCreateSerializer,
-    CourseScheduleSerializer, CourseMaterialSerializer
+    CourseScheduleSerializer, CourseScheduleWeekSerializer, CourseMaterialSerializer
 )
 from .permissions import IsLecturerOrStaff, IsStaffOnly, IsStudentOrLecturer
+from .parsers import CSVTextParser
+from .grading import read_grade_rows, apply_bulk_grades
+from .waitlist import release_seat, waitlist_position
+from .prerequisites import completed_course_ids, get_graph
+from .signals import enrollment_status_changed
+from .timetable import weekly_schedules
+from .catalogue import AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, catalogue_page, get_catalogue
 
 
 class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['level', 'course_type', 'is_active', 'semester', 'lecturer']
-    search_fields = ['code', 'name', 'description']
     ordering_fields = ['code', 'name', 'credits', 'created_at']
     ordering = ['level', 'code']
 
@@ -28,15 +40,73 @@ class CourseViewSet(viewsets.ModelViewSet):
         
         if user.role == 'student':
             # Students can see all active courses
-            return Course.objects.filter(is_active=True)
+            courses = Course.objects.filter(is_active=True)
         elif user.role == 'lecturer':
             # Lecturers can only see their own courses
-            return Course.objects.filter(lecturer=user)
+            courses = Course.objects.filter(lecturer=user)
         elif user.role == 'staff':
             # Staff can see all courses
-            return Course.objects.all()
-        
-        return Course.objects.none()
+            courses = Course.objects.all()
+        else:
+            return Course.objects.none()
+
+        if self.action in ['retrieve', 'update', 'partial_update']:
+            return courses.with_detail_prefetches()
+        return courses.with_enrollment_stats()
+
+    def catalogue_filters(self):
+        """The filterset filters and role restriction, as exact field values for the catalogue index"""
+        params = self.request.query_params
+        values = {field: params[field] for field in ['level', 'course_type', 'semester'] if params.get(field)}
+        if params.get('is_active'):
+            values['is_active'] = params['is_active'].lower() in ['true', '1']
+        if params.get('lecturer'):
+            try:
+                values['lecturer_id'] = int(params['lecturer'])
+            except ValueError:
+                raise ValidationError({'lecturer': 'Enter a number.'})
+
+        user = self.request.user
+        restriction = {}
+        if user.role == 'student':
+            restriction = {'is_active': True}
+        elif user.role == 'lecturer':
+            restriction = {'lecturer_id': user.id}
+        for field, value in restriction.items():
+            # A filter contradicting the restriction matches nothing
+            values[field] = value if values.get(field, value) == value else None
+        return values
+
+    def list(self, request, *args, **kwargs):
+        """
+        With ?search=, courses ranked by relevance plus facet counts. Ranked
+        results are paged by ?page= rather than a cursor; ``next`` and
+        ``previous`` link the pages as in the cursor-paginated list.
+        """
+        query = request.query_params.get('search', '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+        if request.user.role not in ['student', 'lecturer', 'staff']:
+            return Response({'count': 0, 'next': None, 'previous': None, 'results': [], 'facets': {}})
+
+        ranked, facets = get_catalogue().search(query, **self.catalogue_filters())
+        next_url = previous_url = None
+        if request.query_params.get('paginate', '').lower() not in ['false', '0', 'no']:
+            page, page_size = catalogue_page(request.query_params)
+            page_ids = ranked[(page - 1) * page_size:page * page_size]
+            url = request.build_absolute_uri()
+            if page * page_size < len(ranked):
+                next_url = replace_query_param(url, 'page', page + 1)
+            if page > 1:
+                previous_url = replace_query_param(url, 'page', page - 1)
+        else:
+            page_ids = ranked
+
+        courses = self.get_queryset().in_bulk(page_ids)
+        results = self.get_serializer([courses[id] for id in page_ids if id in courses], many=True).data
+        return Response({
+            'count': len(ranked), 'next': next_url, 'previous': previous_url, 'results': results, 'facets': facets,
+        })
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -47,16 +117,27 @@ class CourseViewSet(viewsets.ModelViewSet):
             return CourseDetailSerializer
         return CourseSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if user.is_authenticated and user.role == 'student':
+            # One query per request instead of one per serialized course
+            context['enrolled_course_ids'] = set(
+                Enrollment.objects.filter(student=user).values_list('course_id', flat=True)
+            )
+        return context
+
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update']:
             return [IsAuthenticated(), IsLecturerOrStaff()]
         elif self.action == 'destroy':
             return [IsAuthenticated(), IsStaffOnly()]
-        return [IsAuthenticated()]
+        # Actions declare their own permission_classes
+        return super().get_permissions()
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def enroll(self, request, pk=None):
-        """Enroll a student in a course"""
+        """Enroll a student in a course, or waitlist them if it is full"""
         if request.user.role != 'student':
             return Response(
                 {'error': 'Only students can enroll in courses'}, 
@@ -71,10 +152,11 @@ class CourseViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             enrollment = serializer.save()
-            return Response(
-                EnrollmentSerializer(enrollment).data, 
-                status=status.HTTP_201_CREATED
-            )
+            data = EnrollmentSerializer(enrollment).data
+            if enrollment.status == 'waitlisted':
+                # Course is full; process_waitlist promotes in FIFO order as seats free up
+                data['waitlist_position'] = waitlist_position(enrollment)
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -87,16 +169,31 @@ class CourseViewSet(viewsets.ModelViewSet):
             )
         
         course = self.get_object()
+        enrollments = Enrollment.objects.filter(student=request.user, course=course)
+        with transaction.atomic():
+            # Only an active enrollment holds a seat, and the conditional
+            # update makes sure a double drop releases it once
+            if enrollments.filter(status='enrolled').update(status='dropped'):
+                release_seat(course.pk)
+            elif not enrollments.update(status='dropped'):
+                return Response(
+                    {'error': 'You are not enrolled in this course'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        enrollment_status_changed.send(sender=Enrollment, student_ids=[request.user.id])
+        return Response({'message': 'Successfully dropped course'})
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Typeahead suggestions for ?prefix=, answered from the in-memory catalogue"""
+        if request.user.role not in ['student', 'lecturer', 'staff']:
+            return Response([])
         try:
-            enrollment = Enrollment.objects.get(student=request.user, course=course)
-            enrollment.status = 'dropped'
-            enrollment.save()
-            return Response({'message': 'Successfully dropped course'})
-        except Enrollment.DoesNotExist:
-            return Response(
-                {'error': 'You are not enrolled in this course'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+            limit = min(MAX_AUTOCOMPLETE_LIMIT, max(1, int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT))))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        prefix = request.query_params.get('prefix', '')
+        return Response(get_catalogue().autocomplete(prefix, limit, **self.catalogue_filters()))
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def my_courses(self, request):
@@ -104,9 +201,9 @@ class CourseViewSet(viewsets.ModelViewSet):
         user = request.user
         
         if user.role == 'student':
-            # Get enrolled courses
+            # Get enrolled courses (subquery, so the enrollment join doesn't skew the counts)
             enrollments = Enrollment.objects.filter(student=user, status='enrolled')
-            courses = Course.objects.filter(enrollments__in=enrollments)
+            courses = Course.objects.filter(id__in=enrollments.values('course_id'))
         elif user.role == 'lecturer':
             # Get courses taught by the lecturer
             courses = Course.objects.filter(lecturer=user)
@@ -116,9 +213,26 @@ class CourseViewSet(viewsets.ModelViewSet):
         else:
             courses = Course.objects.none()
         
-        serializer = CourseListSerializer(courses, many=True)
+        serializer = CourseListSerializer(
+            courses.with_enrollment_stats(), many=True, context=self.get_serializer_context()
+        )
         return Response(serializer.data)
 
+    @action(detail=True, permission_classes=[IsAuthenticated])
+    def prerequisite_tree(self, request, pk=None):
+        """Get the full prerequisite tree for a course, plus what the student still needs"""
+        course = self.get_object()
+        graph = get_graph(course.id)
+        if course.id not in graph.courses:
+            # Deleted since get_object()
+            raise NotFound()
+        data = graph.tree(course.id)
+        data['has_cycle'] = any(course.id in cycle for cycle in graph.cycles)
+        if request.user.role == 'student':
+            missing = graph.missing_prerequisites(course.id, completed_course_ids(request.user))
+            data['missing'] = sorted(graph.courses[course_id]['code'] for course_id in missing)
+        return Response(data)
+
     @action(detail=True, permission_classes=[IsAuthenticated])
     def enrollments(self, request, pk=None):
         """Get all enrollments for a course (lecturers and staff only)"""
@@ -141,6 +255,36 @@ class CourseViewSet(viewsets.ModelViewSet):
         serializer = EnrollmentSerializer(enrollments, many=True)
         return Response(serializer.data)
 
+    @action(
+        detail=True, methods=['post'], url_path='grades/bulk',
+        permission_classes=[IsAuthenticated, IsLecturerOrStaff],
+        parser_classes=[JSONParser, CSVTextParser, MultiPartParser, FormParser],
+    )
+    def bulk_grades(self, request, pk=None):
+        """
+        Set grades for many students at once from CSV (a ``file`` upload or a
+        text/csv body) or JSON. Columns: student or username, percentage_score,
+        and optionally grade. Nothing is saved unless every row is valid.
+        """
+        # get_queryset already limits lecturers to their own courses
+        course = self.get_object()
+        upload = request.FILES.get('file')
+        try:
+            rows = read_grade_rows(upload.read() if upload else request.data)
+        except (ValueError, UnicodeDecodeError):
+            return Response(
+                {'error': 'Expected CSV or a JSON list of grade rows.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        updated, errors = apply_bulk_grades(course, rows)
+        if errors:
+            return Response(
+                {'updated': 0, 'errors': [{'row': row, 'error': error} for row, error in errors.items()]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'updated': updated, 'errors': []})
+
 
 class EnrollmentViewSet(viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
@@ -173,6 +317,51 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated(), IsStaffOnly()]
         return [IsAuthenticated()]
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the row so two concurrent edits can't both take or free its seat
+            previous_status, previous_course_id = (
+                Enrollment.objects.select_for_update()
+                .values_list('status', 'course_id')
+                .get(pk=serializer.instance.pk)
+            )
+            new_status = serializer.validated_data.get('status', previous_status)
+            new_course_id = serializer.validated_data.get('course', serializer.instance.course).pk
+            if (
+                self.request.user.role == 'student'
+                and new_status != previous_status
+                and new_status != 'dropped'
+            ):
+                raise PermissionDenied('Students can only drop their enrollments.')
+
+            # Only an 'enrolled' row holds a seat
+            had_seat = previous_status == 'enrolled'
+            needs_seat = new_status == 'enrolled'
+            moved = new_course_id != previous_course_id
+            if needs_seat and (moved or not had_seat):
+                # Approving a waitlisted student promotes them; anyone else
+                # queues behind the waitlist like a direct enrollment
+                if previous_status == 'waitlisted' and not moved:
+                    reserved = Course.objects.reserve_seats(new_course_id, 1)
+                else:
+                    reserved = Course.objects.reserve_seat(new_course_id)
+                if not reserved:
+                    raise ValidationError({'error': 'This course has no free seats.'})
+            if had_seat and (moved or not needs_seat):
+                release_seat(previous_course_id)
+            if new_status == 'waitlisted' and (moved or previous_status != 'waitlisted'):
+                # Back of the queue
+                serializer.save(waitlisted_at=timezone.now())
+            else:
+                serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            held_seat = Enrollment.objects.filter(pk=instance.pk, status='enrolled').select_for_update().exists()
+            instance.delete()
+            if held_seat:
+                release_seat(instance.course_id)
+
 
 class CourseScheduleViewSet(viewsets.ModelViewSet):
     queryset = CourseSchedule.objects.all()
@@ -200,6 +389,20 @@ class CourseScheduleViewSet(viewsets.ModelViewSet):
         
         return CourseSchedule.objects.none()
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsStudentOrLecturer])
+    def my_week(self, request):
+        """The user's weekly timetable bucketed by day, revalidated with an ETag"""
+        schedules, etag = weekly_schedules(request.user)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        week = {day: [] for day, _ in CourseSchedule.DAYS_OF_WEEK}
+        for schedule, data in zip(schedules, CourseScheduleWeekSerializer(schedules, many=True).data):
+            week[schedule.day_of_week].append(data)
+        return Response(week, headers=headers)
+
 
 class CourseMaterialViewSet(viewsets.ModelViewSet):
     queryset = CourseMaterial.objects.all()
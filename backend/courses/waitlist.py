@@ -0,0 +1,96 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import Course, Enrollment
+from .signals import enrollment_status_changed
+
+
+def waitlist_position(enrollment):
+    """1-based place of a waitlisted enrollment in its course's FIFO queue."""
+    ahead = Enrollment.objects.filter(course_id=enrollment.course_id, status='waitlisted').filter(
+        Q(waitlisted_at__lt=enrollment.waitlisted_at)
+        | Q(waitlisted_at=enrollment.waitlisted_at, id__lt=enrollment.id)
+    )
+    return ahead.count() + 1
+
+
+def _promote(course_id, limit):
+    """
+    Move up to ``limit`` waitlisted enrollments of a course into its free
+    seats, oldest first, inside the caller's transaction. Seats are taken with
+    a conditional UPDATE and only rows still waitlisted are promoted. Returns
+    the number promoted, or None if a direct enrollment took a seat in the
+    meantime and the caller should re-read.
+    """
+    course = Course.objects.filter(pk=course_id, is_active=True).values('seats_taken', 'max_students').first()
+    if course is None:
+        return 0
+    free = min(course['max_students'] - course['seats_taken'], limit)
+    if free <= 0:
+        return 0
+    waiting = dict(
+        Enrollment.objects.filter(course_id=course_id, status='waitlisted')
+        .order_by('waitlisted_at', 'id')
+        .values_list('id', 'student_id')[:free]
+    )
+    if not waiting:
+        return 0
+    ids = list(waiting)
+    if not Course.objects.reserve_seats(course_id, len(ids)):
+        return None
+    moved = Enrollment.objects.filter(id__in=ids, status='waitlisted').update(status='enrolled')
+    if moved < len(ids):
+        # Some students left the waitlist after we read it
+        Course.objects.release_seat(course_id, len(ids) - moved)
+    transaction.on_commit(partial(enrollment_status_changed.send, sender=Enrollment, student_ids=list(waiting.values())))
+    return moved
+
+
+def release_seat(course_id):
+    """
+    Free one seat of a course and, in the same transaction, hand it to the
+    first waitlisted student, so a freed seat never sits empty while others
+    wait. Returns True if a seat was held.
+    """
+    with transaction.atomic():
+        released = Course.objects.release_seat(course_id)
+        if released:
+            # A concurrent enrollment racing for the seat wins; process_waitlist catches up
+            _promote(course_id, 1)
+    return released
+
+
+def promote_course_waitlist(course_id, batch_size=100):
+    """
+    Move waitlisted enrollments into free seats of one course, oldest first,
+    up to ``batch_size`` per transaction. Safe to run alongside enroll/drop
+    and other workers. Returns the number promoted.
+    """
+    promoted = 0
+    while True:
+        with transaction.atomic():
+            moved = _promote(course_id, batch_size)
+        if moved is None:
+            # A direct enrollment took a seat in the meantime; re-read and retry
+            continue
+        if not moved:
+            break
+        promoted += moved
+    return promoted
+
+
+def promote_waitlists(batch_size=100):
+    """Promote waitlisted students in every active course with free seats."""
+    course_ids = (
+        Course.objects.filter(
+            is_active=True,
+            seats_taken__lt=F('max_students'),
+            enrollments__status='waitlisted',
+        )
+        .order_by()
+        .values_list('id', flat=True)
+        .distinct()
+    )
+    return sum(promote_course_waitlist(course_id, batch_size) for course_id in list(course_ids))
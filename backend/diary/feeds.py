@@ -0,0 +1,222 @@
+import time
+from datetime import datetime, time as day_time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+
+from courses.timetable import first_session_date, semester_dates, weekly_schedules
+
+from .models import CalendarEvent
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+PRODID = '-//Smart Campus//Calendar Feed//EN'
+UID_DOMAIN = 'smart-campus'
+
+
+def _version_key(user_id):
+    return f'calendar-feed-version:{user_id}'
+
+
+def feed_cache_key(user_id):
+    """
+    Cache key for a user's rendered feed. The key embeds a per-user version,
+    so a feed that was still rendering when the data changed is stored
+    under a key nobody reads any more.
+    """
+    version = cache.get_or_set(_version_key(user_id), time.time_ns, None)
+    return f'calendar-feed:{user_id}:{version}'
+
+
+def invalidate_feeds(user_ids):
+    for user_id in set(user_ids):
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    pieces, limit = [], 75
+    while data:
+        cut = min(limit, len(data))
+        # Don't split a multi-byte character
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(data[:cut].decode())
+        data = data[cut:]
+        limit = 74
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _utc_offset(offset):
+    minutes = int(offset.total_seconds()) // 60
+    sign = '-' if minutes < 0 else '+'
+    return f'{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}'
+
+
+def _offset_changes(tz, start, end):
+    """UTC instants between two datetimes where ``tz`` changes its UTC offset."""
+    def offset(timestamp):
+        return datetime.fromtimestamp(timestamp, tz).utcoffset()
+
+    day = 24 * 60 * 60
+    for low in range(int(start.timestamp()), int(end.timestamp()), day):
+        high = low + day
+        if offset(low) == offset(high):
+            continue
+        # Bisect down to the first second with the new offset
+        while high - low > 1:
+            middle = (low + high) // 2
+            if offset(middle) == offset(low):
+                low = middle
+            else:
+                high = middle
+        yield datetime.fromtimestamp(high, dt_timezone.utc)
+
+
+def _timezone_lines(name, start, end):
+    """
+    VTIMEZONE for ``name`` from ``start`` to ``end`` (dates), listing each
+    offset change explicitly so clients keep weekly sessions at the same
+    local time across daylight saving changes.
+    """
+    tz = ZoneInfo(name)
+    first = datetime.combine(start, day_time.min, tzinfo=tz)
+    last = datetime.combine(end + timedelta(days=1), day_time.min, tzinfo=tz)
+    previous = first.utcoffset()
+
+    yield 'BEGIN:VTIMEZONE'
+    yield f'TZID:{name}'
+    for onset in [first, *_offset_changes(tz, first, last)]:
+        local = onset.astimezone(tz)
+        kind = 'DAYLIGHT' if local.dst() else 'STANDARD'
+        yield f'BEGIN:{kind}'
+        # Each onset is written in the local time in force before it
+        yield f'DTSTART:{onset.astimezone(dt_timezone.utc).replace(tzinfo=None) + previous:%Y%m%dT%H%M%S}'
+        yield f'TZOFFSETFROM:{_utc_offset(previous)}'
+        yield f'TZOFFSETTO:{_utc_offset(local.utcoffset())}'
+        yield f'TZNAME:{_escape(local.tzname())}'
+        yield f'END:{kind}'
+        previous = local.utcoffset()
+    yield 'END:VTIMEZONE'
+
+
+def _schedule_lines(schedule, now):
+    course = schedule.course
+    tz = ZoneInfo(settings.TIME_ZONE)
+    first = first_session_date(schedule)
+    _, last = semester_dates(course.semester, course.year)
+    until = datetime.combine(last, day_time.max, tzinfo=tz)
+    summary = f'{course.code} {course.name}' + (' (Lab)' if schedule.is_lab else '')
+    location = ' '.join(part for part in [schedule.room, schedule.building] if part)
+
+    yield 'BEGIN:VEVENT'
+    yield f'UID:schedule-{schedule.id}@{UID_DOMAIN}'
+    yield f'DTSTAMP:{now}'
+    yield f'LAST-MODIFIED:{_utc(schedule.updated_at)}'
+    yield f'DTSTART;TZID={settings.TIME_ZONE}:{datetime.combine(first, schedule.start_time):%Y%m%dT%H%M%S}'
+    yield f'DTEND;TZID={settings.TIME_ZONE}:{datetime.combine(first, schedule.end_time):%Y%m%dT%H%M%S}'
+    yield f'RRULE:FREQ=WEEKLY;UNTIL={_utc(until)}'
+    yield f'SUMMARY:{_escape(summary)}'
+    if location:
+        yield f'LOCATION:{_escape(location)}'
+    yield 'END:VEVENT'
+
+
+def _event_lines(event, now):
+    yield 'BEGIN:VEVENT'
+    yield f'UID:event-{event.id}@{UID_DOMAIN}'
+    yield f'DTSTAMP:{now}'
+    yield f'LAST-MODIFIED:{_utc(event.updated_at)}'
+    if event.all_day:
+        start = event.start_datetime.date()
+        # DTEND is exclusive for all-day events
+        end = max(event.end_datetime.date(), start) + timedelta(days=1)
+        yield f'DTSTART;VALUE=DATE:{start:%Y%m%d}'
+        yield f'DTEND;VALUE=DATE:{end:%Y%m%d}'
+    else:
+        yield f'DTSTART:{_utc(event.start_datetime)}'
+        yield f'DTEND:{_utc(event.end_datetime)}'
+    if event.recurrence:
+        rule = f'RRULE:FREQ={event.recurrence.upper()}'
+        if event.recurrence_until and event.all_day:
+            rule += f';UNTIL={event.recurrence_until:%Y%m%d}'
+        elif event.recurrence_until:
+            until = datetime.combine(event.recurrence_until, day_time.max, tzinfo=ZoneInfo(settings.TIME_ZONE))
+            rule += f';UNTIL={_utc(until)}'
+        yield rule
+    yield f'SUMMARY:{_escape(event.title)}'
+    if event.description:
+        yield f'DESCRIPTION:{_escape(event.description)}'
+    yield 'END:VEVENT'
+
+
+def render_feed(user):
+    """
+    Yield the user's iCalendar feed a few events at a time: a weekly
+    recurring VEVENT per timetabled session across its semester, in local
+    time with the VTIMEZONE it refers to, then one per diary calendar event
+    in UTC.
+    """
+    now = _utc(datetime.now(dt_timezone.utc))
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(user.get_full_name() or user.username)} - Smart Campus',
+    ])
+
+    if user.role in ['student', 'lecturer']:
+        schedules, _ = weekly_schedules(user)
+        if schedules:
+            start = min(first_session_date(schedule) for schedule in schedules)
+            end = max(semester_dates(schedule.course.semester, schedule.course.year)[1] for schedule in schedules)
+            yield ''.join(_fold(line) for line in _timezone_lines(settings.TIME_ZONE, start, end))
+        for schedule in schedules:
+            yield ''.join(_fold(line) for line in _schedule_lines(schedule, now))
+
+    events = CalendarEvent.objects.filter(user=user).order_by('start_datetime', 'id')
+    for event in events.iterator(chunk_size=500):
+        yield ''.join(_fold(line) for line in _event_lines(event, now))
+
+    yield _fold('END:VCALENDAR')
+
+
+def cached_feed(user):
+    """
+    Return ``(content, None)`` when the feed is cached, otherwise
+    ``(None, chunks)`` where ``chunks`` streams the feed and caches it once
+    fully sent.
+    """
+    key = feed_cache_key(user.id)
+    content = cache.get(key)
+    if content is not None:
+        return content, None
+
+    def stream():
+        parts = []
+        for chunk in render_feed(user):
+            data = chunk.encode()
+            parts.append(data)
+            yield data
+        cache.set(key, b''.join(parts), FEED_CACHE_TIMEOUT)
+
+    return None, stream()
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0002_calendarfeed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence',
+            field=models.CharField(blank=True, choices=[('', 'Does not repeat'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='recurrence_until',
+            field=models.DateField(blank=True, help_text='Last day the event repeats on', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['user', 'start_datetime', 'end_datetime'], name='calendarevent_user_range_idx'),
+        ),
+    ]
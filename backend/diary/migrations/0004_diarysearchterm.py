@@ -0,0 +1,93 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:47
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+# Tokenizing as diary.search did when this migration was written, copied so
+# later changes there don't change what this migration indexes
+MAX_TERM_LENGTH = 64
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from had has have i in is it its me my
+of on or our so that the their them then there they this to was we were
+what when which who will with you your
+""".split())
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(word):
+    word = unicodedata.normalize('NFKD', word.casefold())
+    return ''.join(char for char in word if not unicodedata.combining(char))[:MAX_TERM_LENGTH]
+
+
+def tokenize(text):
+    words = (normalize(match) for match in WORD_RE.findall(text or ''))
+    return [word for word in words if len(word) > 1 and word not in STOP_WORDS]
+
+
+def use_binary_collation(apps, schema_editor):
+    # Terms are folded in Python already. MySQL's default case- and
+    # accent-insensitive collations would fold them again, so two distinct
+    # terms of one entry could collide on the (entry, term) constraint.
+    if schema_editor.connection.vendor == 'mysql':
+        table = schema_editor.quote_name(apps.get_model('diary', 'DiarySearchTerm')._meta.db_table)
+        schema_editor.execute(
+            f'ALTER TABLE {table} MODIFY term varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL'
+        )
+
+
+def index_existing_entries(apps, schema_editor):
+    DiaryEntry = apps.get_model('diary', 'DiaryEntry')
+    DiarySearchTerm = apps.get_model('diary', 'DiarySearchTerm')
+    entries = DiaryEntry.objects.only('id', 'user_id', 'title', 'content').order_by('id')
+    postings = []
+    for entry in entries.iterator(chunk_size=BATCH_SIZE):
+        titles = Counter(tokenize(entry.title))
+        contents = Counter(tokenize(entry.content))
+        postings.extend(
+            DiarySearchTerm(
+                entry_id=entry.id, user_id=entry.user_id, term=term,
+                title_count=titles[term], content_count=contents[term],
+            )
+            for term in titles.keys() | contents.keys()
+        )
+        # Flush as we go so memory stays bounded however many entries there are
+        if len(postings) >= BATCH_SIZE:
+            DiarySearchTerm.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+            postings = []
+    DiarySearchTerm.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0003_calendarevent_recurrence_range_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiarySearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('title_count', models.PositiveIntegerField(default=0)),
+                ('content_count', models.PositiveIntegerField(default=0)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='diary.diaryentry')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'term'], name='diarysearchterm_user_term_idx')],
+                'unique_together': {('entry', 'term')},
+            },
+        ),
+        migrations.RunPython(use_binary_collation, migrations.RunPython.noop),
+        migrations.RunPython(index_existing_entries, migrations.RunPython.noop),
+    ]
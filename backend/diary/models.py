@@ -1,5 +1,9 @@
+import secrets
+
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
+from django.utils import timezone
 
 # Create your models here.
 
@@ -14,15 +18,79 @@ class DiaryEntry(models.Model):
     def __str__(self):
         return f"{self.title} ({self.date})"
 
+class DiarySearchTerm(models.Model):
+    """Inverted index posting: how often a word appears in one diary entry"""
+    entry = models.ForeignKey(DiaryEntry, on_delete=models.CASCADE, related_name='search_terms')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    # Binary collation on MySQL (set in migration 0004): terms are folded in Python
+    term = models.CharField(max_length=64)
+    title_count = models.PositiveIntegerField(default=0)
+    content_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['entry', 'term']
+        indexes = [
+            models.Index(fields=['user', 'term'], name='diarysearchterm_user_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} in entry {self.entry_id}"
+
+class CalendarEventQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """
+        Events with an occurrence inside ``[start, end)``: one-off events that
+        overlap the window, plus recurring events that began before it ends
+        and haven't stopped repeating before it starts.
+        """
+        still_repeating = ~Q(recurrence='') & (
+            Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=timezone.localdate(start))
+        )
+        return self.filter(start_datetime__lt=end).filter(Q(end_datetime__gt=start) | still_repeating)
+
+
 class CalendarEvent(models.Model):
+    RECURRENCE_CHOICES = [
+        ('', 'Does not repeat'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_events')
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     start_datetime = models.DateTimeField()
     end_datetime = models.DateTimeField()
     all_day = models.BooleanField(default=False)
+    recurrence = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, blank=True, default='')
+    recurrence_until = models.DateField(null=True, blank=True, help_text="Last day the event repeats on")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CalendarEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_datetime', 'end_datetime'], name='calendarevent_user_range_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.start_datetime.date()})"
+
+
+def new_feed_token():
+    return secrets.token_urlsafe(32)
+
+class CalendarFeed(models.Model):
+    """Secret token for a user's read-only iCalendar subscription URL"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True, default=new_feed_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def rotate(self):
+        self.token = new_feed_token()
+        self.save(update_fields=['token'])
+
+    def __str__(self):
+        return f"Calendar feed for {self.user}"
@@ -0,0 +1,104 @@
+import copy
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+MAX_RANGE_DAYS = 366
+STEPS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+
+def _parse_bound(value, name):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name} must be an ISO date or datetime.')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_range(query_params):
+    """
+    Read the ``?start=`` and ``?end=`` window (dates or datetimes, end
+    exclusive). Raises ValueError with a message for the client.
+    """
+    start, end = query_params.get('start'), query_params.get('end')
+    if not (start and end):
+        raise ValueError('Both start and end are required.')
+    start, end = _parse_bound(start, 'start'), _parse_bound(end, 'end')
+    if end <= start:
+        raise ValueError('end must be after start.')
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise ValueError(f'The range cannot exceed {MAX_RANGE_DAYS} days.')
+    return start, end
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    try:
+        return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        # The 31st in a shorter month: that month has no occurrence
+        return None
+
+
+def _local_starts(event, earliest):
+    """
+    Naive local start times of the event's occurrences, skipping straight
+    to about ``earliest`` instead of walking from the first one.
+    """
+    first = timezone.localtime(event.start_datetime).replace(tzinfo=None)
+    if event.recurrence in STEPS:
+        step = STEPS[event.recurrence]
+        value = first + max(0, (earliest - first) // step) * step
+        while True:
+            yield value
+            value += step
+    elif event.recurrence == 'monthly':
+        months = max(0, (earliest.year - first.year) * 12 + earliest.month - first.month - 1)
+        while True:
+            value = _add_months(first, months)
+            if value is not None:
+                yield value
+            months += 1
+    else:
+        yield first
+
+
+def occurrences(event, start, end):
+    """Yield ``(start, end)`` of every occurrence of ``event`` overlapping ``[start, end)``."""
+    duration = event.end_datetime - event.start_datetime
+    earliest = timezone.localtime(start - duration).replace(tzinfo=None)
+    until = datetime.combine(event.recurrence_until, time.max) if event.recurrence_until else None
+    tz = timezone.get_current_timezone()
+
+    for local_start in _local_starts(event, earliest):
+        if until is not None and local_start > until:
+            break
+        occurrence_start = timezone.make_aware(local_start, tz)
+        if occurrence_start >= end:
+            break
+        if occurrence_start + duration > start:
+            yield occurrence_start, occurrence_start + duration
+
+
+def expand(events, start, end):
+    """
+    Events in the window as a list sorted by start time, with each
+    recurring event repeated once per occurrence. Occurrences are copies of
+    the event with their own start and end times and the event's id.
+    """
+    expanded = []
+    for event in events:
+        for occurrence_start, occurrence_end in occurrences(event, start, end):
+            occurrence = copy.copy(event)
+            occurrence.start_datetime, occurrence.end_datetime = occurrence_start, occurrence_end
+            expanded.append(occurrence)
+    expanded.sort(key=lambda occurrence: (occurrence.start_datetime, occurrence.id))
+    return expanded
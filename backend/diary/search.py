@@ -0,0 +1,113 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils.html import escape
+
+from .models import DiaryEntry, DiarySearchTerm
+
+MAX_TERM_LENGTH = 64
+SEARCH_LIMIT = 50
+SNIPPET_RADIUS = 80
+TITLE_WEIGHT = 3
+# BM25 term-frequency saturation
+K1 = 1.2
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from had has have i in is it its me my
+of on or our so that the their them then there they this to was we were
+what when which who will with you your
+""".split())
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(word):
+    # casefold() also folds e.g. "ß" to "ss", as MySQL's collations do
+    word = unicodedata.normalize('NFKD', word.casefold())
+    return ''.join(char for char in word if not unicodedata.combining(char))[:MAX_TERM_LENGTH]
+
+
+def tokenize(text):
+    """Lower-cased, accent-folded words worth indexing, in order."""
+    words = (normalize(match) for match in WORD_RE.findall(text or ''))
+    return [word for word in words if len(word) > 1 and word not in STOP_WORDS]
+
+
+def index_entry(entry):
+    """Replace an entry's postings with the words of its current title and content."""
+    titles = Counter(tokenize(entry.title))
+    contents = Counter(tokenize(entry.content))
+    postings = [
+        DiarySearchTerm(
+            entry=entry, user_id=entry.user_id, term=term,
+            title_count=titles[term], content_count=contents[term],
+        )
+        for term in titles.keys() | contents.keys()
+    ]
+    with transaction.atomic():
+        DiarySearchTerm.objects.filter(entry=entry).delete()
+        DiarySearchTerm.objects.bulk_create(postings)
+
+
+def search_entries(user, query, limit=SEARCH_LIMIT):
+    """
+    Rank the user's entries against ``query``. Entries matching more of the
+    query words come first, then by a BM25-style score where title matches
+    count extra. Returns ``(entries, scores, terms)``.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return [], {}, terms
+
+    postings = list(
+        DiarySearchTerm.objects.filter(user=user, term__in=terms)
+        .values_list('entry_id', 'term', 'title_count', 'content_count')
+    )
+    total = DiaryEntry.objects.filter(user=user).count()
+    document_frequency = Counter(term for _, term, _, _ in postings)
+
+    scores = defaultdict(float)
+    matched = Counter()
+    for entry_id, term, title_count, content_count in postings:
+        frequency = TITLE_WEIGHT * title_count + content_count
+        idf = math.log(1 + (total - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        scores[entry_id] += idf * frequency * (K1 + 1) / (frequency + K1)
+        matched[entry_id] += 1
+
+    ranked = sorted(scores, key=lambda entry_id: (-matched[entry_id], -scores[entry_id], -entry_id))[:limit]
+    entries = DiaryEntry.objects.filter(id__in=ranked).select_related('user').in_bulk()
+    return [entries[entry_id] for entry_id in ranked if entry_id in entries], scores, terms
+
+
+def highlight(text, terms, radius=None):
+    """
+    HTML-escaped ``text`` with matching words wrapped in <mark>. With
+    ``radius``, only a snippet around the first match is returned.
+    """
+    text = text or ''
+    terms = set(terms)
+    matches = [match for match in WORD_RE.finditer(text) if normalize(match.group()) in terms]
+
+    start, end = 0, len(text)
+    if radius is not None:
+        centre = matches[0].start() if matches else 0
+        start, end = max(0, centre - radius), min(len(text), centre + radius)
+
+    parts, position = [], start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:end]))
+
+    snippet = ''.join(parts)
+    if start > 0:
+        snippet = '…' + snippet
+    if end < len(text):
+        snippet += '…'
+    return snippet
@@ -13,4 +13,11 @@ class CalendarEventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CalendarEvent
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__'
+
+    def validate(self, data):
+        start = data.get('start_datetime', getattr(self.instance, 'start_datetime', None))
+        end = data.get('end_datetime', getattr(self.instance, 'end_datetime', None))
+        if start and end and end < start:
+            raise serializers.ValidationError("end_datetime cannot be before start_datetime.")
+        return data 
\ No newline at end of file
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from courses.models import Course, CourseSchedule, Enrollment
+from courses.signals import enrollment_status_changed, schedules_replaced
+
+from .feeds import invalidate_feeds
+from .models import CalendarEvent, DiaryEntry
+from .search import index_entry
+
+
+@receiver(post_save, sender=DiaryEntry)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    # Postings go with the entry through the cascade on delete
+    if not raw:
+        index_entry(instance)
+
+
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+def reset_event_owner_feed(sender, instance, **kwargs):
+    # Bumped on commit so a feed rendered meanwhile can't cache the old rows under the new version
+    transaction.on_commit(lambda: invalidate_feeds([instance.user_id]))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def reset_student_feed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_feeds([instance.student_id]))
+
+
+@receiver(enrollment_status_changed)
+def reset_student_feeds(sender, student_ids, **kwargs):
+    transaction.on_commit(lambda: invalidate_feeds(student_ids))
+
+
+def _reset_course_feeds(course_id, lecturer_id):
+    def reset():
+        students = Enrollment.objects.filter(course_id=course_id, status='enrolled').values_list('student_id', flat=True)
+        invalidate_feeds([lecturer_id, *students])
+    transaction.on_commit(reset)
+
+
+@receiver(schedules_replaced)
+def reset_replaced_schedule_feeds(sender, course_ids, **kwargs):
+    def reset():
+        students = Enrollment.objects.filter(course_id__in=course_ids, status='enrolled').values_list('student_id', flat=True)
+        lecturers = Course.objects.filter(id__in=course_ids).values_list('lecturer_id', flat=True)
+        invalidate_feeds([*students, *lecturers])
+    transaction.on_commit(reset)
+
+
+@receiver(post_save, sender=CourseSchedule)
+@receiver(post_delete, sender=CourseSchedule)
+def reset_schedule_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reset_course_feeds(instance.course_id, instance.course.lecturer_id)
+
+
+@receiver(post_save, sender=Course)
+def reset_course_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reset_course_feeds(instance.id, instance.lecturer_id)
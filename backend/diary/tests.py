@@ -1,3 +1,233 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta, timezone
+from importlib import import_module
+from unittest.mock import patch
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from rest_framework.test import APIClient
+
+from courses.models import Course, CourseSchedule, Enrollment
+from .models import CalendarEvent, DiaryEntry, DiarySearchTerm
+
+User = get_user_model()
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        lecturer = User.objects.create_user(username='lecturer1', password='pass', role='lecturer')
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.course = Course.objects.create(
+            code='IT101', name='Networks, Part 1', description='Test course', credits=3,
+            lecturer=lecturer, year=2025,
+        )
+        self.schedule = CourseSchedule.objects.create(
+            course=self.course, day_of_week='wednesday', start_time=time(9), end_time=time(11),
+            room='101', building='Main',
+        )
+        Enrollment.objects.create(student=self.student, course=self.course)
+        CalendarEvent.objects.create(
+            user=self.student, title='Study group', start_datetime=datetime(2025, 3, 4, 14, tzinfo=timezone.utc),
+            end_datetime=datetime(2025, 3, 4, 15, tzinfo=timezone.utc),
+        )
+        self.client.force_authenticate(user=self.student)
+        self.url = self.client.get('/api/diary/calendar-events/feed/').data['url']
+        self.client.force_authenticate(user=None)
+
+    def get_feed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def test_feed_contains_weekly_sessions_and_events(self):
+        feed = self.get_feed()
+        self.assertTrue(feed.startswith('BEGIN:VCALENDAR\r\n'))
+        # The first semester starts on Wednesday 15 January in 2025
+        self.assertIn('DTSTART;TZID=UTC:20250115T090000', feed)
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20250531T235959Z', feed)
+        self.assertIn('SUMMARY:IT101 Networks\\, Part 1', feed)
+        self.assertIn('DTSTART:20250304T140000Z', feed)
+        self.assertTrue(feed.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('BEGIN:VTIMEZONE\r\nTZID:UTC\r\nBEGIN:STANDARD\r\nDTSTART:20250115T000000\r\n', feed)
+
+    @override_settings(TIME_ZONE='Europe/London')
+    def test_local_session_times_come_with_their_timezone(self):
+        feed = self.get_feed()
+        self.assertIn('DTSTART;TZID=Europe/London:20250115T090000', feed)
+        # Clocks go forward at 01:00 GMT on 30 March 2025, within the semester
+        self.assertIn(
+            'BEGIN:VTIMEZONE\r\nTZID:Europe/London\r\n'
+            'BEGIN:STANDARD\r\nDTSTART:20250115T000000\r\nTZOFFSETFROM:+0000\r\nTZOFFSETTO:+0000\r\n'
+            'TZNAME:GMT\r\nEND:STANDARD\r\n'
+            'BEGIN:DAYLIGHT\r\nDTSTART:20250330T010000\r\nTZOFFSETFROM:+0000\r\nTZOFFSETTO:+0100\r\n'
+            'TZNAME:BST\r\nEND:DAYLIGHT\r\nEND:VTIMEZONE\r\n',
+            feed,
+        )
+        self.assertEqual(feed.count('BEGIN:VTIMEZONE'), 1)
+
+    def test_repeat_polls_are_served_from_cache(self):
+        self.get_feed()
+        with CaptureQueriesContext(connection) as ctx:
+            self.get_feed()
+        # Only the token lookup, besides reads of the database cache table
+        queries = [query['sql'] for query in ctx.captured_queries if 'django_cache' not in query['sql']]
+        self.assertEqual(len(queries), 1)
+
+    def test_changes_invalidate_the_cached_feed(self):
+        self.get_feed()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.schedule.room = '202'
+            self.schedule.save()
+            # Until the change commits the cached feed stands, so a feed
+            # rendered meanwhile can't be cached as the new version
+            self.assertIn('LOCATION:101 Main', self.get_feed())
+        self.assertTrue(callbacks)
+        self.assertIn('LOCATION:202 Main', self.get_feed())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CalendarEvent.objects.create(
+                user=self.student, title='Exam', start_datetime=datetime(2025, 5, 1, 9, tzinfo=timezone.utc),
+                end_datetime=datetime(2025, 5, 1, 12, tzinfo=timezone.utc),
+            )
+        self.assertIn('SUMMARY:Exam', self.get_feed())
+
+        self.client.force_authenticate(user=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/courses/{self.course.id}/drop/')
+        self.client.force_authenticate(user=None)
+        self.assertNotIn('IT101', self.get_feed())
+
+    def test_rotating_the_token_revokes_the_old_url(self):
+        self.client.force_authenticate(user=self.student)
+        new_url = self.client.post('/api/diary/calendar-events/feed/').data['url']
+        self.assertNotEqual(new_url, self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class CalendarRangeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student0', password='pass', role='student')
+        self.client.force_authenticate(user=self.user)
+
+    def create_event(self, title, start, hours=1, **kwargs):
+        return CalendarEvent.objects.create(
+            user=self.user, title=title, start_datetime=start,
+            end_datetime=start + timedelta(hours=hours), **kwargs
+        )
+
+    def get_range(self, start, end):
+        response = self.client.get('/api/diary/calendar-events/', {'start': start, 'end': end})
+        self.assertEqual(response.status_code, 200)
+        return [(event['title'], event['start_datetime']) for event in response.data]
+
+    def test_only_overlapping_events_are_returned(self):
+        self.create_event('Before', datetime(2025, 2, 27, 9, tzinfo=timezone.utc))
+        self.create_event('Spanning', datetime(2025, 2, 28, 22, tzinfo=timezone.utc), hours=4)
+        self.create_event('Inside', datetime(2025, 3, 10, 9, tzinfo=timezone.utc))
+        self.create_event('After', datetime(2025, 4, 1, 0, tzinfo=timezone.utc))
+        titles = [title for title, _ in self.get_range('2025-03-01', '2025-04-01')]
+        self.assertEqual(titles, ['Spanning', 'Inside'])
+
+    def test_recurring_events_are_expanded_within_the_window(self):
+        self.create_event('Gym', datetime(2024, 12, 30, 7, tzinfo=timezone.utc), recurrence='weekly')
+        self.create_event(
+            'Rent', datetime(2024, 10, 31, 12, tzinfo=timezone.utc), recurrence='monthly',
+            recurrence_until=date(2025, 5, 1),
+        )
+        self.create_event(
+            'Old habit', datetime(2024, 1, 1, 6, tzinfo=timezone.utc), recurrence='daily',
+            recurrence_until=date(2024, 6, 1),
+        )
+        occurrences = self.get_range('2025-03-01', '2025-04-01')
+        gym = [start for title, start in occurrences if title == 'Gym']
+        self.assertEqual(len(gym), 5)
+        self.assertTrue(gym[0].startswith('2025-03-03T07:00'))
+        # Only months with a 31st
+        self.assertEqual([start[:10] for title, start in occurrences if title == 'Rent'], ['2025-03-31'])
+        self.assertNotIn('Old habit', [title for title, _ in occurrences])
+
+    def test_range_query_uses_one_query(self):
+        for day in range(1, 29):
+            self.create_event(f'Event {day}', datetime(2025, 2, day, 9, tzinfo=timezone.utc))
+        with CaptureQueriesContext(connection) as ctx:
+            self.get_range('2025-02-01', '2025-02-08')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_invalid_range_is_rejected(self):
+        response = self.client.get('/api/diary/calendar-events/', {'start': '2025-03-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/diary/calendar-events/', {'start': '2025-03-01', 'end': '2027-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DiarySearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student0', password='pass', role='student')
+        self.other = User.objects.create_user(username='student1', password='pass', role='student')
+        self.client.force_authenticate(user=self.user)
+
+    def create_entry(self, title, content, user=None):
+        return DiaryEntry.objects.create(user=user or self.user, title=title, content=content, date=date(2025, 3, 1))
+
+    def search(self, query):
+        response = self.client.get('/api/diary/diary-entries/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_results_are_ranked_and_highlighted(self):
+        self.create_entry('Groceries', 'Bought bread and milk.')
+        passing = self.create_entry('Exam results', 'Passed the networks exam <finally>!')
+        mention = self.create_entry('Monday', 'Started revising for an exam.')
+        self.create_entry('Exam', 'Someone else', user=self.other)
+
+        results = self.search('Exam networks')
+        self.assertEqual([result['id'] for result in results], [passing.id, mention.id])
+        self.assertEqual(results[0]['highlight']['title'], '<mark>Exam</mark> results')
+        self.assertIn('<mark>networks</mark> <mark>exam</mark> &lt;finally&gt;', results[0]['highlight']['content'])
+
+    def test_index_follows_edits_and_deletes(self):
+        entry = self.create_entry('Trip', 'Visited Mutare.')
+        self.assertEqual(len(self.search('mutare')), 1)
+
+        entry.content = 'Visited Nyanga.'
+        entry.save()
+        self.assertEqual(self.search('mutare'), [])
+        self.assertEqual(len(self.search('nyanga')), 1)
+
+        entry.delete()
+        self.assertEqual(self.search('nyanga'), [])
+        self.assertFalse(DiarySearchTerm.objects.exists())
+
+    def test_accents_and_case_are_folded(self):
+        self.create_entry('Café', 'Coffee with friends.')
+        self.assertEqual(len(self.search('CAFE')), 1)
+
+        entry = self.create_entry('Straße', 'Walked down the strasse, then the STRASSE again.')
+        self.assertEqual(
+            list(DiarySearchTerm.objects.filter(entry=entry, term='strasse').values_list('title_count', 'content_count')),
+            [(1, 2)],
+        )
+        self.assertEqual([result['id'] for result in self.search('strasse')], [entry.id])
+
+    def test_backfill_matches_the_live_index(self):
+        # The migration carries its own copy of the tokenizer; this holds for
+        # as long as diary.search still tokenizes the same way
+        backfill = import_module('diary.migrations.0004_diarysearchterm')
+        for i in range(30):
+            self.create_entry(f'Day {i}', f'Entry number {i} about networks and Straße {i % 3}.')
+        live = sorted(DiarySearchTerm.objects.values_list('entry_id', 'term', 'title_count', 'content_count'))
+
+        DiarySearchTerm.objects.all().delete()
+        with patch.object(backfill, 'BATCH_SIZE', 7):
+            backfill.index_existing_entries(django_apps, None)
+        rebuilt = sorted(DiarySearchTerm.objects.values_list('entry_id', 'term', 'title_count', 'content_count'))
+        self.assertEqual(rebuilt, live)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DiaryEntryViewSet, CalendarEventViewSet
+from .views import DiaryEntryViewSet, CalendarEventViewSet, calendar_feed
 
 router = DefaultRouter()
 router.register(r'diary-entries', DiaryEntryViewSet, basename='diaryentry')
@@ -8,4 +8,5 @@ router.register(r'calendar-events', CalendarEventViewSet, basename='calendareven
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar-feed'),
 ] 
\ No newline at end of file
@@ -1,26 +1,86 @@
-from django.shortcuts import render
-from rest_framework import viewsets, permissions
-from .models import DiaryEntry, CalendarEvent
+from django.shortcuts import get_object_or_404, render
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .feeds import cached_feed
+from .models import DiaryEntry, CalendarEvent, CalendarFeed
+from .recurrence import expand, parse_range
+from .search import SNIPPET_RADIUS, highlight, search_entries
 from .serializers import DiaryEntrySerializer, CalendarEventSerializer
 
+ICS_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
 # Create your views here.
 
 class DiaryEntryViewSet(viewsets.ModelViewSet):
     serializer_class = DiaryEntrySerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ['-created_at']
 
     def get_queryset(self):
         return DiaryEntry.objects.filter(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """With ?q=, the best matching entries ranked by relevance, with highlights"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+
+        entries, scores, terms = search_entries(request.user, query)
+        results = self.get_serializer(entries, many=True).data
+        for entry, result in zip(entries, results):
+            result['score'] = round(scores[entry.id], 4)
+            result['highlight'] = {
+                'title': highlight(entry.title, terms),
+                'content': highlight(entry.content, terms, radius=SNIPPET_RADIUS),
+            }
+        return Response(results)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 class CalendarEventViewSet(viewsets.ModelViewSet):
     serializer_class = CalendarEventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ['start_datetime']
 
     def get_queryset(self):
-        return CalendarEvent.objects.filter(user=self.request.user)
+        return CalendarEvent.objects.filter(user=self.request.user).select_related('user')
+
+    def list(self, request, *args, **kwargs):
+        """With ?start=&end=, every occurrence in that window, recurring events expanded"""
+        if 'start' not in request.query_params and 'end' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        try:
+            start, end = parse_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = expand(self.get_queryset().overlapping(start, end), start, end)
+        return Response(self.get_serializer(events, many=True).data)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get', 'post'])
+    def feed(self, request):
+        """Subscription URL for the user's .ics feed; POST issues a new one"""
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if request.method == 'POST' and not created:
+            feed.rotate()
+        url = request.build_absolute_uri(reverse('calendar-feed', args=[feed.token]))
+        return Response({'url': url})
+
+def calendar_feed(request, token):
+    """Public iCalendar feed, authenticated by the secret token in the URL"""
+    feed = get_object_or_404(CalendarFeed.objects.select_related('user'), token=token)
+    content, chunks = cached_feed(feed.user)
+    if content is not None:
+        response = HttpResponse(content, content_type=ICS_CONTENT_TYPE)
+    else:
+        response = StreamingHttpResponse(chunks, content_type=ICS_CONTENT_TYPE)
+    response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+    response['Cache-Control'] = 'private, max-age=900'
+    return response
@@ -0,0 +1,210 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import DeletedOrder, Order
+from .serializers import OrderSerializer
+
+OPEN_STATUSES = ['pending', 'processing']
+BATCH_SIZE = 200
+MAX_WAIT = 30
+POLL_INTERVAL = 0.5
+# updated_at is stamped when an order is saved, not when its transaction
+# commits, so a slow transaction can commit a change older than one a client
+# has already been sent. Every poll re-reads this much history and skips the
+# changes the cursor lists as sent; a save that takes longer than this to
+# commit can still be missed.
+COMMIT_WINDOW = timedelta(seconds=10)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _micros(moment):
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _moment(micros):
+    try:
+        return _EPOCH + timedelta(microseconds=int(micros))
+    except OverflowError:
+        raise ValueError(f'Timestamp out of range: {micros}')
+
+
+def encode_cursor(horizon, sent=()):
+    """
+    ``<horizon>[_<order id>.<updated_at>...]``, times in microseconds: every
+    change up to the horizon has been sent, and so have the listed ones after
+    it. URL-safe and exact.
+    """
+    changes = [f'{order_id}.{_micros(updated_at)}' for order_id, updated_at in sorted(sent)]
+    return '_'.join([str(_micros(horizon))] + changes)
+
+
+def parse_cursor(cursor):
+    """``(horizon, sent)`` for a cursor; raises ValueError if it is malformed."""
+    horizon, *sent = cursor.split('_')
+    pairs = [change.split('.') for change in sent]
+    if any(len(pair) != 2 for pair in pairs):
+        raise ValueError(f'Malformed cursor: {cursor}')
+    return _moment(horizon), {(int(order_id), _moment(micros)) for order_id, micros in pairs}
+
+
+def _version_key(department):
+    return f'order-feed-version:{department}'
+
+
+async def department_version(department):
+    """
+    A counter bumped whenever one of the department's orders is committed.
+    Waiting clients compare it instead of querying the orders table, so an
+    idle connection costs one cache read per poll. It lives in the shared
+    default cache (Redis or the database cache table, see CACHES), so a
+    change committed by any worker wakes clients waiting on every other.
+    """
+    return await cache.aget_or_set(_version_key(department), time.time_ns, None)
+
+
+def bump_department(department):
+    try:
+        cache.incr(_version_key(department))
+    except ValueError:
+        cache.set(_version_key(department), time.time_ns(), None)
+
+
+def _serialize(orders):
+    return OrderSerializer(orders, many=True).data
+
+
+def open_orders(department):
+    """The department's open queue and the cursor to follow changes from."""
+    orders = Order.objects.filter(department=department)
+    # Take the cursor first: an order changed in between is sent twice,
+    # never missed
+    horizon = timezone.now() - COMMIT_WINDOW
+    sent = set(orders.filter(updated_at__gt=horizon).values_list('id', 'updated_at'))
+    queue = (
+        orders.filter(status__in=OPEN_STATUSES)
+        .select_related('user').prefetch_related('items__product')
+        .order_by('created_at', 'id')
+    )
+    return {'cursor': encode_cursor(horizon, sent), 'results': _serialize(queue), 'deleted': [], 'has_more': False}
+
+
+def changed_orders(department, cursor):
+    """
+    Orders of the department created, updated or deleted after ``cursor``,
+    oldest change first, at most BATCH_SIZE at a time. Deleted orders are
+    listed by id under ``deleted``.
+    """
+    horizon, sent = parse_cursor(cursor)
+    # Anything saved after this reading is past the new horizon
+    now = timezone.now()
+    limit = BATCH_SIZE + len(sent) + 1
+    saved = (
+        Order.objects.filter(department=department, updated_at__gt=horizon)
+        .order_by('updated_at', 'id')
+        .values_list('id', 'updated_at')[:limit]
+    )
+    deleted = (
+        DeletedOrder.objects.filter(department=department, deleted_at__gt=horizon)
+        .order_by('deleted_at', 'order_id')
+        .values_list('order_id', 'deleted_at')[:limit]
+    )
+    changes = sorted(
+        [(order_id, at, False) for order_id, at in saved if (order_id, at) not in sent]
+        + [(order_id, at, True) for order_id, at in deleted if (order_id, at) not in sent],
+        key=lambda change: (change[1], change[0]),
+    )
+    has_more = len(changes) > BATCH_SIZE
+    changes = changes[:BATCH_SIZE]
+    orders = Order.objects.select_related('user').prefetch_related('items__product').in_bulk(
+        [order_id for order_id, _, removed in changes if not removed]
+    )
+    # Rows changed again since the first read are sent as they are now, and
+    # rows deleted since then are left to their own change
+    orders = [orders[order_id] for order_id, _, removed in changes if not removed and order_id in orders]
+
+    if has_more:
+        # The changes after the last one sent are still to come
+        horizon = max(horizon, min(now - COMMIT_WINDOW, changes[-1][1] - timedelta(microseconds=1)))
+    else:
+        horizon = max(horizon, now - COMMIT_WINDOW)
+    sent |= {(order.id, order.updated_at) for order in orders}
+    sent |= {(order_id, at) for order_id, at, removed in changes if removed}
+    sent = {change for change in sent if change[1] > horizon}
+    return {
+        'cursor': encode_cursor(horizon, sent),
+        'results': _serialize(orders),
+        'deleted': [order_id for order_id, _, removed in changes if removed],
+        'has_more': has_more,
+    }
+
+
+class _DepartmentWatch:
+    """
+    One poll of a department's version per event loop, shared by every
+    client waiting on that department, so a process with hundreds of idle
+    kitchen screens reads the cache once per POLL_INTERVAL per department
+    rather than once per screen.
+    """
+
+    def __init__(self, department):
+        self.department = department
+        self.version = None
+        self.changed = asyncio.Event()
+        self.waiters = 0
+        self.task = None
+
+    async def current(self):
+        """The version as last read, to query against and then wait on."""
+        if self.version is None:
+            self.version = await department_version(self.department)
+        return self.version
+
+    async def wait(self, version, timeout):
+        """Wait up to ``timeout`` seconds for the version to move on from ``version``."""
+        deadline = time.monotonic() + timeout
+        while self.version == version and time.monotonic() < deadline:
+            try:
+                await asyncio.wait_for(self.changed.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self):
+        try:
+            while self.waiters:
+                await asyncio.sleep(POLL_INTERVAL)
+                version = await department_version(self.department)
+                if version != self.version:
+                    self.version = version
+                    self.changed.set()
+                    self.changed = asyncio.Event()
+        finally:
+            self.task = None
+            # The next waiter starts from a fresh read
+            self.version = None
+
+
+_watches = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def watching(department):
+    """The department's shared watch in this event loop, polled while anyone holds it."""
+    loop = asyncio.get_running_loop()
+    watches = _watches.setdefault(loop, {})
+    if department not in watches:
+        watches[department] = _DepartmentWatch(department)
+    watch = watches[department]
+    watch.waiters += 1
+    if watch.task is None:
+        watch.task = loop.create_task(watch._poll())
+    try:
+        yield watch
+    finally:
+        watch.waiters -= 1
@@ -0,0 +1,27 @@
+from datetime import date, time
+
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.pickup import create_slots
+
+
+class Command(BaseCommand):
+    help = 'Create a day of back-to-back pickup slots for a department'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', choices=[choice for choice, _ in Order.DEPARTMENT_CHOICES], default='cafeteria')
+        parser.add_argument('--date', type=date.fromisoformat, required=True)
+        parser.add_argument('--start', type=time.fromisoformat, default=time(11))
+        parser.add_argument('--end', type=time.fromisoformat, default=time(14))
+        parser.add_argument('--minutes', type=int, default=15)
+        parser.add_argument('--capacity', type=int, default=20, help='Orders the department can prepare per slot')
+
+    def handle(self, *args, **options):
+        count = create_slots(
+            options['department'], options['date'], options['start'], options['end'],
+            options['minutes'], options['capacity'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} pickup slots for {options['department']} on {options['date']} (existing slots kept)."
+        ))
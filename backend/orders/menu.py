@@ -0,0 +1,61 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product
+from .serializers import ProductSerializer
+
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+# A worker keeps the menus it served in its own memory for this many
+# seconds, so a hit makes no shared cache read (a query with the database
+# cache). Changes made by other workers show up within it.
+LOCAL_TIMEOUT = 2
+_VERSION_KEY = 'product-menu-version'
+# Category -> (time.monotonic() of the shared cache read, menu)
+_local = {}
+
+
+def menu_version():
+    return cache.get_or_set(_VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_menu():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, time.time_ns(), None)
+    # This worker serves its own changes at once
+    _local.clear()
+
+
+def cached_menu(category=None):
+    """
+    The active products, optionally of one category, as rendered JSON bytes
+    and a strong ETag over them. Each category is rendered once per menu
+    version; saving or deleting any product bumps the version, so stale
+    entries are never read again and simply expire. The version and the
+    rendered menus live in the shared default cache (see CACHES), in front
+    of which each worker keeps what it served for LOCAL_TIMEOUT seconds. A
+    hit within that needs no queries; after it, a hit costs the shared
+    cache reads of the version and the menu, which are queries with the
+    database cache.
+    """
+    name = category or 'all'
+    now = time.monotonic()
+    local = _local.get(name)
+    if local and now - local[0] < LOCAL_TIMEOUT:
+        return local[1]
+
+    key = f'product-menu:{menu_version()}:{name}'
+    menu = cache.get(key)
+    if menu is None:
+        products = Product.objects.filter(is_active=True).order_by('category', 'name', 'id')
+        if category:
+            products = products.filter(category=category)
+        content = JSONRenderer().render(ProductSerializer(products, many=True).data)
+        menu = (content, f'"{hashlib.sha1(content).hexdigest()}"')
+        cache.set(key, menu, MENU_CACHE_TIMEOUT)
+    _local[name] = (now, menu)
+    return menu
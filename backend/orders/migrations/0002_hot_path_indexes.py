@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['department', 'status', 'created_at'], name='order_dept_status_created_idx'),
+        ),
+    ]
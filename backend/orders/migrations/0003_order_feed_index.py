@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['department', 'updated_at'], name='order_dept_updated_idx'),
+        ),
+    ]
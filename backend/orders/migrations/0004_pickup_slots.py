@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='pickup_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PickupSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(choices=[('cafeteria', 'Cafeteria'), ('bookstore', 'Bookstore'), ('print', 'Print Services'), ('other', 'Other')], max_length=20)),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('reserved', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'starts_at'), name='pickupslot_dept_start_uniq'), models.CheckConstraint(condition=models.Q(('reserved__lte', models.F('capacity'))), name='pickupslot_within_capacity')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='orders.pickupslot'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['department', 'pickup_at'], name='order_dept_pickup_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_pickup_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField()),
+                ('department', models.CharField(choices=[('cafeteria', 'Cafeteria'), ('bookstore', 'Bookstore'), ('print', 'Print Services'), ('other', 'Other')], max_length=20)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['department', 'deleted_at'], name='deletedorder_dept_deleted_idx')],
+            },
+        ),
+    ]
@@ -34,12 +34,53 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     department = models.CharField(max_length=20, choices=DEPARTMENT_CHOICES)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    pickup_slot = models.ForeignKey('PickupSlot', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    # Copied from the slot so the prep queue is one range scan of this table
+    pickup_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', 'status', 'created_at'], name='order_dept_status_created_idx'),
+            models.Index(fields=['department', 'updated_at'], name='order_dept_updated_idx'),
+            models.Index(fields=['department', 'pickup_at'], name='order_dept_pickup_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user.username} ({self.department})"
 
+class DeletedOrder(models.Model):
+    """Left behind by a deleted order so the change feed can report it"""
+    order_id = models.BigIntegerField()
+    department = models.CharField(max_length=20, choices=Order.DEPARTMENT_CHOICES)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', 'deleted_at'], name='deletedorder_dept_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted order #{self.order_id} ({self.department})"
+
+class PickupSlot(models.Model):
+    department = models.CharField(max_length=20, choices=Order.DEPARTMENT_CHOICES)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    capacity = models.PositiveIntegerField()
+    # Only changed by conditional updates, never by saving a loaded slot
+    reserved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'starts_at'], name='pickupslot_dept_start_uniq'),
+            models.CheckConstraint(condition=models.Q(reserved__lte=models.F('capacity')), name='pickupslot_within_capacity'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_department_display()} pickup {self.starts_at:%Y-%m-%d %H:%M} ({self.reserved}/{self.capacity})"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
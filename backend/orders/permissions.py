@@ -0,0 +1,31 @@
+from rest_framework import permissions
+
+from .models import Order
+
+
+def is_department_staff(user):
+    return bool(
+        user and
+        user.is_authenticated and
+        user.role == 'staff' and
+        user.staff_type in dict(Order.DEPARTMENT_CHOICES)
+    )
+
+
+class IsDepartmentStaff(permissions.BasePermission):
+    """
+    Allow access only to staff of an ordering department.
+    """
+    def has_permission(self, request, view):
+        return is_department_staff(request.user)
+
+
+class IsDepartmentStaffOrReadOnly(permissions.BasePermission):
+    """
+    Allow reads to any user; changes only to staff of the object's department.
+    """
+    def has_permission(self, request, view):
+        return request.method in permissions.SAFE_METHODS or is_department_staff(request.user)
+
+    def has_object_permission(self, request, view, obj):
+        return request.method in permissions.SAFE_METHODS or obj.department == request.user.staff_type
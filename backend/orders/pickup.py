@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PickupSlot
+
+
+def reserve_slot(slot_id):
+    """
+    Take one place in a slot with a single conditional UPDATE. Returns
+    False if the slot is already full. The row is locked only until the
+    surrounding transaction commits, so call this as late in it as possible.
+    """
+    return bool(
+        PickupSlot.objects.filter(id=slot_id, reserved__lt=F('capacity'))
+        .update(reserved=F('reserved') + 1)
+    )
+
+
+def release_slot(slot_id):
+    PickupSlot.objects.filter(id=slot_id, reserved__gt=0).update(reserved=F('reserved') - 1)
+
+
+def day_bounds(day):
+    """Start and end of a calendar day in the current time zone."""
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+
+def create_slots(department, day, start, end, minutes, capacity):
+    """
+    Back-to-back slots of ``minutes`` from ``start`` to ``end`` on ``day``.
+    Slots that already exist are left as they are. Returns how many were asked for.
+    """
+    length = timedelta(minutes=minutes)
+    slot_start = timezone.make_aware(datetime.combine(day, start))
+    last = timezone.make_aware(datetime.combine(day, end))
+    slots = []
+    while slot_start + length <= last:
+        slots.append(PickupSlot(
+            department=department, starts_at=slot_start, ends_at=slot_start + length, capacity=capacity,
+        ))
+        slot_start += length
+    PickupSlot.objects.bulk_create(slots, ignore_conflicts=True)
+    return len(slots)
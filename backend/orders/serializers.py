@@ -1,5 +1,10 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Product, Order, OrderItem
+from .models import Product, Order, OrderItem, PickupSlot
+from .pickup import reserve_slot
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,4 +25,104 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'status', 'department', 'total_price', 'created_at', 'updated_at', 'items'] 
\ No newline at end of file
+        fields = [
+            'id', 'user', 'status', 'department', 'total_price', 'pickup_slot', 'pickup_at',
+            'created_at', 'updated_at', 'items',
+        ]
+        # Set at checkout from the cart and the product prices
+        read_only_fields = ['department', 'total_price', 'pickup_slot', 'pickup_at']
+
+class PickupSlotSerializer(serializers.ModelSerializer):
+    remaining = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PickupSlot
+        fields = ['id', 'department', 'starts_at', 'ends_at', 'capacity', 'reserved', 'remaining']
+        read_only_fields = ['department', 'reserved']
+
+    def get_remaining(self, slot):
+        return slot.capacity - slot.reserved
+
+    def validate(self, attrs):
+        starts_at = attrs.get('starts_at', getattr(self.instance, 'starts_at', None))
+        ends_at = attrs.get('ends_at', getattr(self.instance, 'ends_at', None))
+        if starts_at and ends_at and ends_at <= starts_at:
+            raise serializers.ValidationError("Slot must end after it starts.")
+        if self.instance and attrs.get('capacity', self.instance.capacity) < self.instance.reserved:
+            raise serializers.ValidationError(f"{self.instance.reserved} orders are already booked in this slot.")
+        return attrs
+
+    def update(self, instance, validated_data):
+        fields = dict(validated_data)
+        with transaction.atomic():
+            if 'capacity' in fields:
+                # Conditional, so a place taken since validate() can't end up over capacity
+                capacity = fields.pop('capacity')
+                if not PickupSlot.objects.filter(pk=instance.pk, reserved__lte=capacity).update(capacity=capacity):
+                    raise serializers.ValidationError({'capacity': "More orders are already booked in this slot."})
+                instance.capacity = capacity
+            # Save only the edited fields so reservations taken meanwhile are kept
+            for field, value in fields.items():
+                setattr(instance, field, value)
+            if fields:
+                instance.save(update_fields=list(fields))
+            if 'starts_at' in fields:
+                # Orders carry a copy of the pickup time for the prep queue
+                Order.objects.filter(pickup_slot=instance).update(pickup_at=instance.starts_at, updated_at=timezone.now())
+        instance.refresh_from_db(fields=['reserved'])
+        return instance
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=99, default=1)
+
+class CheckoutSerializer(serializers.Serializer):
+    """A whole cart placed as one order, priced from the current product list"""
+    department = serializers.ChoiceField(choices=Order.DEPARTMENT_CHOICES)
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+    pickup_slot = serializers.PrimaryKeyRelatedField(queryset=PickupSlot.objects.all(), required=False)
+
+    def validate_items(self, items):
+        # The same product added twice is one line with the combined quantity
+        quantities = {}
+        for item in items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+
+        products = Product.objects.filter(is_active=True).in_bulk(list(quantities))
+        missing = [str(product_id) for product_id in quantities if product_id not in products]
+        if missing:
+            raise serializers.ValidationError(f"Products not available: {', '.join(missing)}.")
+        return [(products[product_id], quantity) for product_id, quantity in quantities.items()]
+
+    def validate(self, attrs):
+        slot = attrs.get('pickup_slot')
+        if slot:
+            # Reserving at create is what counts; these only fail fast
+            if slot.department != attrs['department']:
+                raise serializers.ValidationError({'pickup_slot': "This pickup slot belongs to another department."})
+            if slot.starts_at <= timezone.now():
+                raise serializers.ValidationError({'pickup_slot': "This pickup slot has already started."})
+            if slot.reserved >= slot.capacity:
+                raise serializers.ValidationError({'pickup_slot': "This pickup slot is full."})
+        return attrs
+
+    def create(self, validated_data):
+        lines = validated_data['items']
+        slot = validated_data.get('pickup_slot')
+        total = sum((product.price * quantity for product, quantity in lines), Decimal('0'))
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=validated_data['user'],
+                department=validated_data['department'],
+                total_price=total,
+                pickup_slot=slot,
+                pickup_at=slot.starts_at if slot else None,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=quantity, price_at_order=product.price)
+                for product, quantity in lines
+            ])
+            # Last, so the slot row stays locked only until the commit
+            if slot and not reserve_slot(slot.id):
+                raise serializers.ValidationError({'pickup_slot': "This pickup slot is full."})
+        return order
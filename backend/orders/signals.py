@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .feed import bump_department
+from .menu import invalidate_menu
+from .models import DeletedOrder, Order, Product
+
+
+@receiver(post_save, sender=Order)
+def notify_order_feed(sender, instance, raw=False, **kwargs):
+    # Wake waiting clients only once the change is visible to their queries
+    if not raw:
+        transaction.on_commit(lambda: bump_department(instance.department))
+
+
+@receiver(post_delete, sender=Order)
+def record_deleted_order(sender, instance, **kwargs):
+    # The feed has no row left to report, so it reads this instead
+    DeletedOrder.objects.create(order_id=instance.id, department=instance.department)
+    transaction.on_commit(lambda: bump_department(instance.department))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def reset_menu(sender, **kwargs):
+    # Bumped on commit so a reader can't cache the old rows under the new version
+    transaction.on_commit(invalidate_menu)
@@ -1,3 +1,494 @@
+import asyncio
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .menu import cached_menu
+from .models import Order, OrderItem, PickupSlot, Product
+from .pickup import reserve_slot
+from .serializers import PickupSlotSerializer
+
+User = get_user_model()
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.client.force_authenticate(user=self.student)
+        self.products = [
+            Product.objects.create(name=f'Item {i}', price=Decimal('12.50') + i, category='food')
+            for i in range(10)
+        ]
+
+    def checkout(self, items, department='cafeteria'):
+        return self.client.post(
+            '/api/orders/orders/checkout/', {'department': department, 'items': items}, format='json'
+        )
+
+    def test_cart_is_placed_in_one_request_with_server_prices(self):
+        items = [{'product_id': product.id, 'quantity': 2} for product in self.products]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.checkout(items + [{'product_id': self.products[0].id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get()
+        expected = sum(product.price * 2 for product in self.products) + self.products[0].price
+        self.assertEqual(order.total_price, expected)
+        self.assertEqual(Decimal(response.data['total_price']), expected)
+        self.assertEqual(len(response.data['items']), 10)
+        self.assertEqual(OrderItem.objects.get(order=order, product=self.products[0]).quantity, 3)
+        # Product prices, order insert, bulk item insert, plus the reload for the response
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+
+    def test_unavailable_products_reject_the_whole_cart(self):
+        self.products[1].is_active = False
+        self.products[1].save()
+        response = self.checkout([
+            {'product_id': self.products[0].id, 'quantity': 1},
+            {'product_id': self.products[1].id, 'quantity': 1},
+            {'product_id': 9999, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'{self.products[1].id}, 9999', str(response.data['items']))
+        self.assertFalse(Order.objects.exists())
+
+    def test_client_totals_are_ignored(self):
+        items = [{'product_id': self.products[0].id, 'quantity': 2}]
+        response = self.client.post('/api/orders/orders/', {
+            'department': 'cafeteria', 'items': items, 'total_price': '0.01', 'status': 'completed',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['total_price']), self.products[0].price * 2)
+        self.assertEqual(response.data['status'], 'pending')
+        # A bare order without a cart is no longer accepted
+        response = self.client.post('/api/orders/orders/', {'department': 'cafeteria', 'total_price': '0.01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        order_id = Order.objects.get().id
+        response = self.client.patch(
+            f'/api/orders/orders/{order_id}/', {'total_price': '0.01', 'department': 'bookstore'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual((order.total_price, order.department), (self.products[0].price * 2, 'cafeteria'))
+
+    def test_empty_cart_and_bad_quantities_are_rejected(self):
+        self.assertEqual(self.checkout([]).status_code, 400)
+        self.assertEqual(self.checkout([{'product_id': self.products[0].id, 'quantity': 0}]).status_code, 400)
+        self.assertEqual(self.checkout([{'product_id': self.products[0].id}], department='nowhere').status_code, 400)
+
+
+class OrderListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='cafeteria1', password='pass', role='staff', staff_type='cafeteria'
+        )
+        self.products = [
+            Product.objects.create(name=f'Item {i}', price=Decimal('10.00'), category='food')
+            for i in range(5)
+        ]
+        self.order_count = 0
+
+    def create_orders(self, count, status='pending'):
+        users = User.objects.bulk_create([
+            User(username=f'student{self.order_count + i}', role='student') for i in range(count)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(user=user, department='cafeteria', status=status, total_price=Decimal('20.00'))
+            for user in users
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price_at_order=product.price)
+            for order in orders for product in self.products[:2]
+        ])
+        self.order_count += count
+
+    def list_orders(self, **params):
+        self.client.force_authenticate(user=self.staff)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/orders/orders/', {'paginate': 'false', **params})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_dashboard_query_count_is_constant(self):
+        self.create_orders(10)
+        small, _ = self.list_orders(status='pending')
+        self.create_orders(990)
+        self.create_orders(5, status='completed')
+        large, data = self.list_orders(status='pending')
+        self.assertEqual(small, large)
+        self.assertEqual(len(data), 1000)
+        self.assertEqual(len(data[0]['items']), 2)
+
+    def test_status_and_date_filters(self):
+        self.create_orders(2)
+        self.create_orders(1, status='processing')
+        self.create_orders(1, status='completed')
+        _, data = self.list_orders(status__in='pending,processing')
+        self.assertEqual(len(data), 3)
+        _, data = self.list_orders(created_at__gte='2000-01-01T00:00:00Z', status='completed')
+        self.assertEqual(len(data), 1)
+        _, data = self.list_orders(created_at__lt='2000-01-01T00:00:00Z')
+        self.assertEqual(data, [])
+
+
+class OrderFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='cafeteria1', password='pass', role='staff', staff_type='cafeteria'
+        )
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.product = Product.objects.create(name='Pie', price=Decimal('25.00'), category='food')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.staff)}'}
+
+    def create_order(self, status='pending', department='cafeteria'):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(
+                user=self.student, department=department, status=status, total_price=Decimal('25.00')
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, price_at_order=Decimal('25.00'))
+        return order
+
+    def feed(self, **params):
+        response = self.client.get('/api/orders/changes/', params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_requires_department_staff(self):
+        self.assertEqual(self.client.get('/api/orders/changes/').status_code, 401)
+        student_auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.student)}'}
+        self.assertEqual(self.client.get('/api/orders/changes/', **student_auth).status_code, 403)
+        response = self.client.get('/api/orders/changes/', {'since': 'yesterday'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_snapshot_then_deltas(self):
+        queued = self.create_order()
+        self.create_order(status='completed')
+        self.create_order(department='bookstore')
+        snapshot = self.feed()
+        self.assertEqual([order['id'] for order in snapshot['results']], [queued.id])
+        self.assertEqual(self.feed(since=snapshot['cursor'])['results'], [])
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.patch(f'/api/orders/orders/{queued.id}/', {'status': 'processing'})
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(user=None)
+        added = self.create_order()
+
+        changes = self.feed(since=snapshot['cursor'])
+        self.assertEqual([order['id'] for order in changes['results']], [queued.id, added.id])
+        self.assertEqual(changes['results'][0]['status'], 'processing')
+        self.assertEqual(changes['results'][0]['items'][0]['quantity'], 1)
+        self.assertEqual(self.feed(since=changes['cursor'])['results'], [])
+
+    def test_batches_large_backlogs(self):
+        cursor = self.feed()['cursor']
+        for _ in range(3):
+            self.create_order()
+        with patch('orders.feed.BATCH_SIZE', 2):
+            first = self.feed(since=cursor)
+            second = self.feed(since=first['cursor'])
+        self.assertEqual((len(first['results']), first['has_more']), (2, True))
+        self.assertEqual((len(second['results']), second['has_more']), (1, False))
+
+    def test_late_commit_is_not_skipped(self):
+        cursor = self.feed()['cursor']
+        first = self.create_order()
+        changes = self.feed(since=cursor)
+        self.assertEqual([order['id'] for order in changes['results']], [first.id])
+
+        # Saved before the order already sent, but committed after it
+        late = self.create_order()
+        Order.objects.filter(pk=late.pk).update(updated_at=first.updated_at - timedelta(seconds=2))
+        later = self.feed(since=changes['cursor'])
+        self.assertEqual([order['id'] for order in later['results']], [late.id])
+        self.assertEqual(self.feed(since=later['cursor'])['results'], [])
+
+    def test_wait_times_out_without_changes(self):
+        cursor = self.feed()['cursor']
+        page = self.feed(since=cursor, wait='0.2')
+        self.assertEqual((page['results'], page['has_more']), ([], False))
+        self.assertEqual(self.feed(since=page['cursor'])['results'], [])
+        for cursor in ['1_2', '1_2.3.4', '1.5']:
+            response = self.client.get('/api/orders/changes/', {'since': cursor}, **self.auth)
+            self.assertEqual(response.status_code, 400)
+
+    async def test_long_poll_wakes_on_new_order(self):
+        cursor = (await self.async_client.get('/api/orders/changes/', headers=self.bearer())).json()['cursor']
+        started = time.monotonic()
+        waiting = asyncio.create_task(
+            self.async_client.get('/api/orders/changes/', {'since': cursor, 'wait': 10}, headers=self.bearer())
+        )
+        await asyncio.sleep(0.3)
+        self.assertFalse(waiting.done())
+        order = await sync_to_async(self.create_order)()
+        response = await waiting
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([row['id'] for row in response.json()['results']], [order.id])
+
+    def test_deleted_orders_are_reported(self):
+        order_id = self.create_order().id
+        cursor = self.feed()['cursor']
+        self.client.force_authenticate(user=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/orders/orders/{order_id}/').status_code, 204)
+        self.client.force_authenticate(user=None)
+        changes = self.feed(since=cursor)
+        self.assertEqual((changes['results'], changes['deleted']), ([], [order_id]))
+        self.assertEqual(self.feed(since=changes['cursor'])['deleted'], [])
+
+    async def test_waiting_screens_share_one_version_poll(self):
+        cursor = (await self.async_client.get('/api/orders/changes/', headers=self.bearer())).json()['cursor']
+        reads = []
+
+        async def counting_version(department):
+            reads.append(department)
+            return 1
+
+        with patch('orders.feed.department_version', counting_version), patch('orders.feed.POLL_INTERVAL', 0.05):
+            screens = [
+                self.async_client.get('/api/orders/changes/', {'since': cursor, 'wait': 0.5}, headers=self.bearer())
+                for _ in range(10)
+            ]
+            responses = await asyncio.gather(*screens)
+        self.assertTrue(all(response.json()['results'] == [] for response in responses))
+        # About ten polls between them, where each screen polling alone would make a hundred
+        self.assertLess(len(reads), 30)
+
+    def bearer(self):
+        return {'Authorization': self.auth['HTTP_AUTHORIZATION']}
+
+
+class ProductMenuTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.client.force_authenticate(user=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pie = Product.objects.create(name='Pie', price=Decimal('25.00'), category='food')
+            Product.objects.create(name='Atlas', price=Decimal('300.00'), category='book')
+            Product.objects.create(name='Old stock', price=Decimal('5.00'), category='food', is_active=False)
+
+    def test_menu_by_category_is_cached(self):
+        response = self.client.get('/api/orders/products/menu/', {'category': 'food'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['name'] for product in response.json()], ['Pie'])
+        self.assertEqual(len(self.client.get('/api/orders/products/menu/').json()), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get('/api/orders/products/menu/', {'category': 'food'})
+        # Served from this worker's memory
+        self.assertEqual(ctx.captured_queries, [])
+        self.assertEqual(again.content, response.content)
+
+        with patch('orders.menu.LOCAL_TIMEOUT', 0), CaptureQueriesContext(connection) as ctx:
+            again = self.client.get('/api/orders/products/menu/', {'category': 'food'})
+        # After that, from the shared cache: nothing but reads of the database cache table
+        self.assertTrue(ctx.captured_queries)
+        self.assertFalse([query for query in ctx.captured_queries if 'django_cache' not in query['sql']])
+        self.assertEqual(again.content, response.content)
+        self.assertEqual(self.client.get('/api/orders/products/menu/', {'category': 'cake'}).status_code, 400)
+
+    def test_etag_revalidation_and_invalidation(self):
+        response = self.client.get('/api/orders/products/menu/')
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        not_modified = self.client.get('/api/orders/products/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pie.price = Decimal('27.50')
+            self.pie.save()
+        changed = self.client.get('/api/orders/products/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertIn('27.50', [product['price'] for product in changed.json()])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pie.delete()
+        self.assertEqual(len(self.client.get('/api/orders/products/menu/').json()), 1)
+
+    def test_workers_share_the_menu_and_its_version(self):
+        etag = self.client.get('/api/orders/products/menu/')['ETag']
+        # Another worker has its own cache client and memory but reads the same store
+        other_worker = caches.create_connection('default')
+        with patch('orders.menu.cache', other_worker), patch('orders.menu._local', {}):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(cached_menu()[1], etag)
+            self.assertFalse([query for query in ctx.captured_queries if 'django_cache' not in query['sql']])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pie.name = 'Meat pie'
+                self.pie.save()
+        # This worker serves what it holds until LOCAL_TIMEOUT has passed
+        self.assertEqual(self.client.get('/api/orders/products/menu/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with patch('orders.menu.LOCAL_TIMEOUT', 0):
+            changed = self.client.get('/api/orders/products/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('Meat pie', [product['name'] for product in changed.json()])
+        self.assertEqual(self.client.get('/api/orders/products/menu/', HTTP_IF_NONE_MATCH=changed['ETag']).status_code, 304)
+
+
+class PickupSlotTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+        self.staff = User.objects.create_user(
+            username='cafeteria1', password='pass', role='staff', staff_type='cafeteria'
+        )
+        self.product = Product.objects.create(name='Pie', price=Decimal('25.00'), category='food')
+        noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.day = noon.date()
+        self.early = PickupSlot.objects.create(
+            department='cafeteria', starts_at=noon, ends_at=noon + timedelta(minutes=15), capacity=2
+        )
+        self.late = PickupSlot.objects.create(
+            department='cafeteria', starts_at=noon + timedelta(minutes=15), ends_at=noon + timedelta(minutes=30), capacity=2
+        )
+
+    def checkout(self, slot, department='cafeteria'):
+        self.client.force_authenticate(user=self.student)
+        return self.client.post('/api/orders/orders/checkout/', {
+            'department': department,
+            'items': [{'product_id': self.product.id}],
+            'pickup_slot': slot.id,
+        }, format='json')
+
+    def test_checkout_reserves_until_full(self):
+        first = self.checkout(self.early)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.data['pickup_slot'], self.early.id)
+        self.assertEqual(self.checkout(self.early).status_code, 201)
+
+        response = self.checkout(self.early)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pickup_slot', response.data)
+        self.early.refresh_from_db()
+        self.assertEqual(self.early.reserved, 2)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(self.checkout(self.late, department='bookstore').status_code, 400)
+
+    def test_lost_race_rolls_back_the_order(self):
+        # Another checkout takes the last place between validation and reservation
+        with patch('orders.serializers.reserve_slot', return_value=False):
+            response = self.checkout(self.early)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_reserve_is_conditional(self):
+        self.assertTrue(reserve_slot(self.early.id))
+        self.assertTrue(reserve_slot(self.early.id))
+        self.assertFalse(reserve_slot(self.early.id))
+        self.early.refresh_from_db()
+        self.assertEqual(self.early.reserved, 2)
+
+    def test_cancelling_frees_the_place_once(self):
+        order_id = self.checkout(self.early).data['id']
+        self.client.force_authenticate(user=self.student)
+        for _ in range(2):
+            response = self.client.patch(f'/api/orders/orders/{order_id}/', {'status': 'cancelled'})
+            self.assertEqual(response.status_code, 200)
+        self.early.refresh_from_db()
+        self.assertEqual(self.early.reserved, 0)
+
+    def test_reopening_a_cancelled_order_retakes_its_place(self):
+        order_id = self.checkout(self.early).data['id']
+        self.client.patch(f'/api/orders/orders/{order_id}/', {'status': 'cancelled'})
+        response = self.client.patch(f'/api/orders/orders/{order_id}/', {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.early.refresh_from_db()
+        self.assertEqual(self.early.reserved, 1)
+
+        # Once others have filled the slot the order stays cancelled
+        self.client.patch(f'/api/orders/orders/{order_id}/', {'status': 'cancelled'})
+        self.checkout(self.early)
+        self.checkout(self.early)
+        response = self.client.patch(f'/api/orders/orders/{order_id}/', {'status': 'pending'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'cancelled')
+        self.early.refresh_from_db()
+        self.assertEqual(self.early.reserved, 2)
+
+    def test_prep_queue_is_ordered_by_slot(self):
+        late = self.checkout(self.late).data['id']
+        early = self.checkout(self.early).data['id']
+        done = self.checkout(self.early).data['id']
+        Order.objects.filter(id=done).update(status='completed')
+
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get('/api/orders/orders/prep-queue/').status_code, 403)
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get('/api/orders/orders/prep-queue/', {'date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['id'] for order in response.data], [early, late])
+        self.assertEqual(self.client.get('/api/orders/orders/prep-queue/').data, [])
+        self.assertEqual(self.client.get('/api/orders/orders/prep-queue/', {'date': '2026-13-40'}).status_code, 400)
+
+    def test_moving_a_slot_moves_its_orders(self):
+        order_id = self.checkout(self.early).data['id']
+        self.client.force_authenticate(user=self.staff)
+        next_day = self.early.starts_at + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/orders/pickup-slots/{self.early.id}/', {
+                'starts_at': next_day.isoformat(), 'ends_at': (next_day + timedelta(minutes=15)).isoformat(),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=order_id).pickup_at, next_day)
+        self.assertEqual(self.client.get('/api/orders/orders/prep-queue/', {'date': self.day.isoformat()}).data, [])
+        queue = self.client.get('/api/orders/orders/prep-queue/', {'date': next_day.date().isoformat()}).data
+        self.assertEqual([order['id'] for order in queue], [order_id])
+
+    def test_capacity_cut_checks_the_current_reservations(self):
+        stale = PickupSlot.objects.get(pk=self.early.pk)
+        self.checkout(self.early)
+        self.checkout(self.early)
+        serializer = PickupSlotSerializer(stale, data={'capacity': 1}, partial=True)
+        # Validated against the stale count, refused by the conditional update
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.early.refresh_from_db()
+        self.assertEqual((self.early.capacity, self.early.reserved), (2, 2))
+
+    def test_department_staff_manage_slots(self):
+        starts_at = timezone.now() + timedelta(days=2)
+        slot = {'starts_at': starts_at.isoformat(), 'ends_at': (starts_at + timedelta(minutes=15)).isoformat(), 'capacity': 10}
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.post('/api/orders/pickup-slots/', slot).status_code, 403)
+        response = self.client.get('/api/orders/pickup-slots/', {'paginate': 'false', 'department': 'cafeteria'})
+        self.assertEqual([row['remaining'] for row in response.data], [2, 2])
+        response = self.client.get('/api/orders/pickup-slots/', {'paginate': 'false', 'date': self.day.isoformat()})
+        self.assertEqual([row['id'] for row in response.data], [self.early.id, self.late.id])
+        for day in ['2026-13-40', 'tomorrow']:
+            self.assertEqual(self.client.get('/api/orders/pickup-slots/', {'date': day}).status_code, 400)
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post('/api/orders/pickup-slots/', slot)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['department'], 'cafeteria')
 
-# Create your tests here.
+        self.checkout(self.early)
+        self.checkout(self.early)
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.patch(f'/api/orders/pickup-slots/{self.early.id}/', {'capacity': 1})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/orders/pickup-slots/{self.early.id}/', {'capacity': 5})
+        self.assertEqual(response.data['remaining'], 3)
+        self.assertEqual(self.client.delete(f'/api/orders/pickup-slots/{self.early.id}/').status_code, 400)
+        self.assertEqual(self.client.delete(f'/api/orders/pickup-slots/{self.late.id}/').status_code, 204)
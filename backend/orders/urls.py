@@ -1,9 +1,14 @@
+from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, OrderViewSet, OrderItemViewSet
+from .views import ProductViewSet, OrderViewSet, OrderItemViewSet, PickupSlotViewSet, order_changes
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'order-items', OrderItemViewSet, basename='orderitem')
+router.register(r'pickup-slots', PickupSlotViewSet, basename='pickupslot')
 
-urlpatterns = router.urls 
\ No newline at end of file
+urlpatterns = [
+    path('', include(router.urls)),
+    path('changes/', order_changes, name='order-changes'),
+]
@@ -1,32 +1,211 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
-from rest_framework import viewsets, permissions
-from .models import Product, Order, OrderItem
-from .serializers import ProductSerializer, OrderSerializer, OrderItemSerializer
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django_filters.rest_framework import DjangoFilterBackend
+from .feed import MAX_WAIT, OPEN_STATUSES, bump_department, changed_orders, open_orders, parse_cursor, watching
+from .menu import cached_menu
+from .models import Product, Order, OrderItem, PickupSlot
+from .permissions import IsDepartmentStaff, IsDepartmentStaffOrReadOnly, is_department_staff
+from .pickup import day_bounds, release_slot, reserve_slot
+from .serializers import (
+    ProductSerializer, OrderSerializer, OrderItemSerializer, CheckoutSerializer, PickupSlotSerializer,
+)
 
 # Create your views here.
 
+def _requested_day(request):
+    """?date= as a date, today if it's missing, or None if it's malformed"""
+    value = request.query_params.get('date')
+    if not value:
+        return timezone.localdate()
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def menu(self, request):
+        """Active products, optionally of one ?category=, served from the menu cache"""
+        category = request.query_params.get('category') or None
+        if category and category not in dict(Product.CATEGORY_CHOICES):
+            return Response({'error': f'Unknown category: {category}'}, status=status.HTTP_400_BAD_REQUEST)
+        content, etag = cached_menu(category)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return HttpResponse(content, content_type='application/json', headers=headers)
+
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'status': ['exact', 'in'],
+        'created_at': ['date', 'gte', 'lt'],
+    }
+    ordering = ['-created_at']
 
     def get_queryset(self):
         user = self.request.user
         # Staff with department (staff_type) see their department's orders
         if user.role == 'staff' and user.staff_type:
-            return Order.objects.filter(department=user.staff_type)
+            orders = Order.objects.filter(department=user.staff_type)
         # Students/staff see their own orders
-        return Order.objects.filter(user=user)
+        else:
+            orders = Order.objects.filter(user=user)
+        # The serializer nests the user, items and their products
+        return orders.select_related('user').prefetch_related('items__product')
+
+    def create(self, request, *args, **kwargs):
+        """Orders are only placed as a cart, priced server-side, as by checkout/"""
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save(user=request.user)
+        order = Order.objects.select_related('user').prefetch_related('items__product').get(pk=order.pk)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the order so two cancellations can't both free its place
+            previous = Order.objects.select_for_update().values_list('status', flat=True).get(pk=serializer.instance.pk)
+            order = serializer.save()
+            if order.pickup_slot_id and previous != 'cancelled' and order.status == 'cancelled':
+                release_slot(order.pickup_slot_id)
+            elif order.pickup_slot_id and previous == 'cancelled' and order.status != 'cancelled':
+                # A revived order needs its place back; rolls back the save if the slot filled up
+                if not reserve_slot(order.pickup_slot_id):
+                    raise ValidationError({'error': 'This pickup slot is full.'})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            if instance.pickup_slot_id and instance.status != 'cancelled':
+                release_slot(instance.pickup_slot_id)
+            instance.delete()
+
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Place a whole cart as one order; prices and the total are set server-side"""
+        return self.create(request)
+
+    @action(detail=False, methods=['get'], url_path='prep-queue', permission_classes=[IsDepartmentStaff])
+    def prep_queue(self, request):
+        """Open orders of the staff member's department for ?date= (default today), by pickup time"""
+        day = _requested_day(request)
+        if day is None:
+            return Response({'error': 'date must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = day_bounds(day)
+        orders = (
+            Order.objects.filter(
+                department=request.user.staff_type, pickup_at__gte=start, pickup_at__lt=end, status__in=OPEN_STATUSES,
+            )
+            .select_related('user').prefetch_related('items__product')
+            .order_by('pickup_at', 'id')
+        )
+        return Response(OrderSerializer(orders, many=True).data)
+
+class PickupSlotViewSet(viewsets.ModelViewSet):
+    serializer_class = PickupSlotSerializer
+    permission_classes = [permissions.IsAuthenticated, IsDepartmentStaffOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['department']
+    ordering = ['starts_at']
+
+    def get_queryset(self):
+        slots = PickupSlot.objects.all()
+        if self.request.query_params.get('date'):
+            day = _requested_day(self.request)
+            if day is None:
+                raise ValidationError({'error': 'date must be YYYY-MM-DD.'})
+            start, end = day_bounds(day)
+            return slots.filter(starts_at__gte=start, starts_at__lt=end)
+        # Upcoming slots by default
+        return slots.filter(ends_at__gt=timezone.now())
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(department=self.request.user.staff_type)
+
+    def perform_update(self, serializer):
+        slot = serializer.save()
+        if 'starts_at' in serializer.validated_data:
+            # The slot's orders were moved with a bulk update, which sends no signals
+            transaction.on_commit(lambda: bump_department(slot.department))
+
+    def destroy(self, request, *args, **kwargs):
+        slot = self.get_object()
+        if slot.orders.exclude(status='cancelled').exists():
+            return Response({'error': 'This pickup slot has orders booked in it.'}, status=status.HTTP_400_BAD_REQUEST)
+        return super().destroy(request, *args, **kwargs)
 
 class OrderItemViewSet(viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+
+def _authenticate(request):
+    """The user behind a plain Django request, using the API's authentication classes."""
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    user = Request(request, authenticators=authenticators).user
+    if not user.is_authenticated:
+        raise NotAuthenticated()
+    return user
+
+@require_GET
+async def order_changes(request):
+    """
+    Change feed for a department's order queue. Without ?since= it returns
+    the open orders and a cursor; with it, the orders created or updated
+    after that cursor, with the ids of deleted orders under ``deleted``.
+    ?wait=<seconds> holds the request open until something changes, so
+    under ASGI an idle kitchen screen costs a coroutine rather than a
+    worker, and the screens of a department share one version poll per
+    process. Under WSGI each waiting screen holds a whole worker and polls
+    on its own, so serve the project with an ASGI server (see README).
+    """
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except APIException as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+    if not is_department_staff(user):
+        return JsonResponse({'error': 'Only department staff can follow the order feed.'}, status=403)
+
+    department = user.staff_type
+    since = request.GET.get('since')
+    try:
+        wait = min(MAX_WAIT, max(0.0, float(request.GET.get('wait', 0))))
+        if since:
+            parse_cursor(since)
+    except ValueError:
+        return JsonResponse({'error': 'since must be a cursor from this feed and wait a number of seconds.'}, status=400)
+    if not since:
+        return JsonResponse(await sync_to_async(open_orders)(department))
+
+    deadline = time.monotonic() + wait
+    async with watching(department) as watch:
+        while True:
+            # Take the version before querying, so a change committed after
+            # the query is still waited for below
+            version = await watch.current()
+            page = await sync_to_async(changed_orders)(department, since)
+            if page['results'] or page['deleted'] or time.monotonic() >= deadline:
+                return JsonResponse(page)
+            await watch.wait(version, deadline - time.monotonic())
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supportrequest',
+            index=models.Index(fields=['status', 'created_at'], name='support_status_created_idx'),
+        ),
+    ]
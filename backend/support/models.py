@@ -26,5 +26,10 @@ class SupportRequest(models.Model):
     assigned_to = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_support_requests')
     resolution_notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='support_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.category} - {self.location} ({self.status})"
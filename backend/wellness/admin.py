@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import FlagTerm
 
 # Register your models here.
+
+@admin.register(FlagTerm)
+class FlagTermAdmin(admin.ModelAdmin):
+    list_display = ['term', 'severity', 'is_active', 'updated_at']
+    list_filter = ['is_active', 'severity']
+    list_editable = ['severity', 'is_active']
+    search_fields = ['term']
@@ -0,0 +1,80 @@
+import re
+import threading
+
+from django.db.models import Count, Max
+
+from .models import FlagTerm
+
+FLAGGED_MOODS = ['sad', 'very_sad']
+
+
+class KeywordMatcher:
+    """
+    Matches a lexicon of words and phrases against text in a single pass,
+    using one compiled alternation anchored on word boundaries (so "help"
+    does not match "helpful"). Longer terms are tried first so phrases win
+    over the words they contain.
+    """
+    def __init__(self, terms):
+        self.severities = {' '.join(term.lower().split()): severity for term, severity in terms}
+        self.pattern = None
+        if self.severities:
+            alternatives = [
+                r'\s+'.join(re.escape(word) for word in term.split())
+                for term in sorted(self.severities, key=len, reverse=True)
+            ]
+            self.pattern = re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b', re.IGNORECASE)
+
+    def find(self, text):
+        """Return the set of lexicon terms found in ``text``."""
+        if not self.pattern or not text:
+            return set()
+        return {' '.join(match.group().lower().split()) for match in self.pattern.finditer(text)}
+
+    def score(self, text):
+        return sum(self.severities[term] for term in self.find(text))
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def lexicon_version():
+    """
+    Fingerprint of the active lexicon: adding, editing, deactivating or
+    deleting a term changes the count of active terms or their latest
+    ``updated_at``. Read from the database, so a change made by any worker
+    is seen by all of them.
+    """
+    version = FlagTerm.objects.filter(is_active=True).aggregate(count=Count('id'), latest=Max('updated_at'))
+    return version['count'], version['latest']
+
+
+def get_matcher():
+    """The matcher for the active FlagTerm lexicon, rebuilt when its version changes."""
+    global _matcher
+    version = lexicon_version()
+    cached = _matcher
+    if cached is None or cached[0] != version:
+        with _matcher_lock:
+            if _matcher is None or _matcher[0] != version:
+                _matcher = (version, KeywordMatcher(
+                    FlagTerm.objects.filter(is_active=True).values_list('term', 'severity')
+                ))
+            cached = _matcher
+    return cached[1]
+
+
+def invalidate_matcher():
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
+
+
+def score_checkin(mood, notes, matcher=None):
+    """
+    Return ``(flagged, flag_score)`` for a check-in. Low moods are always
+    flagged; otherwise any lexicon match flags it.
+    """
+    flag_score = (matcher or get_matcher()).score(notes)
+    return mood in FLAGGED_MOODS or flag_score > 0, flag_score
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from wellness.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Backfill or repair the wellness daily rollup table from raw check-ins'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD). Defaults to the earliest check-in.')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD). Defaults to the latest check-in.')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ['start', 'end']:
+            value = options[name]
+            dates[name] = parse_date(value) if value else None
+            if value and dates[name] is None:
+                raise CommandError(f'--{name} must be a date in YYYY-MM-DD format.')
+
+        self.stdout.write('Rebuilding wellness daily rollup...')
+        written = rebuild_rollup(dates['start'], dates['end'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup rows.'))
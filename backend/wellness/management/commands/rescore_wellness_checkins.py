@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from wellness.flagging import get_matcher, invalidate_matcher, score_checkin
+from wellness.models import WellnessCheckin
+from wellness.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Re-score historical wellness check-ins against the current flag term lexicon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Check-ins loaded and updated per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        invalidate_matcher()
+        matcher = get_matcher()
+
+        scanned = changed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                WellnessCheckin.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'mood', 'notes', 'flagged', 'flag_score')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+
+            updated = []
+            for checkin in batch:
+                flagged, flag_score = score_checkin(checkin.mood, checkin.notes, matcher)
+                if (flagged, flag_score) != (checkin.flagged, checkin.flag_score):
+                    checkin.flagged = flagged
+                    checkin.flag_score = flag_score
+                    updated.append(checkin)
+            if updated:
+                with transaction.atomic():
+                    WellnessCheckin.objects.bulk_update(updated, ['flagged', 'flag_score'])
+                changed += len(updated)
+
+        if changed:
+            # Flagged totals in the daily rollup are now stale
+            rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Re-scored {scanned} check-ins, {changed} changed.'))
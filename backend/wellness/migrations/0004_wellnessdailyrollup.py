@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0003_counsellingsession_approved_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WellnessDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('mood', models.CharField(choices=[('very_happy', '😄 Very Happy'), ('happy', '🙂 Happy'), ('neutral', '😐 Neutral'), ('sad', '🙁 Sad'), ('very_sad', '😢 Very Sad')], max_length=20)),
+                ('department', models.CharField(blank=True, max_length=100)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('flagged_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date', 'mood'],
+                'unique_together': {('date', 'mood', 'department')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+# The keywords previously hard-coded in WellnessCheckinViewSet.perform_create
+DEFAULT_FLAG_TERMS = [
+    ('suicidal', 5),
+    ('depressed', 3),
+    ('overwhelmed', 2),
+    ('anxious', 2),
+    ('help', 1),
+]
+
+
+def seed_flag_terms(apps, schema_editor):
+    FlagTerm = apps.get_model('wellness', 'FlagTerm')
+    FlagTerm.objects.bulk_create(
+        [FlagTerm(term=term, severity=severity) for term, severity in DEFAULT_FLAG_TERMS]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0004_wellnessdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlagTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, unique=True)),
+                ('severity', models.PositiveSmallIntegerField(default=1, help_text="Added to the check-in's flag score when matched")),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-severity', 'term'],
+            },
+        ),
+        migrations.AddField(
+            model_name='wellnesscheckin',
+            name='flag_score',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of severities of flag terms found in the notes'),
+        ),
+        migrations.RunPython(seed_flag_terms, migrations.RunPython.noop),
+    ]
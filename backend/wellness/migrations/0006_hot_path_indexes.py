@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0005_flagterm_wellnesscheckin_flag_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='counsellingsession',
+            index=models.Index(fields=['student', 'created_at'], name='session_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wellnesscheckin',
+            index=models.Index(fields=['user', 'created_at'], name='checkin_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wellnesscheckin',
+            index=models.Index(fields=['flagged', 'created_at'], name='checkin_flagged_created_idx'),
+        ),
+    ]
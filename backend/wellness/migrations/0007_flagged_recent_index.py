@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0006_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wellnesscheckin',
+            index=models.Index(condition=models.Q(('flagged', True)), fields=['-created_at'], name='checkin_flagged_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0007_flagged_recent_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wellnesscheckin',
+            index=models.Index(fields=['flagged', '-created_at'], name='checkin_flagged_newest_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='wellnesscheckin',
+            name='checkin_flagged_created_idx',
+        ),
+    ]
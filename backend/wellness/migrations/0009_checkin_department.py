@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_user_departments(apps, schema_editor):
+    # Existing check-ins are counted under the user's current department,
+    # as the rollup has counted them so far
+    WellnessCheckin = apps.get_model('wellness', 'WellnessCheckin')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    department = User.objects.filter(pk=OuterRef('user_id')).values('department')[:1]
+    WellnessCheckin.objects.update(department=Coalesce(Subquery(department), Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0008_flagged_newest_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wellnesscheckin',
+            name='department',
+            field=models.CharField(blank=True, editable=False, help_text="The user's department at check-in; the daily rollup counts the check-in under it", max_length=100),
+        ),
+        migrations.RunPython(copy_user_departments, migrations.RunPython.noop),
+    ]
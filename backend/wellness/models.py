@@ -16,14 +16,45 @@ class WellnessCheckin(models.Model):
     mood = models.CharField(max_length=20, choices=MOOD_CHOICES)
     notes = models.TextField(blank=True)
     flagged = models.BooleanField(default=False)
+    flag_score = models.PositiveIntegerField(default=0, help_text="Sum of severities of flag terms found in the notes")
     requested_counselling = models.BooleanField(default=False)
     staff_response = models.TextField(blank=True)
+    department = models.CharField(
+        max_length=100, blank=True, editable=False,
+        help_text="The user's department at check-in; the daily rollup counts the check-in under it",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='checkin_user_created_idx'),
+            # The counsellors' flagged queue, newest first. The composite
+            # index serves it everywhere; MySQL skips partial indexes, so the
+            # smaller partial one is an extra for SQLite and PostgreSQL
+            models.Index(fields=['flagged', '-created_at'], name='checkin_flagged_newest_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(flagged=True), name='checkin_flagged_recent_idx'),
+        ]
 
     def __str__(self):
         mood_display = dict(self.MOOD_CHOICES).get(self.mood, self.mood)
         date_str = self.created_at.strftime('%Y-%m-%d') if self.created_at else "unsaved"
         return f"{self.user} - {mood_display} on {date_str}"
 
+class FlagTerm(models.Model):
+    """
+    A word or phrase that flags a check-in for counsellor follow-up when it
+    appears in the notes. Matching is case-insensitive on whole words.
+    """
+    term = models.CharField(max_length=100, unique=True)
+    severity = models.PositiveSmallIntegerField(default=1, help_text="Added to the check-in's flag score when matched")
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-severity', 'term']
+
+    def __str__(self):
+        return f"{self.term} ({self.severity})"
+
 class CounsellingSession(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -44,5 +75,30 @@ class CounsellingSession(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="created_sessions")
     approved_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="approved_sessions")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'created_at'], name='session_student_created_idx'),
+        ]
+
     def __str__(self):
         return f"Session for {self.student} with {self.staff} ({self.status})"
+
+class WellnessDailyRollup(models.Model):
+    """
+    Per-day check-in totals by mood and department, kept up to date as
+    check-ins are created, edited and deleted, so long trend windows don't
+    rescan WellnessCheckin.
+    Rebuild a range with ``manage.py rebuild_wellness_rollup``.
+    """
+    date = models.DateField()
+    mood = models.CharField(max_length=20, choices=WellnessCheckin.MOOD_CHOICES)
+    department = models.CharField(max_length=100, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    flagged_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['date', 'mood', 'department']
+        ordering = ['date', 'mood']
+
+    def __str__(self):
+        return f"{self.date} {self.mood} ({self.department or 'all'}): {self.total}"
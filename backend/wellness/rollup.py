@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import WellnessCheckin, WellnessDailyRollup
+
+
+def rollup_entry(created_at, mood, flagged, department):
+    """The rollup row a check-in is counted in, and whether it adds to the flagged count."""
+    key = {
+        'date': timezone.localdate(created_at),
+        'mood': mood,
+        'department': department or '',
+    }
+    return key, bool(flagged)
+
+
+def checkin_entry(checkin):
+    return rollup_entry(checkin.created_at, checkin.mood, checkin.flagged, checkin.department)
+
+
+def add_entry(entry):
+    key, flagged = entry
+    WellnessDailyRollup.objects.get_or_create(**key)
+    WellnessDailyRollup.objects.filter(**key).update(
+        total=F('total') + 1,
+        flagged_count=F('flagged_count') + int(flagged),
+    )
+
+
+def remove_entry(entry):
+    key, flagged = entry
+    # Counts never go below zero; a row that was never counted is left for
+    # rebuild_rollup() to repair
+    WellnessDailyRollup.objects.filter(**key, total__gt=0, flagged_count__gte=int(flagged)).update(
+        total=F('total') - 1,
+        flagged_count=F('flagged_count') - int(flagged),
+    )
+
+
+def record_checkin(checkin):
+    """Add a newly created check-in to its day's rollup row."""
+    add_entry(checkin_entry(checkin))
+
+
+def move_checkin(previous, checkin):
+    """Move an edited check-in from the rollup entry it was counted in to its new one."""
+    current = checkin_entry(checkin)
+    if previous != current:
+        with transaction.atomic():
+            remove_entry(previous)
+            add_entry(current)
+
+
+def rebuild_rollup(start_date=None, end_date=None):
+    """
+    Recompute rollup rows for the inclusive date range from the raw check-ins
+    and replace whatever is stored. Returns the number of rows written.
+    """
+    checkins = WellnessCheckin.objects.annotate(day=TruncDate('created_at'))
+    rollups = WellnessDailyRollup.objects.all()
+    if start_date is not None:
+        checkins = checkins.filter(day__gte=start_date)
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date is not None:
+        checkins = checkins.filter(day__lte=end_date)
+        rollups = rollups.filter(date__lte=end_date)
+
+    rows = (
+        checkins.order_by()
+        .values('day', 'mood', 'department')
+        .annotate(total=Count('id'), flagged_count=Count('id', filter=Q(flagged=True)))
+    )
+    merged = {}
+    for row in rows:
+        key = (row['day'], row['mood'], row['department'])
+        rollup = merged.setdefault(key, WellnessDailyRollup(date=key[0], mood=key[1], department=key[2]))
+        rollup.total += row['total']
+        rollup.flagged_count += row['flagged_count']
+
+    with transaction.atomic():
+        rollups.delete()
+        WellnessDailyRollup.objects.bulk_create(merged.values(), batch_size=1000)
+    return len(merged)
@@ -6,9 +6,9 @@ class WellnessCheckinSerializer(serializers.ModelSerializer):
     class Meta:
         model = WellnessCheckin
         fields = [
-            'id', 'user', 'created_at', 'mood', 'mood_display', 'notes', 'flagged', 'requested_counselling', 'staff_response'
+            'id', 'user', 'created_at', 'mood', 'mood_display', 'notes', 'flagged', 'flag_score', 'requested_counselling', 'staff_response'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'flagged', 'staff_response']
+        read_only_fields = ['id', 'user', 'created_at', 'flagged', 'flag_score', 'staff_response']
 
 class CounsellingSessionSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
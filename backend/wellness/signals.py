@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import WellnessCheckin
+from .rollup import checkin_entry, move_checkin, record_checkin, remove_entry, rollup_entry
+
+
+@receiver(pre_save, sender=WellnessCheckin)
+def remember_rollup_entry(sender, instance, raw=False, **kwargs):
+    # A check-in stays counted under the department its user had when it
+    # was made, whatever department they move to later
+    if instance._state.adding and not raw and not instance.department:
+        instance.department = instance.user.department or ''
+    # An edit is counted by subtracting what the stored row contributed
+    instance._rollup_entry = None
+    if instance.pk and not raw:
+        stored = (
+            WellnessCheckin.objects.filter(pk=instance.pk)
+            .values_list('created_at', 'mood', 'flagged', 'department')
+            .first()
+        )
+        if stored:
+            instance._rollup_entry = rollup_entry(*stored)
+
+
+@receiver(post_save, sender=WellnessCheckin)
+def update_daily_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_entry', None)
+    if created or previous is None:
+        record_checkin(instance)
+    else:
+        move_checkin(previous, instance)
+
+
+@receiver(post_delete, sender=WellnessCheckin)
+def remove_from_daily_rollup(sender, instance, **kwargs):
+    remove_entry(checkin_entry(instance))
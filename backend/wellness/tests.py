@@ -1,3 +1,244 @@
+import random
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .flagging import KeywordMatcher, score_checkin
+from .models import FlagTerm, WellnessCheckin, WellnessDailyRollup
+from .rollup import rebuild_rollup
+from .trends import summarize_campus, summarize_checkins
+
+User = get_user_model()
+
+MOODS = [mood for mood, _ in WellnessCheckin.MOOD_CHOICES]
+
+
+def reference_summary(checkins, start_date, end_date, bucket=None):
+    """The original per-row Python loop, extended with the window and buckets."""
+    def empty():
+        return {'mood_counts': {}, 'flagged_count': 0, 'total': 0}
+
+    def add(summary, checkin):
+        summary['mood_counts'][checkin.mood] = summary['mood_counts'].get(checkin.mood, 0) + 1
+        summary['flagged_count'] += checkin.flagged
+        summary['total'] += 1
+
+    summary, periods = empty(), {}
+    for checkin in checkins:
+        day = timezone.localtime(checkin.created_at).date()
+        if not start_date <= day <= end_date:
+            continue
+        add(summary, checkin)
+        if bucket:
+            period = day if bucket == 'day' else day - timedelta(days=day.weekday())
+            add(periods.setdefault(period, empty()), checkin)
+    if bucket:
+        summary['bucket'] = bucket
+        summary['buckets'] = [{'period': period.isoformat(), **periods[period]} for period in sorted(periods)]
+    return summary
+
+
+class WellnessTrendTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.student = User.objects.create_user(username='student0', password='pass', role='student')
+
+    def checkin(self, created_at, mood='happy', flagged=False, user=None):
+        checkin = WellnessCheckin.objects.create(user=user or self.student, mood=mood, flagged=flagged)
+        WellnessCheckin.objects.filter(pk=checkin.pk).update(created_at=created_at)
+
+    def test_matches_the_python_loop(self):
+        rng = random.Random(5)
+        first = datetime(2026, 2, 1, tzinfo=dt_timezone.utc)
+        for _ in range(300):
+            mood = rng.choice(MOODS)
+            self.checkin(first + timedelta(minutes=rng.randrange(45 * 24 * 60)), mood, rng.random() < 0.2)
+        checkins = list(WellnessCheckin.objects.all())
+
+        windows = [
+            (date(2026, 2, 1), date(2026, 2, 1)),
+            (date(2026, 2, 4), date(2026, 2, 17)),
+            (date(2026, 1, 1), date(2026, 4, 30)),
+        ]
+        for start, end in windows:
+            for bucket in [None, 'day', 'week']:
+                with self.subTest(start=start, end=end, bucket=bucket):
+                    self.assertEqual(
+                        summarize_checkins(WellnessCheckin.objects.all(), start, end, bucket),
+                        reference_summary(checkins, start, end, bucket),
+                    )
+
+    def test_window_and_bucket_boundaries(self):
+        # 2026-03-01 is a Sunday, so its last second is in the previous week
+        self.checkin(datetime(2026, 3, 1, 23, 59, 59, tzinfo=dt_timezone.utc), 'sad', flagged=True)
+        self.checkin(datetime(2026, 3, 2, 0, 0, tzinfo=dt_timezone.utc))
+        self.checkin(datetime(2026, 3, 2, 12, 0, tzinfo=dt_timezone.utc))
+        self.checkin(datetime(2026, 3, 4, 9, 30, tzinfo=dt_timezone.utc), 'neutral')
+        # Midnight after the end date is outside the window
+        self.checkin(datetime(2026, 3, 8, 0, 0, tzinfo=dt_timezone.utc), 'very_sad', flagged=True)
+
+        weekly = summarize_checkins(WellnessCheckin.objects.all(), date(2026, 3, 1), date(2026, 3, 7), 'week')
+        self.assertEqual(weekly, {
+            'mood_counts': {'sad': 1, 'happy': 2, 'neutral': 1},
+            'flagged_count': 1,
+            'total': 4,
+            'bucket': 'week',
+            'buckets': [
+                {'period': '2026-02-23', 'mood_counts': {'sad': 1}, 'flagged_count': 1, 'total': 1},
+                {'period': '2026-03-02', 'mood_counts': {'happy': 2, 'neutral': 1}, 'flagged_count': 0, 'total': 3},
+            ],
+        })
+
+        daily = summarize_checkins(WellnessCheckin.objects.all(), date(2026, 3, 1), date(2026, 3, 7), 'day')
+        # Days without check-ins have no bucket
+        self.assertEqual([row['period'] for row in daily['buckets']], ['2026-03-01', '2026-03-02', '2026-03-04'])
+        self.assertEqual([row['total'] for row in daily['buckets']], [1, 2, 1])
+
+    def test_empty_window(self):
+        self.checkin(datetime(2026, 3, 2, tzinfo=dt_timezone.utc))
+        summary = summarize_checkins(WellnessCheckin.objects.all(), date(2026, 1, 1), date(2026, 1, 31), 'day')
+        self.assertEqual(summary, {'mood_counts': {}, 'flagged_count': 0, 'total': 0, 'bucket': 'day', 'buckets': []})
+
+    def test_my_trends_counts_only_the_student(self):
+        other = User.objects.create_user(username='student1', password='pass', role='student')
+        self.checkin(datetime(2026, 3, 2, tzinfo=dt_timezone.utc), 'sad', flagged=True)
+        self.checkin(datetime(2026, 3, 3, tzinfo=dt_timezone.utc), 'sad', flagged=True, user=other)
+        self.client.force_authenticate(user=self.student)
+
+        response = self.client.get('/api/wellness/checkins/my_trends/', {'start': '2026-03-01', 'end': '2026-03-07'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'mood_counts': {'sad': 1}, 'flagged_count': 1, 'total': 1})
+        for params in [{'bucket': 'month'}, {'days': 0}, {'start': '2026-03-07', 'end': '2026-03-01'}]:
+            self.assertEqual(self.client.get('/api/wellness/checkins/my_trends/', params).status_code, 400)
+
+
+class WellnessRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='pass', role='student', department=department)
+            for i, department in enumerate(['Science', 'Arts', ''])
+        ]
+
+    def checkin_at(self, created_at, user, mood, notes=''):
+        with patch('django.utils.timezone.now', return_value=created_at):
+            return WellnessCheckin.objects.create(
+                user=user, mood=mood, notes=notes, flagged=mood in ['sad', 'very_sad'],
+            )
+
+    def rollup_rows(self):
+        return sorted(
+            WellnessDailyRollup.objects.filter(total__gt=0)
+            .values_list('date', 'mood', 'department', 'total', 'flagged_count')
+        )
+
+    def test_edit_moves_the_count(self):
+        checkin = self.checkin_at(datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc), self.students[0], 'sad')
+        self.assertEqual(self.rollup_rows(), [(date(2026, 3, 2), 'sad', 'Science', 1, 1)])
+
+        self.client.force_authenticate(user=self.students[0])
+        response = self.client.patch(f'/api/wellness/checkins/{checkin.id}/', {'mood': 'happy'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['flagged'])
+        self.assertEqual(self.rollup_rows(), [(date(2026, 3, 2), 'happy', 'Science', 1, 0)])
+
+        # Saving without a change to mood or flag leaves the rollup alone
+        self.client.patch(f'/api/wellness/checkins/{checkin.id}/', {'requested_counselling': True})
+        self.assertEqual(self.rollup_rows(), [(date(2026, 3, 2), 'happy', 'Science', 1, 0)])
+
+    def test_delete_removes_the_count(self):
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        kept = self.checkin_at(day, self.students[0], 'very_sad')
+        removed = self.checkin_at(day, self.students[0], 'very_sad')
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.delete(f'/api/wellness/checkins/{removed.id}/').status_code, 204)
+        self.assertEqual(self.rollup_rows(), [(date(2026, 3, 2), 'very_sad', 'Science', 1, 1)])
+        kept.delete()
+        self.assertEqual(self.rollup_rows(), [])
+
+    def test_moving_department_leaves_old_counts_in_place(self):
+        student = self.students[0]
+        old = self.checkin_at(datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc), student, 'sad')
+        student.department = 'Arts'
+        student.save()
+        self.client.force_authenticate(user=student)
+        self.client.patch(f'/api/wellness/checkins/{old.id}/', {'mood': 'happy'})
+        self.checkin_at(datetime(2026, 3, 2, 10, tzinfo=dt_timezone.utc), student, 'sad')
+        expected = [(date(2026, 3, 2), 'happy', 'Science', 1, 0), (date(2026, 3, 2), 'sad', 'Arts', 1, 1)]
+        self.assertEqual(self.rollup_rows(), expected)
+
+        self.assertEqual(self.client.delete(f'/api/wellness/checkins/{old.id}/').status_code, 204)
+        self.assertEqual(self.rollup_rows(), [(date(2026, 3, 2), 'sad', 'Arts', 1, 1)])
+        rebuild_rollup()
+        self.assertEqual(self.rollup_rows(), [(date(2026, 3, 2), 'sad', 'Arts', 1, 1)])
+
+    def test_incremental_rollup_matches_rebuild(self):
+        rng = random.Random(6)
+        first = datetime(2026, 2, 1, tzinfo=dt_timezone.utc)
+        checkins = [
+            self.checkin_at(
+                first + timedelta(minutes=rng.randrange(20 * 24 * 60)), rng.choice(self.students), rng.choice(MOODS),
+            )
+            for _ in range(120)
+        ]
+        for checkin in rng.sample(checkins, 40):
+            self.client.force_authenticate(user=checkin.user)
+            response = self.client.patch(f'/api/wellness/checkins/{checkin.id}/', {'mood': rng.choice(MOODS)})
+            self.assertEqual(response.status_code, 200)
+        WellnessCheckin.objects.filter(id__in=[checkin.id for checkin in rng.sample(checkins, 20)]).delete()
+
+        incremental = self.rollup_rows()
+        rebuild_rollup()
+        self.assertEqual(incremental, self.rollup_rows())
+
+        window = (date(2026, 2, 1), date(2026, 2, 28))
+        with patch('wellness.trends.timezone.localdate', return_value=date(2026, 3, 15)):
+            campus = summarize_campus(*window, bucket='day')
+        self.assertEqual(campus, summarize_checkins(WellnessCheckin.objects.all(), *window, bucket='day'))
+
+
+class FlagLexiconTests(TestCase):
+    def test_matches_whole_words_in_any_case(self):
+        matcher = KeywordMatcher([('help', 1), ('hopeless', 3)])
+        self.assertEqual(matcher.find('I need HELP!'), {'help'})
+        self.assertEqual(matcher.find('That was helpful'), set())
+        self.assertEqual(matcher.find('Feeling Hopeless, need help'), {'help', 'hopeless'})
+        self.assertEqual(matcher.score('hopeless, so hopeless'), 3)
+
+    def test_phrases_match_across_whitespace_and_win_over_their_words(self):
+        matcher = KeywordMatcher([('alone', 1), ('all  Alone', 2), ('give up', 3)])
+        self.assertEqual(matcher.find('I am all\nalone'), {'all alone'})
+        self.assertEqual(matcher.find('Alone again'), {'alone'})
+        self.assertEqual(matcher.find("I won't GIVE   UP"), {'give up'})
+        self.assertEqual(matcher.find('give upward'), set())
+
+    def test_lexicon_changes_reach_the_cached_matcher(self):
+        term = FlagTerm.objects.create(term='worthless', severity=2)
+        self.assertEqual(score_checkin('happy', 'I feel worthless'), (True, 2))
+
+        # Changes made without signals (bulk updates, other processes) are
+        # still picked up from the lexicon version
+        FlagTerm.objects.filter(pk=term.pk).update(is_active=False)
+        self.assertEqual(score_checkin('happy', 'I feel worthless'), (False, 0))
+        FlagTerm.objects.bulk_create([FlagTerm(term='exhausted', severity=1)])
+        self.assertEqual(score_checkin('neutral', 'Exhausted'), (True, 1))
+        self.assertEqual(score_checkin('sad', ''), (True, 0))
+
+    def test_rescore_updates_flags_and_rollup(self):
+        student = User.objects.create_user(username='student0', password='pass', role='student', department='Arts')
+        with patch('django.utils.timezone.now', return_value=datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)):
+            WellnessCheckin.objects.create(user=student, mood='happy', notes='so tired of everything')
+            WellnessCheckin.objects.create(user=student, mood='happy', notes='fine')
+        FlagTerm.objects.create(term='tired of everything', severity=4)
 
-# Create your tests here.
+        call_command('rescore_wellness_checkins', stdout=StringIO())
+        flags = sorted(WellnessCheckin.objects.values_list('notes', 'flagged', 'flag_score'))
+        self.assertEqual(flags, [('fine', False, 0), ('so tired of everything', True, 4)])
+        rollup = WellnessDailyRollup.objects.get(date=date(2026, 3, 2), mood='happy', department='Arts')
+        self.assertEqual((rollup.total, rollup.flagged_count), (2, 1))
@@ -0,0 +1,152 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import WellnessCheckin, WellnessDailyRollup
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 730
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+}
+
+
+class TrendParamsError(ValueError):
+    pass
+
+
+def parse_trend_params(query_params):
+    """
+    Read the reporting window and bucket size from the query string.
+
+    Supports ``?days=N`` (the last N days including today, default 30) or an
+    explicit ``?start=YYYY-MM-DD`` and optional ``&end=YYYY-MM-DD``, plus
+    ``?bucket=day|week``. Returns ``(start_date, end_date, bucket)`` with both
+    dates inclusive.
+    """
+    bucket = query_params.get('bucket') or None
+    if bucket is not None and bucket not in BUCKETS:
+        raise TrendParamsError("bucket must be 'day' or 'week'.")
+
+    today = timezone.localdate()
+    start = query_params.get('start')
+    if start:
+        start_date = parse_date(start)
+        end = query_params.get('end')
+        end_date = parse_date(end) if end else today
+        if start_date is None or end_date is None:
+            raise TrendParamsError('start and end must be dates in YYYY-MM-DD format.')
+        if end_date < start_date:
+            raise TrendParamsError('end must not be before start.')
+        if (end_date - start_date).days >= MAX_WINDOW_DAYS:
+            raise TrendParamsError(f'The window cannot exceed {MAX_WINDOW_DAYS} days.')
+        return start_date, end_date, bucket
+
+    try:
+        days = int(query_params.get('days', DEFAULT_WINDOW_DAYS))
+    except (TypeError, ValueError):
+        raise TrendParamsError('days must be an integer.')
+    if not 1 <= days <= MAX_WINDOW_DAYS:
+        raise TrendParamsError(f'days must be between 1 and {MAX_WINDOW_DAYS}.')
+    return today - timedelta(days=days - 1), today, bucket
+
+
+def _day_bounds(start_date, end_date):
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    until = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return since, until
+
+
+def _live_rows(checkins, start_date, end_date, bucket):
+    since, until = _day_bounds(start_date, end_date)
+    checkins = checkins.filter(created_at__gte=since, created_at__lt=until)
+    group_by = ['mood']
+    if bucket:
+        checkins = checkins.annotate(period=BUCKETS[bucket]('created_at'))
+        group_by.insert(0, 'period')
+    return (
+        checkins.order_by()
+        .values(*group_by)
+        .annotate(total=Count('id'), flagged_count=Count('id', filter=Q(flagged=True)))
+    )
+
+
+def _rollup_rows(rollups, start_date, end_date, bucket):
+    rollups = rollups.filter(date__gte=start_date, date__lte=end_date)
+    group_by = ['mood']
+    if bucket:
+        # Rollup rows are already one per day, so only weeks need truncating
+        period = F('date') if bucket == 'day' else BUCKETS[bucket]('date')
+        rollups = rollups.annotate(period=period)
+        group_by.insert(0, 'period')
+    return (
+        rollups.order_by()
+        .values(*group_by)
+        .annotate(total=Sum('total'), flagged_count=Sum('flagged_count'))
+    )
+
+
+def _empty_summary():
+    return {'mood_counts': {}, 'flagged_count': 0, 'total': 0}
+
+
+def _add_row(summary, row):
+    summary['mood_counts'][row['mood']] = summary['mood_counts'].get(row['mood'], 0) + row['total']
+    summary['flagged_count'] += row['flagged_count']
+    summary['total'] += row['total']
+
+
+def _summarize(row_sets, bucket):
+    summary = _empty_summary()
+    periods = {}
+    for rows in row_sets:
+        for row in rows:
+            _add_row(summary, row)
+            if bucket:
+                period = row['period']
+                if isinstance(period, datetime):
+                    period = timezone.localtime(period).date() if timezone.is_aware(period) else period.date()
+                _add_row(periods.setdefault(period, _empty_summary()), row)
+
+    if bucket:
+        summary['bucket'] = bucket
+        summary['buckets'] = [
+            {'period': period.isoformat(), **periods[period]}
+            for period in sorted(periods)
+        ]
+    return summary
+
+
+def summarize_checkins(checkins, start_date, end_date, bucket=None):
+    """
+    Mood counts, flagged count and total for a check-in queryset within the
+    window, computed with a single grouped query. With ``bucket`` the same
+    figures are also broken down per day or week under ``buckets``.
+    """
+    return _summarize([_live_rows(checkins, start_date, end_date, bucket)], bucket)
+
+
+def summarize_campus(start_date, end_date, bucket=None, department=None):
+    """
+    Campus-wide version of summarize_checkins(). Closed days are read from
+    WellnessDailyRollup; only today, if it falls in the window, is read from
+    the live check-in table.
+    """
+    rollups = WellnessDailyRollup.objects.all()
+    checkins = WellnessCheckin.objects.all()
+    if department is not None:
+        rollups = rollups.filter(department=department)
+        checkins = checkins.filter(department=department)
+
+    today = timezone.localdate()
+    row_sets = []
+    if start_date < today:
+        row_sets.append(_rollup_rows(rollups, start_date, min(end_date, today - timedelta(days=1)), bucket))
+    if start_date <= today <= end_date:
+        row_sets.append(_live_rows(checkins, today, today, bucket))
+    return _summarize(row_sets, bucket)
@@ -3,9 +3,9 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import WellnessCheckin, CounsellingSession
 from .serializers import WellnessCheckinSerializer, CounsellingSessionSerializer
+from .flagging import score_checkin
+from .trends import TrendParamsError, parse_trend_params, summarize_campus, summarize_checkins
 from users.models import CustomUser
-from django.utils import timezone
-from datetime import timedelta
 
 # Create your views here.
 
@@ -45,13 +45,21 @@ class WellnessCheckinViewSet(viewsets.ModelViewSet):
         return WellnessCheckin.objects.none()
 
     def perform_create(self, serializer):
-        # Auto-flag if mood is sad/very_sad or certain keywords in notes
-        mood = self.request.data.get('mood')
-        notes = self.request.data.get('notes', '').lower()
-        flagged = False
-        if mood in ['sad', 'very_sad'] or any(word in notes for word in ['depressed', 'help', 'anxious', 'suicidal', 'overwhelmed']):
-            flagged = True
-        serializer.save(user=self.request.user, flagged=flagged)
+        # Auto-flag if mood is sad/very_sad or the notes match the FlagTerm lexicon
+        flagged, flag_score = score_checkin(
+            serializer.validated_data.get('mood'),
+            serializer.validated_data.get('notes', ''),
+        )
+        serializer.save(user=self.request.user, flagged=flagged, flag_score=flag_score)
+
+    def perform_update(self, serializer):
+        # Edited moods or notes are scored again, like new check-ins
+        checkin = serializer.instance
+        flagged, flag_score = score_checkin(
+            serializer.validated_data.get('mood', checkin.mood),
+            serializer.validated_data.get('notes', checkin.notes),
+        )
+        serializer.save(flagged=flagged, flag_score=flag_score)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def history(self, request):
@@ -73,46 +81,38 @@ class WellnessCheckinViewSet(viewsets.ModelViewSet):
         checkin.save()
         return Response({'status': 'response saved'})
 
+    def _trend_params(self):
+        try:
+            return parse_trend_params(self.request.query_params), None
+        except TrendParamsError as exc:
+            return None, Response({'error': str(exc)}, status=400)
+
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_trends(self, request):
         """
-        Returns mood counts and flagged check-ins for the authenticated student (last 30 days).
+        Returns mood counts and flagged check-ins for the authenticated student.
+        Defaults to the last 30 days; accepts ?days=, ?start=/&end= and ?bucket=day|week.
         """
         user = request.user
         if user.role != 'student':
             return Response({'error': 'Only students can access their trends.'}, status=403)
-        since = timezone.now() - timedelta(days=30)
-        checkins = WellnessCheckin.objects.filter(user=user, created_at__gte=since)
-        mood_counts = {}
-        flagged_count = 0
-        for c in checkins:
-            mood_counts[c.mood] = mood_counts.get(c.mood, 0) + 1
-            if c.flagged:
-                flagged_count += 1
-        return Response({
-            'mood_counts': mood_counts,
-            'flagged_count': flagged_count,
-            'total': checkins.count(),
-        })
+        params, error = self._trend_params()
+        if error:
+            return error
+        return Response(summarize_checkins(WellnessCheckin.objects.filter(user=user), *params))
 
     @action(detail=False, methods=['get'], permission_classes=[IsCounsellorOrAdminStaff])
     def trends(self, request):
         """
-        Returns overall mood counts and flagged check-ins for all students (last 30 days).
+        Returns overall mood counts and flagged check-ins for all students.
+        Defaults to the last 30 days; accepts ?days=, ?start=/&end=, ?bucket=day|week
+        and ?department=. Closed days come from the daily rollup table.
         """
-        since = timezone.now() - timedelta(days=30)
-        checkins = WellnessCheckin.objects.filter(created_at__gte=since)
-        mood_counts = {}
-        flagged_count = 0
-        for c in checkins:
-            mood_counts[c.mood] = mood_counts.get(c.mood, 0) + 1
-            if c.flagged:
-                flagged_count += 1
-        return Response({
-            'mood_counts': mood_counts,
-            'flagged_count': flagged_count,
-            'total': checkins.count(),
-        })
+        params, error = self._trend_params()
+        if error:
+            return error
+        department = request.query_params.get('department')
+        return Response(summarize_campus(*params, department=department))
 
 class CounsellingSessionViewSet(viewsets.ModelViewSet):
     queryset = CounsellingSession.objects.all().order_by('-created_at')
@@ -95,6 +95,7 @@ export default function CourseList({ user }) {
       const token = localStorage.getItem('access');
       const params = new URLSearchParams({
         page: currentPage,
+        paginate: 'false',
         search: searchTerm,
         ...(levelFilter && { level: levelFilter }),
         ...(typeFilter && { course_type: typeFilter }),
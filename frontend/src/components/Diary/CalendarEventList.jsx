@@ -18,7 +18,7 @@ const CalendarEventList = () => {
     setError(null);
     try {
       const token = localStorage.getItem('access');
-      const res = await axios.get('http://localhost:8000/api/diary/calendar-events/', {
+      const res = await axios.get('http://localhost:8000/api/diary/calendar-events/?paginate=false', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       setEvents(res.data);
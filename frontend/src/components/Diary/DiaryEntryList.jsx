@@ -18,7 +18,7 @@ const DiaryEntryList = () => {
     setError(null);
     try {
       const token = localStorage.getItem('access');
-      const res = await axios.get('http://localhost:8000/api/diary/diary-entries/', {
+      const res = await axios.get('http://localhost:8000/api/diary/diary-entries/?paginate=false', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       setEntries(res.data);
@@ -15,7 +15,7 @@ export default function StudentGrades() {
     setError('');
     try {
       const token = localStorage.getItem('access');
-      const res = await fetch('http://localhost:8000/api/enrollments/', {
+      const res = await fetch('http://localhost:8000/api/enrollments/?paginate=false', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (!res.ok) throw new Error('Failed to fetch grades');
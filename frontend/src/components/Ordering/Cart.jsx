@@ -1,5 +1,5 @@
-import React, { useState } from 'react';
-import { Box, Title, Group, Text, Button, NumberInput, Alert, Divider } from '@mantine/core';
+import React, { useEffect, useState } from 'react';
+import { Box, Title, Group, Text, Button, NumberInput, Alert, Divider, Select } from '@mantine/core';
 import { useCart } from './CartContext';
 
 function formatZAR(amount) {
@@ -11,6 +11,24 @@ export default function Cart() {
   const [checkoutSuccess, setCheckoutSuccess] = useState('');
   const [checkoutError, setCheckoutError] = useState('');
   const [loading, setLoading] = useState(false);
+  const [slots, setSlots] = useState([]);
+  const [pickupSlot, setPickupSlot] = useState(null);
+
+  useEffect(() => {
+    fetchSlots();
+  }, []);
+
+  const fetchSlots = async () => {
+    try {
+      const token = localStorage.getItem('access');
+      const res = await fetch('http://localhost:8000/api/orders/pickup-slots/?department=cafeteria&paginate=false', {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (res.ok) setSlots(await res.json());
+    } catch (err) {
+      // Checkout still works without a pickup time
+    }
+  };
 
   const updateQuantity = (id, quantity) => {
     setCart(cart => cart.map(item => item.id === id ? { ...item, quantity } : item));
@@ -29,7 +47,8 @@ export default function Cart() {
     try {
       const token = localStorage.getItem('access');
       // For demo: assign all orders to 'cafeteria' department
-      const res = await fetch('http://localhost:8000/api/orders/orders/', {
+      // Prices and the total are worked out by the server
+      const res = await fetch('http://localhost:8000/api/orders/orders/checkout/', {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -37,17 +56,21 @@ export default function Cart() {
         },
         body: JSON.stringify({
           department: 'cafeteria',
-          total_price: total,
+          ...(pickupSlot ? { pickup_slot: Number(pickupSlot) } : {}),
           items: cart.map(item => ({
             product_id: item.id,
             quantity: item.quantity,
-            price_at_order: item.price,
           })),
         }),
       });
-      if (!res.ok) throw new Error('Failed to place order');
+      if (!res.ok) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.pickup_slot?.[0] || 'Failed to place order');
+      }
       setCheckoutSuccess('Order placed successfully!');
       setCart([]);
+      setPickupSlot(null);
+      fetchSlots();
     } catch (err) {
       setCheckoutError(err.message);
     } finally {
@@ -83,6 +106,19 @@ export default function Cart() {
             <Text fw={700}>Total:</Text>
             <Text fw={700}>{formatZAR(total)}</Text>
           </Group>
+          <Select
+            mt="md"
+            label="Pickup time"
+            placeholder="As soon as possible"
+            clearable
+            value={pickupSlot}
+            onChange={setPickupSlot}
+            data={slots.map(slot => ({
+              value: String(slot.id),
+              label: `${new Date(slot.starts_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })} (${slot.remaining} left)`,
+              disabled: slot.remaining <= 0,
+            }))}
+          />
           <Button fullWidth mt="md" onClick={handleCheckout} loading={loading} disabled={cart.length === 0}>
             Checkout
           </Button>
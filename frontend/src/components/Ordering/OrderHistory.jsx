@@ -19,7 +19,7 @@ export default function OrderHistory() {
     setError('');
     try {
       const token = localStorage.getItem('access');
-      const res = await fetch('http://localhost:8000/api/orders/orders/', {
+      const res = await fetch('http://localhost:8000/api/orders/orders/?paginate=false', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (!res.ok) throw new Error('Failed to fetch orders');
@@ -11,25 +11,44 @@ export default function OrderManagement() {
   const [error, setError] = useState('');
 
   useEffect(() => {
-    fetchOrders();
-  }, []);
+    // Load the open queue, then long-poll the change feed for new or updated orders
+    let cancelled = false;
+    const controller = new AbortController();
+    const token = localStorage.getItem('access');
+    const headers = { 'Authorization': `Bearer ${token}` };
 
-  const fetchOrders = async () => {
-    setLoading(true);
-    setError('');
-    try {
-      const token = localStorage.getItem('access');
-      const res = await fetch('http://localhost:8000/api/orders/orders/', {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
-      if (!res.ok) throw new Error('Failed to fetch orders');
-      setOrders(await res.json());
-    } catch (err) {
-      setError(err.message);
-    } finally {
-      setLoading(false);
-    }
-  };
+    const follow = async () => {
+      let cursor = null;
+      while (!cancelled) {
+        try {
+          const url = cursor
+            ? `http://localhost:8000/api/orders/changes/?since=${cursor}&wait=25`
+            : 'http://localhost:8000/api/orders/changes/';
+          const res = await fetch(url, { headers, signal: controller.signal });
+          if (!res.ok) throw new Error('Failed to fetch orders');
+          const page = await res.json();
+          setOrders(current => {
+            const byId = new Map(cursor ? current.map(order => [order.id, order]) : []);
+            page.results.forEach(order => byId.set(order.id, order));
+            return [...byId.values()].sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+          });
+          cursor = page.cursor;
+          setError('');
+        } catch (err) {
+          if (cancelled) return;
+          setError(err.message);
+          await new Promise(resolve => setTimeout(resolve, 5000));
+        } finally {
+          setLoading(false);
+        }
+      }
+    };
+    follow();
+    return () => {
+      cancelled = true;
+      controller.abort();
+    };
+  }, []);
 
   return (
     <Box maw={1000} mx="auto" my="xl">
@@ -24,7 +24,7 @@ export default function ProductList() {
     setError('');
     try {
       const token = localStorage.getItem('access');
-      const res = await fetch('http://localhost:8000/api/orders/products/', {
+      const res = await fetch('http://localhost:8000/api/orders/products/menu/', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (!res.ok) throw new Error('Failed to fetch products');
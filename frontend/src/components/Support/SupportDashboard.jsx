@@ -15,7 +15,7 @@ export default function SupportDashboard() {
     setError('');
     try {
       const token = localStorage.getItem('access');
-      const res = await fetch('http://localhost:8000/api/support/support-requests/', {
+      const res = await fetch('http://localhost:8000/api/support/support-requests/?paginate=false', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (!res.ok) throw new Error('Failed to fetch support requests');
@@ -64,13 +64,13 @@ export default function StaffDashboard({ user }) {
         if (!flaggedRes.ok) throw new Error('Failed to fetch flagged check-ins');
         flaggedData = await flaggedRes.json();
       }
-      const allRes = await fetch('http://localhost:8000/api/wellness/checkins/', {
+      const allRes = await fetch('http://localhost:8000/api/wellness/checkins/?paginate=false', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (!allRes.ok) throw new Error('Failed to fetch check-ins');
       allData = await allRes.json();
       if (isCounsellorOrAdmin) {
-        const sessionRes = await fetch('http://localhost:8000/api/wellness/counselling-sessions/', {
+        const sessionRes = await fetch('http://localhost:8000/api/wellness/counselling-sessions/?paginate=false', {
           headers: { 'Authorization': `Bearer ${token}` }
         });
         if (!sessionRes.ok) throw new Error('Failed to fetch sessions');
@@ -144,7 +144,7 @@ export default function StaffDashboard({ user }) {
     setLoading(true);
     try {
       const token = localStorage.getItem('access');
-      const res = await fetch(`http://localhost:8000/api/wellness/checkins/?user=${studentId}`, {
+      const res = await fetch(`http://localhost:8000/api/wellness/checkins/?user=${studentId}&paginate=false`, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (!res.ok) throw new Error('Failed to fetch student history');